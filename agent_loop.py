@@ -0,0 +1,151 @@
+import json
+import time
+from tool_registry import output_item
+
+# Bucle de agente con streaming para function calling (Responses API).
+#
+# En lugar de esperar a response.output completo, cada herramienta se lanza en
+# el ToolExecutor en cuanto llega su response.function_call_arguments.done,
+# mientras el modelo sigue generando las llamadas siguientes. Al terminar el
+# stream se recogen los resultados (en el orden de las llamadas).
+#
+# Las rondas se encadenan con previous_response_id: el servidor ya guarda el
+# prompt y las llamadas de la ronda anterior, así que cada petición solo lleva
+# los function_call_output nuevos y su tamaño no crece con la conversación.
+# El bucle se detiene al llegar al límite de rondas, de tokens o de tiempo (o
+# si la respuesta queda incompleta), y devuelve una traza con lo enviado y
+# consumido en cada ronda. Si se detiene con llamadas sin responder, sus
+# resultados quedan en AgentRun.pending: la API no acepta encadenar una
+# respuesta con function_call pendientes, así que van delante de la pregunta
+# siguiente (AgentRun.followup_input).
+
+
+class AgentRun:
+    """Resultado de run_agent: última respuesta, traza por ronda y motivo de parada"""
+
+    def __init__(self):
+        self.response = None
+        self.rounds = []
+        self.stop_reason = None
+        self.seconds = 0.0
+        self.pending = []
+
+    @property
+    def output_text(self):
+        return self.response.output_text if self.response is not None else ""
+
+    @property
+    def total_tokens(self):
+        return sum(r["input_tokens"] + r["output_tokens"] for r in self.rounds)
+
+    def followup_input(self, messages):
+        """input para continuar con previous_response_id=run.response.id"""
+        return self.pending + list(messages)
+
+    def summary(self):
+        return (f"{len(self.rounds)} rondas, {self.total_tokens} tokens, {self.seconds:.2f} s "
+                f"(fin: {self.stop_reason})")
+
+
+def stream_round(client, executor, params, on_text=None, on_tool_call=None, deadline=None):
+    """Una petición en streaming; devuelve (respuesta, {call_id: resultado})"""
+    calls = {}
+    pending = []
+    response = None
+    for event in client.responses.create(**params, stream=True):
+        if event.type == "response.output_item.added" and event.item.type == "function_call":
+            calls[event.output_index] = event.item
+        elif event.type == "response.function_call_arguments.done":
+            # Los argumentos ya están completos: la herramienta arranca sin esperar al resto
+            item = calls[event.output_index]
+            if on_tool_call is not None:
+                on_tool_call(item.name, event.arguments)
+            pending.append((item, executor.submit(item.name, event.arguments)))
+        elif event.type == "response.output_text.delta" and on_text is not None:
+            on_text(event.delta)
+        elif event.type in ("response.completed", "response.incomplete"):
+            response = event.response
+        elif event.type in ("response.failed", "error"):
+            error = getattr(getattr(event, "response", None), "error", None) or getattr(event, "message", None)
+            raise RuntimeError(f"La respuesta falló: {error}")
+    results = {item.call_id: executor.result(item.name, future, deadline) for item, future in pending}
+    if response is None:
+        raise RuntimeError("El stream terminó sin la respuesta final (response.completed)")
+    return response, results
+
+
+def _pending_outputs(tool_calls, results, reason):
+    """Resultados de las llamadas de la última ronda cuando el bucle se detiene antes de enviarlos"""
+    return [
+        output_item(tool_call, results.get(
+            tool_call.call_id, f"Error: Function {tool_call.name} was not run (agent stopped: {reason})"))
+        for tool_call in tool_calls
+    ]
+
+
+def run_agent(client, executor, input_messages, tools, model="gpt-4o-mini", max_rounds=8, max_tokens=None,
+              max_seconds=None, on_text=None, on_tool_call=None, **params):
+    """Repite peticiones hasta que el modelo no pide más herramientas o se agota un límite.
+
+    input_messages solo se envía en la primera ronda; las siguientes se
+    encadenan con previous_response_id. Para continuar la conversación, pasa
+    run.response.id como previous_response_id y run.followup_input(mensajes)
+    como input de la siguiente petición.
+    max_tokens limita la suma de tokens de entrada y salida de todas las rondas
+    y max_seconds el tiempo total (también acota las herramientas y cada
+    petición). on_text recibe los fragmentos de texto y on_tool_call(nombre,
+    argumentos) se llama al lanzar cada herramienta.
+    """
+    run = AgentRun()
+    started = time.monotonic()
+    deadline = started + max_seconds if max_seconds is not None else None
+    items = list(input_messages)
+    previous_response_id = params.pop("previous_response_id", None)
+    for index in range(max_rounds):
+        request = dict(params, model=model, input=items, tools=tools)
+        if previous_response_id:
+            request["previous_response_id"] = previous_response_id
+        if deadline is not None:
+            request["timeout"] = max(deadline - time.monotonic(), 0.1)
+        round_start = time.monotonic()
+        response, results = stream_round(client, executor, request, on_text, on_tool_call, deadline)
+        tool_calls = [item for item in response.output if item.type == "function_call"]
+        usage = response.usage
+        details = getattr(usage, "input_tokens_details", None)
+        run.response = response
+        run.rounds.append({
+            "round": index + 1,
+            "response_id": response.id,
+            "input_items": len(items),
+            "input_bytes": len(json.dumps(items, ensure_ascii=False, default=str).encode("utf-8")),
+            "tool_calls": [tool_call.name for tool_call in tool_calls],
+            "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+            "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+            "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+            "seconds": round(time.monotonic() - round_start, 3),
+        })
+        if response.status == "incomplete":
+            run.stop_reason = "incomplete"
+        elif not tool_calls:
+            run.stop_reason = "completed"
+        elif max_tokens is not None and run.total_tokens >= max_tokens:
+            run.stop_reason = "max_tokens"
+        elif deadline is not None and time.monotonic() >= deadline:
+            run.stop_reason = "max_seconds"
+        elif index == max_rounds - 1:
+            run.stop_reason = "max_rounds"
+        if run.stop_reason is not None:
+            run.pending = _pending_outputs(tool_calls, results, run.stop_reason)
+            break
+        # Llamadas cuyo evento .done no llegó: se ejecutan ahora
+        missing = [tool_call for tool_call in tool_calls if tool_call.call_id not in results]
+        if missing:
+            outputs = executor.run([(tool_call.name, tool_call.arguments) for tool_call in missing], deadline)
+            results.update((tool_call.call_id, output) for tool_call, output in zip(missing, outputs))
+        # Solo los resultados nuevos: el resto ya está en la respuesta anterior
+        items = [output_item(tool_call, results[tool_call.call_id]) for tool_call in tool_calls]
+        previous_response_id = response.id
+    if run.stop_reason is None:
+        run.stop_reason = "max_rounds"
+    run.seconds = time.monotonic() - started
+    return run
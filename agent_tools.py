@@ -0,0 +1,187 @@
+from typing import Annotated, List, Optional
+from tool_registry import ToolRegistry
+from weather import fetch_current
+from gazetteer import describe, get_gazetteer
+from forecast_store import FORECAST_VARIABLES, get_forecast_store
+from email_outbox import get_outbox
+
+# Herramientas compartidas por los scripts de function calling.
+# Para añadir una herramienta basta con registrarla aquí.
+
+registry = ToolRegistry()
+
+
+def format_temperature(place, temp_c):
+    temp_f = (temp_c * 9/5) + 32
+    return f"{place}: Temperature: {temp_c}°C ({temp_f:.1f}°F)"
+
+
+def parse_coordinates(text):
+    """(latitud, longitud) si el texto es un par "lat,lon", o None"""
+    parts = text.split(",")
+    if len(parts) != 2:
+        return None
+    try:
+        latitude, longitude = float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+    if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+        return latitude, longitude
+    return None
+
+
+def place_name(latitude, longitude):
+    """Ciudad más cercana (a menos de 50 km) o las propias coordenadas"""
+    city, distance = get_gazetteer().nearest(latitude, longitude)[0]
+    return describe(city) if distance <= 50 else f"{latitude}, {longitude}"
+
+
+def resolve_place(location, latitude, longitude):
+    """(latitud, longitud, nombre) a partir de un nombre o de coordenadas; ValueError si no es posible"""
+    if location:
+        city = get_gazetteer().resolve(location)
+        if city is None:
+            raise ValueError(f"unknown location '{location}'")
+        return city.latitude, city.longitude, describe(city)
+    if latitude is None or longitude is None:
+        raise ValueError("provide a location or both latitude and longitude")
+    return latitude, longitude, place_name(latitude, longitude)
+
+
+@registry.tool(description="Get current temperature in celsius for a city name or for coordinates.")
+def get_weather(
+    location: Annotated[Optional[str], "City name, optionally with country (e.g. 'Paris, France'); used instead of coordinates"] = None,
+    latitude: Annotated[Optional[float], "Latitude coordinate (e.g. 48.8566 for Paris)"] = None,
+    longitude: Annotated[Optional[float], "Longitude coordinate (e.g. 2.3522 for Paris)"] = None,
+):
+    """Obtiene la temperatura actual usando la API de Open-Meteo.
+
+    El nombre se resuelve con el nomenclátor offline, así que el modelo no
+    necesita adivinar las coordenadas; con coordenadas se indica la ciudad
+    más cercana.
+    """
+    try:
+        latitude, longitude, place = resolve_place(location, latitude, longitude)
+    except ValueError as e:
+        return f"Error: {e}"
+    try:
+        # Solo se pide el campo que se usa (sin la serie horaria)
+        temp_c = fetch_current([(latitude, longitude)])[0]['temperature_2m']
+        return format_temperature(place, temp_c)
+    except Exception as e:
+        return f"Error getting weather: {str(e)}"
+
+
+@registry.tool(description="Hourly forecast (next 7 days, local time) for a city or coordinates. "
+                           "mode 'hourly' lists the values in the window, 'summary' gives min/max/mean over it, "
+                           "'until' gives the hours until the variable crosses threshold "
+                           "(e.g. precipitation_probability 50 for rain).")
+def get_forecast(
+    location: Annotated[Optional[str], "City name, optionally with country (e.g. 'Paris, France'); used instead of coordinates"] = None,
+    latitude: Annotated[Optional[float], "Latitude coordinate"] = None,
+    longitude: Annotated[Optional[float], "Longitude coordinate"] = None,
+    mode: Annotated[str, {"type": "string", "enum": ["hourly", "summary", "until"],
+                          "description": "Kind of answer (default summary)"}] = "summary",
+    variable: Annotated[str, {"type": "string", "enum": list(FORECAST_VARIABLES),
+                              "description": "Forecast variable (default temperature_2m)"}] = "temperature_2m",
+    start_hour: Annotated[int, "Hours from now where the window starts (e.g. 24 for this time tomorrow)"] = 0,
+    hours: Annotated[int, "Length of the window in hours"] = 24,
+    threshold: Annotated[Optional[float], "Value to cross, for mode 'until'"] = None,
+):
+    """Consulta el pronóstico horario guardado en forecast_store (una descarga por ubicación)"""
+    try:
+        latitude, longitude, place = resolve_place(location, latitude, longitude)
+        if mode == "until" and threshold is None:
+            raise ValueError("mode 'until' needs a threshold")
+        if mode not in ("hourly", "summary", "until"):
+            raise ValueError(f"unknown mode '{mode}'")
+    except ValueError as e:
+        return f"Error: {e}"
+    try:
+        forecast = get_forecast_store().get(latitude, longitude)
+        if mode == "hourly":
+            rows = forecast.hourly(variable, start_hour, hours)
+            return f"{place}, {variable}:\n" + "\n".join(f"{moment}: {value}" for moment, value in rows)
+        if mode == "summary":
+            stats = forecast.summary(variable, start_hour, hours)
+            if stats is None:
+                return f"{place}: no {variable} data for that window"
+            return (f"{place}, {variable} from {stats['start']} to {stats['end']}: "
+                    f"min {stats['min']} at {stats['min_time']}, max {stats['max']} at {stats['max_time']}, "
+                    f"mean {stats['mean']}")
+        crossing = forecast.hours_until(variable, threshold, start_hour)
+        if crossing is None:
+            return f"{place}: {variable} does not reach {threshold} in the forecast"
+        hours_from_now, moment, value = crossing
+        return f"{place}: {variable} reaches {threshold} in {hours_from_now} h ({moment}, value {value})"
+    except ValueError as e:
+        return f"Error: {e}"
+    except Exception as e:
+        return f"Error getting forecast: {str(e)}"
+
+
+@registry.tool(description="Get current temperature in celsius for several cities or coordinates at once. "
+                           "Use this instead of calling get_weather once per location.")
+def get_weather_batch(
+    locations: Annotated[List[str], "City names (e.g. 'Paris, France') or 'latitude,longitude' pairs"],
+):
+    """Temperatura actual de varias ubicaciones con una sola petición a Open-Meteo"""
+    gazetteer = get_gazetteer()
+    places, coordinates, lines = [], [], []
+    for location in locations:
+        point = parse_coordinates(location)
+        if point is not None:
+            places.append(place_name(*point))
+            coordinates.append(point)
+            continue
+        city = gazetteer.resolve(location)
+        if city is None:
+            places.append(None)
+            coordinates.append(None)
+        else:
+            places.append(describe(city))
+            coordinates.append((city.latitude, city.longitude))
+    try:
+        current = iter(fetch_current([point for point in coordinates if point is not None]))
+    except Exception as e:
+        return f"Error getting weather: {str(e)}"
+    for location, place, point in zip(locations, places, coordinates):
+        if point is None:
+            lines.append(f"Error: unknown location '{location}'")
+        else:
+            lines.append(format_temperature(place, next(current)['temperature_2m']))
+    return "\n".join(lines)
+
+
+@registry.tool(description="Find cities by name (prefix or approximate spelling) and return their coordinates.")
+def find_city(
+    query: Annotated[str, "City name, optionally with country (e.g. 'Bogotá, Colombia')"],
+    limit: Annotated[int, "Maximum number of results"] = 5,
+):
+    """Busca ciudades en el nomenclátor offline (sin llamadas de red)"""
+    cities = get_gazetteer().search(query, limit=max(1, min(limit, 20)))
+    if not cities:
+        return f"No cities found for '{query}'"
+    return "\n".join(f"{describe(city)}: latitude {city.latitude}, longitude {city.longitude}" for city in cities)
+
+
+@registry.tool(description="Send an email to a recipient with weather information")
+def send_email(
+    to: Annotated[str, "Email address of the recipient"],
+    subject: Annotated[str, "Subject of the email"],
+    body: Annotated[str, "Body of the email with weather information"],
+):
+    """Encola el email en la bandeja de salida (email_outbox.py) y devuelve su ID.
+
+    La entrega por SMTP ocurre en segundo plano, así que la siguiente ronda del
+    modelo no espera al servidor de correo. Sin SMTP_HOST solo se simula.
+    """
+    outbox = get_outbox()
+    if outbox is None:
+        print(f"Email sent to {to}\nSubject: {subject}\nBody: {body}")
+        return f"Email sent to {to}\nSubject: {subject}\nBody: {body}"
+    try:
+        message_id = outbox.enqueue(to, subject, body)
+    except Exception as e:
+        return f"Error queuing email: {str(e)}"
+    return f"Email to {to} queued for delivery (message ID {message_id})"
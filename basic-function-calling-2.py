@@ -1,38 +1,20 @@
 from openai import OpenAI
-import json
 from dotenv import load_dotenv
-import requests
+from telemetry import instrument
+from agent_tools import registry
+from tool_registry import call_items
 
 load_dotenv()
 
-# Inicializar el cliente
-client = OpenAI()
+# Inicializar el cliente (instrumentado si TELEMETRY_PATH está definido)
+client = instrument(OpenAI())
 
 # Definir el mensaje inicial
 input_messages = [
     {"role": "user", "content": "What is the weather like in Paris today?"}]
 
-# Definir la herramienta/función get_weather
-tools = [{
-    "type": "function",
-    "name": "get_weather",
-    "description": "Get current temperature for provided coordinates in celsius.",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "latitude": {
-                "type": "number",
-                "description": "Latitude coordinate (e.g. 48.8566 for Paris)"
-            },
-            "longitude": {
-                "type": "number",
-                "description": "Longitude coordinate (e.g. 2.3522 for Paris)"
-            }
-        },
-        "required": ["latitude", "longitude"],
-        "additionalProperties": False
-    }
-}]
+# Definir la herramienta/función get_weather (esquema generado en agent_tools)
+tools = registry.schemas(["get_weather"])
 
 # Paso 1: Llamar al modelo con la función definida
 response = client.responses.create(
@@ -45,39 +27,16 @@ response = client.responses.create(
 print("Respuesta inicial del modelo:")
 print(response.output)
 
-# Función real para obtener el tiempo en una localidad usando la API de Open-Meteo
-
-
-def get_weather(latitude, longitude):
-    """Obtiene la temperatura actual usando la API de Open-Meteo"""
-    response = requests.get(
-        f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}&current=temperature_2m,wind_speed_10m&hourly=temperature_2m,relative_humidity_2m,wind_speed_10m"
-    )
-    data = response.json()
-    temp_c = data['current']['temperature_2m']
-    temp_f = (temp_c * 9/5) + 32
-    return f"The current temperature is {temp_c}°C ({temp_f:.1f}°F)"
-
-
 # Paso 3: Ejecutar el código de la función
 # Procesar las llamadas a funciones en la respuesta
 for tool_call in response.output:
     if tool_call.type == "function_call":
-        # Parsear los argumentos
-        args = json.loads(tool_call.arguments)
-
-        # Ejecutar la función
-        result = get_weather(args["latitude"], args["longitude"])
-
-        # Agregar la llamada a función a los mensajes
-        input_messages.append(tool_call)
+        # Validar los argumentos y ejecutar la función
+        result = registry.call(tool_call.name, tool_call.arguments)
 
-        # Agregar el resultado de la función
-        input_messages.append({
-            "type": "function_call_output",
-            "call_id": tool_call.call_id,
-            "output": str(result)
-        })
+        # Agregar la llamada a función y su resultado a los mensajes
+        # (con claves fijas para que el prefijo sea idéntico en cada petición)
+        input_messages.extend(call_items(tool_call, result))
 
 # Paso 4: Enviar los resultados de vuelta al modelo
 response_2 = client.responses.create(
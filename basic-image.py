@@ -1,5 +1,6 @@
 from openai import OpenAI
-client = OpenAI()
+from telemetry import instrument
+client = instrument(OpenAI())
 
 response = client.responses.create(
     model="gpt-4.1",
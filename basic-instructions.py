@@ -1,6 +1,9 @@
 from openai import OpenAI
+from response_cache import cached_client
+from telemetry import instrument
 
-client = OpenAI()
+# Caché opcional de respuestas (OPENAI_RESPONSE_CACHE) y spans (TELEMETRY_PATH)
+client = cached_client(instrument(OpenAI()))
 
 response = client.responses.create(
   model="gpt-4o-mini",
@@ -1,5 +1,8 @@
 from openai import OpenAI
-client = OpenAI()
+from response_cache import cached_client
+from telemetry import instrument
+# Caché opcional de respuestas (OPENAI_RESPONSE_CACHE) y spans (TELEMETRY_PATH)
+client = cached_client(instrument(OpenAI()))
 
 response = client.responses.create(
     model="gpt-4.1-nano",
@@ -1,5 +1,6 @@
 from openai import OpenAI
-client = OpenAI()
+from telemetry import instrument
+client = instrument(OpenAI())
 
 stream = client.responses.create(
     model="gpt-4o-mini",
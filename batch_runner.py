@@ -0,0 +1,177 @@
+import os
+import json
+import time
+from file_io import trim_partial_line
+from conversation_store import write_json_atomic
+
+# Modo lote de bulk_runner.py sobre la Batch API de OpenAI.
+#
+# Empaqueta los prompts en el formato JSONL de la Batch API (una petición a
+# /v1/responses por línea, con el id del prompt como custom_id), sube cada
+# archivo, crea el lote y lo consulta con backoff hasta que termina. Los
+# resultados se escriben con el mismo formato que el modo síncrono. Los
+# archivos se trocean para respetar los límites de la API.
+#
+# Los lotes enviados se guardan en <salida>.batches.json, así que si el proceso
+# se interrumpe (o se usa --no-wait) basta con relanzar el mismo comando para
+# seguir esperando esos lotes en lugar de enviarlos otra vez.
+
+BATCH_ENDPOINT = "/v1/responses"
+MAX_REQUESTS_PER_BATCH = 50000
+# La API admite archivos de hasta 200 MB; se deja margen
+MAX_BATCH_BYTES = 190 * 1024 * 1024
+TERMINAL_STATUS = {"completed", "failed", "expired", "cancelled"}
+
+
+def batch_line(custom_id, params):
+    """Una línea del archivo de entrada de la Batch API"""
+    body = {key: value for key, value in params.items() if key != "stream"}
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+
+def pack_batches(prompts, max_requests=MAX_REQUESTS_PER_BATCH, max_bytes=MAX_BATCH_BYTES):
+    """Agrupa los prompts en trozos que caben en un lote: genera listas de (índice, id, línea)"""
+    chunk, size = [], 0
+    for index, prompt_id, params in prompts:
+        line = (json.dumps(batch_line(prompt_id, params), ensure_ascii=False) + "\n").encode("utf-8")
+        if chunk and (len(chunk) >= max_requests or size + len(line) > max_bytes):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append((index, prompt_id, line))
+        size += len(line)
+    if chunk:
+        yield chunk
+
+
+def response_text(body):
+    """Equivalente a Response.output_text sobre el JSON de una respuesta"""
+    return "".join(
+        part.get("text", "")
+        for item in body.get("output") or [] if item.get("type") == "message"
+        for part in item.get("content") or [] if part.get("type") == "output_text"
+    )
+
+
+def result_record(row, index):
+    """Convierte una línea de los archivos de salida o de errores al formato de bulk_runner"""
+    record = {"index": index, "id": row["custom_id"]}
+    response = row.get("response") or {}
+    body = response.get("body") or {}
+    if row.get("error") or response.get("status_code") != 200:
+        error = row.get("error") or body.get("error") or {}
+        record["error"] = f"{error.get('code') or response.get('status_code')}: {error.get('message', '')}"
+        return record
+    record["response_id"] = body.get("id")
+    record["output"] = response_text(body)
+    usage = body.get("usage")
+    if usage:
+        record["usage"] = {"input_tokens": usage.get("input_tokens"), "output_tokens": usage.get("output_tokens")}
+    return record
+
+
+class BatchRunner:
+    """Envía los prompts como lotes, espera a que terminen y recoge los resultados"""
+
+    def __init__(self, client, state_path, poll_interval=5.0, max_poll_interval=300.0,
+                 max_requests=MAX_REQUESTS_PER_BATCH, max_bytes=MAX_BATCH_BYTES):
+        self.client = client
+        self.state_path = state_path
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.stats = {"ok": 0, "failed": 0, "skipped": 0, "batches": 0}
+        self.pending = self._load_state()
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_state(self):
+        if self.pending:
+            write_json_atomic(self.state_path, self.pending, indent=None)
+        elif os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    def submit(self, chunk):
+        """Sube un trozo y crea su lote; devuelve el id del lote"""
+        data = b"".join(line for _, _, line in chunk)
+        uploaded = self.client.files.create(file=("batch_input.jsonl", data), purpose="batch")
+        batch = self.client.batches.create(input_file_id=uploaded.id, endpoint=BATCH_ENDPOINT,
+                                           completion_window="24h", metadata={"source": "bulk_runner"})
+        self.pending[batch.id] = {prompt_id: index for index, prompt_id, _ in chunk}
+        self._save_state()
+        self.stats["batches"] += 1
+        return batch.id
+
+    def wait(self, out):
+        """Consulta los lotes pendientes con backoff y escribe cada uno al terminar"""
+        delay = self.poll_interval
+        while self.pending:
+            progressed = False
+            for batch_id in list(self.pending):
+                batch = self.client.batches.retrieve(batch_id)
+                if batch.status in TERMINAL_STATUS:
+                    self.collect(batch, out)
+                    progressed = True
+            if not self.pending:
+                break
+            # Si nada cambió se espera cada vez más, hasta max_poll_interval
+            delay = self.poll_interval if progressed else min(delay * 2, self.max_poll_interval)
+            time.sleep(delay)
+
+    def _read_file(self, file_id):
+        if not file_id:
+            return []
+        content = self.client.files.content(file_id).text
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+    def collect(self, batch, out):
+        indexes = self.pending[batch.id]
+        rows = self._read_file(batch.output_file_id) + self._read_file(batch.error_file_id)
+        seen = set()
+        for row in rows:
+            custom_id = row.get("custom_id")
+            if custom_id not in indexes:
+                continue
+            seen.add(custom_id)
+            record = result_record(row, indexes[custom_id])
+            record["batch_id"] = batch.id
+            self._write(out, record)
+        # Peticiones sin resultado (lote fallido, caducado o cancelado): se reintentan al relanzar
+        errors = batch.errors.data if batch.errors and batch.errors.data else []
+        reason = "; ".join(error.message or error.code or "" for error in errors) or f"batch {batch.status}"
+        for custom_id, index in indexes.items():
+            if custom_id not in seen:
+                self._write(out, {"index": index, "id": custom_id, "batch_id": batch.id, "error": reason})
+        del self.pending[batch.id]
+        self._save_state()
+
+    def _write(self, out, record):
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        self.stats["failed" if "error" in record else "ok"] += 1
+
+    def run(self, prompts, output_path, skip=(), wait=True):
+        """Envía lo que falta, espera los lotes (si wait) y devuelve las estadísticas"""
+        # Los prompts de lotes ya enviados en una ejecución anterior no se reenvían
+        skip = set(skip)
+        for indexes in self.pending.values():
+            skip.update(indexes)
+
+        def remaining():
+            for item in prompts:
+                if item[1] in skip:
+                    self.stats["skipped"] += 1
+                else:
+                    yield item
+
+        for chunk in pack_batches(remaining(), max_requests=self.max_requests, max_bytes=self.max_bytes):
+            self.submit(chunk)
+        if wait:
+            trim_partial_line(output_path)
+            with open(output_path, "a", encoding="utf-8") as out:
+                self.wait(out)
+        return self.stats
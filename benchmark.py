@@ -0,0 +1,355 @@
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+
+# Benchmarks de los caminos críticos locales y de la latencia de un turno.
+#
+#   python benchmark.py --output bench.json
+#   python benchmark.py --quick --compare bench.json
+#
+# Los resultados se guardan en JSON (una entrada por caso con percentiles en
+# milisegundos) junto con el commit y la versión de Python, para comparar
+# ejecuciones entre commits. Los turnos completos se miden contra
+# mock_openai_server en un hilo local, sin red.
+
+SYSTEM_PROMPT = {"role": "system", "content": "Eres un asistente útil y profesional. Responde en español."}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def summarize(name, params, samples, extra=None):
+    """Convierte una lista de duraciones (s) en un resultado en milisegundos.
+
+    Las muestras None (p. ej. un turno sin ningún delta de texto para el TTFT)
+    no entran en las estadísticas y se cuentan en "missing".
+    """
+    values = sorted(sample * 1000 for sample in samples if sample is not None)
+    result = {
+        "name": name,
+        "params": params,
+        "unit": "ms",
+        "samples": len(values),
+        "min": values[0] if values else None,
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 50) if values else None,
+        "p95": percentile(values, 95) if values else None,
+        "p99": percentile(values, 99) if values else None,
+    }
+    if len(values) < len(samples):
+        result["missing"] = len(samples) - len(values)
+    if extra:
+        result.update(extra)
+    return result
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def make_conversation(messages, rng):
+    conversation = [dict(SYSTEM_PROMPT, title="Conversación de prueba")]
+    for index in range(messages - 1):
+        role = "user" if index % 2 == 0 else "assistant"
+        words = rng.randint(5, 80)
+        conversation.append({"role": role, "content": " ".join(f"palabra{rng.randint(0, 999)}" for _ in range(words))})
+    return conversation
+
+
+# --- casos ------------------------------------------------------------------
+
+def bench_menu(workdir, sizes, repeat):
+    """Primera página del menú (list_files + entries) con N conversaciones guardadas"""
+    from conversation_index import ConversationCatalog
+    rng = random.Random(1)
+    results = []
+    for count in sizes:
+        logs_dir = os.path.join(workdir, f"menu_{count}")
+        os.makedirs(logs_dir)
+        for index in range(count):
+            path = os.path.join(logs_dir, f"conversation_2024-01-01_{index // 3600:02d}-{index // 60 % 60:02d}-{index % 60:02d}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(make_conversation(6, rng), f, ensure_ascii=False, indent=2)
+
+        def first_page():
+            catalog = ConversationCatalog(logs_dir)
+            catalog.entries(catalog.list_files()[:15])
+            catalog.close()
+
+        # Primera vez: catálogo vacío (se indexa solo la primera página)
+        results.append(summarize("menu_first_page_cold", {"conversations": count}, timed(first_page, 1)))
+        results.append(summarize("menu_first_page_warm", {"conversations": count}, timed(first_page, repeat)))
+    return results
+
+
+def bench_store(workdir, sizes, repeat):
+    """Guardar un turno y cargar una conversación de N mensajes"""
+    from conversation_store import ConversationStore
+    rng = random.Random(2)
+    results = []
+    for count in sizes:
+        path = os.path.join(workdir, f"conversation_store_{count}.json")
+        conversation = make_conversation(count, rng)
+        store = ConversationStore(path, compact_every=10 ** 9)
+        store.sync(conversation)
+
+        def save_turn():
+            conversation.append({"role": "user", "content": "otro mensaje más"})
+            store.sync(conversation)
+
+        results.append(summarize("save_turn_journal", {"messages": count}, timed(save_turn, repeat)))
+        store.close()
+
+        def save_full_rewrite():
+            # Referencia: el guardado anterior reescribía el JSON completo en cada turno
+            with open(path + ".full", "w", encoding="utf-8") as f:
+                json.dump(conversation, f, ensure_ascii=False, indent=2)
+
+        results.append(summarize("save_turn_full_rewrite", {"messages": count}, timed(save_full_rewrite, repeat)))
+        results.append(summarize("load_conversation", {"messages": count},
+                                 timed(lambda: ConversationStore(path).load(), repeat)))
+    return results
+
+
+def bench_log(workdir, lines):
+    """Throughput de write_log con el escritor en segundo plano"""
+    from log_writer import BufferedLogWriter
+    writer = BufferedLogWriter(os.path.join(workdir, "log_bench.txt"))
+    start = time.perf_counter()
+    for index in range(lines):
+        writer.write(f"Usuario: mensaje de prueba número {index}")
+    enqueued = time.perf_counter() - start
+    writer.close()
+    total = time.perf_counter() - start
+    return [summarize("write_log", {"lines": lines}, [enqueued / lines],
+                      {"lines_per_second": lines / enqueued, "total_with_flush_ms": total * 1000})]
+
+
+def bench_dispatch(repeat):
+    """Coste del despacho de herramientas (validación + llamada) sin la herramienta"""
+    from tool_registry import ToolRegistry
+    from tool_executor import ToolExecutor
+    registry = ToolRegistry()
+
+    @registry.tool(description="No-op")
+    def noop(latitude: float, longitude: float):
+        return "ok"
+
+    arguments = json.dumps({"latitude": 48.8566, "longitude": 2.3522})
+    results = [summarize("call_function", {"tool": "noop"}, timed(lambda: registry.call("noop", arguments), repeat))]
+    executor = ToolExecutor(registry.call)
+    calls = [("noop", arguments)] * 4
+    results.append(summarize("tool_executor_run", {"calls": len(calls)}, timed(lambda: executor.run(calls), repeat)))
+    executor.shutdown()
+    return results
+
+
+def bench_gazetteer(repeat):
+    """Resolución de ciudades en el nomenclátor offline (exacta, aproximada y más cercana)"""
+    from gazetteer import get_gazetteer
+    gazetteer = get_gazetteer()
+    return [
+        summarize("gazetteer_resolve", {"query": "Bogotá, Colombia"}, timed(lambda: gazetteer.resolve("Bogotá, Colombia"), repeat)),
+        summarize("gazetteer_fuzzy", {"query": "Barcelna"}, timed(lambda: gazetteer.resolve("Barcelna"), repeat)),
+        summarize("gazetteer_nearest", {"k": 1}, timed(lambda: gazetteer.nearest(40.4, -3.7), repeat)),
+    ]
+
+
+def bench_forecast(repeat):
+    """Consultas locales sobre un pronóstico horario de 7 días en arrays de NumPy"""
+    try:
+        from forecast_store import Forecast
+    except ImportError:
+        return [{"name": "forecast_summary", "skipped": "numpy no está instalado"}]
+    now = int(time.time()) // 3600 * 3600
+    data = {"hourly": {
+        "time": [time.strftime("%Y-%m-%dT%H:%M", time.gmtime(now + 3600 * h)) for h in range(168)],
+        "temperature_2m": [10 + (h % 24) / 2 for h in range(168)],
+        "precipitation_probability": [60 if h % 50 == 49 else 0 for h in range(168)],
+    }}
+    forecast = Forecast(data, time.time() + 3600)
+    return [
+        summarize("forecast_summary", {"hours": 6}, timed(lambda: forecast.summary("temperature_2m", 24, 6), repeat)),
+        summarize("forecast_hours_until", {"threshold": 50}, timed(lambda: forecast.hours_until("precipitation_probability", 50), repeat)),
+    ]
+
+
+def bench_turns(turns, latency, tokens_per_second):
+    """Turnos completos (streaming) contra el servidor simulado: latencia total y TTFT"""
+    try:
+        from openai import OpenAI
+    except ImportError:
+        return [{"name": "chat_turn", "skipped": "openai no está instalado"}]
+    import mock_openai_server
+    server = mock_openai_server.make_server(mock_openai_server.parse_args(
+        ["--port", "0", "--latency", str(latency), "--tokens-per-second", str(tokens_per_second)]))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = OpenAI(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key="benchmark")
+    totals, first_tokens = [], []
+    previous_response_id = None
+    try:
+        # Turno de calentamiento (imports perezosos del SDK, primera conexión) fuera de la medida
+        for _ in client.responses.create(model="gpt-4o-mini", input="calentamiento", stream=True):
+            pass
+        for index in range(turns):
+            params = {"model": "gpt-4o-mini", "input": f"Pregunta {index}", "stream": True}
+            if previous_response_id:
+                params["previous_response_id"] = previous_response_id
+            start = time.perf_counter()
+            first = None
+            for event in client.responses.create(**params):
+                if event.type == "response.output_text.delta" and first is None:
+                    first = time.perf_counter() - start
+                elif event.type == "response.completed":
+                    previous_response_id = event.response.id
+            totals.append(time.perf_counter() - start)
+            first_tokens.append(first)
+    finally:
+        server.shutdown()
+        server.server_close()
+    params = {"turns": turns, "latency": latency, "tokens_per_second": tokens_per_second}
+    return [summarize("chat_turn_total", params, totals), summarize("chat_turn_ttft", params, first_tokens)]
+
+
+def bench_agent_loop(turns, latency, tokens_per_second, tool_latency=0.2):
+    """Turno con tres herramientas lentas: bucle esperar-y-ejecutar frente a agent_loop en streaming"""
+    try:
+        from openai import OpenAI
+    except ImportError:
+        return [{"name": "agent_turn", "skipped": "openai no está instalado"}]
+    import mock_openai_server
+    from agent_loop import run_agent
+    from tool_registry import ToolRegistry, call_items
+    from tool_executor import ToolExecutor
+    registry = ToolRegistry()
+
+    def slow_tool(name):
+        @registry.tool(name=name, description="Herramienta lenta simulada")
+        def tool(latitude: float, longitude: float):
+            time.sleep(tool_latency)
+            return "ok"
+
+    for name in ("weather_a", "weather_b", "weather_c"):
+        slow_tool(name)
+    tools = registry.schemas()
+    executor = ToolExecutor(registry.call)
+
+    def stop_and_wait(client):
+        messages = [{"role": "user", "content": "Consulta las tres estaciones"}]
+        response = client.responses.create(model="gpt-4o-mini", input=messages, tools=tools)
+        tool_calls = [item for item in response.output if item.type == "function_call"]
+        results = executor.run([(tool_call.name, tool_call.arguments) for tool_call in tool_calls])
+        for tool_call, result in zip(tool_calls, results):
+            messages.extend(call_items(tool_call, result))
+        client.responses.create(model="gpt-4o-mini", input=messages, tools=tools)
+
+    def streaming(client):
+        run_agent(client, executor, [{"role": "user", "content": "Consulta las tres estaciones"}], tools)
+
+    server = mock_openai_server.make_server(mock_openai_server.parse_args(
+        ["--port", "0", "--latency", str(latency), "--tokens-per-second", str(tokens_per_second)]))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = OpenAI(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key="benchmark")
+    params = {"turns": turns, "latency": latency, "tokens_per_second": tokens_per_second,
+              "tools": len(tools), "tool_latency": tool_latency}
+    results = []
+    try:
+        for name, loop in (("agent_turn_stop_and_wait", stop_and_wait), ("agent_turn_streaming", streaming)):
+            loop(client)  # calentamiento
+            results.append(summarize(name, params, timed(lambda: loop(client), turns)))
+    finally:
+        executor.shutdown()
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+# --- ejecución --------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(current, baseline_path):
+    """Muestra la variación de p50 respecto a un resultado anterior"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {(r["name"], json.dumps(r.get("params"), sort_keys=True)): r for r in baseline["results"]}
+    print(f"\nComparación con {baseline_path} ({baseline.get('commit')}):")
+    for result in current["results"]:
+        old = previous.get((result["name"], json.dumps(result.get("params"), sort_keys=True)))
+        if old is None or result.get("p50") is None or not old.get("p50"):
+            continue
+        change = (result["p50"] - old["p50"]) / old["p50"] * 100
+        print(f"  {result['name']:<24} {json.dumps(result['params']):<50} {old['p50']:10.3f} -> {result['p50']:10.3f} ms ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de los caminos críticos del proyecto")
+    parser.add_argument("--output", help="archivo JSON donde guardar los resultados")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior para comparar")
+    parser.add_argument("--quick", action="store_true", help="tamaños reducidos (sin los casos de 10k)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="latencia simulada del servidor (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=500.0)
+    args = parser.parse_args()
+
+    sizes = [10, 1000] if args.quick else [10, 1000, 10000]
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    results = []
+    try:
+        results += bench_menu(workdir, sizes, args.repeat)
+        results += bench_store(workdir, sizes, args.repeat)
+        results += bench_log(workdir, 20000 if args.quick else 200000)
+        results += bench_dispatch(args.repeat * 50)
+        results += bench_gazetteer(args.repeat * 50)
+        results += bench_forecast(args.repeat * 50)
+        results += bench_turns(10 if args.quick else args.turns, args.latency, args.tokens_per_second)
+        results += bench_agent_loop(5 if args.quick else 20, args.latency, args.tokens_per_second)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+    for result in results:
+        if result.get("p50") is not None:
+            print(f"{result['name']:<24} {json.dumps(result['params']):<50} p50={result['p50']:.3f} p95={result['p95']:.3f} p99={result['p99']:.3f} ms")
+        else:
+            print(f"{result['name']:<24} {result.get('skipped', 'sin muestras')}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import dotenv
+import openai
+from file_io import trim_partial_line
+
+# Ejecuta miles de prompts contra la Responses API con concurrencia acotada.
+#
+#   python bulk_runner.py prompts.jsonl resultados.jsonl --concurrency 32
+#
+# Cada línea de entrada es un texto JSON o un objeto con "input" y, de forma
+# opcional, "id", "instructions", "model" y otros parámetros de
+# responses.create. Los resultados se escriben en cuanto terminan (orden de
+# finalización), cada uno con el índice de su línea de entrada, así que al
+# relanzar el mismo comando tras una interrupción se saltan los id ya
+# completados y solo se reintentan los que faltan o fallaron.
+#
+# Con --batch los prompts se envían por la Batch API (más barata, sin
+# respuesta inmediata); ver batch_runner.py.
+
+dotenv.load_dotenv()
+
+DEFAULT_MODEL = "gpt-4o-mini"
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def read_prompts(path, default_model=DEFAULT_MODEL):
+    """Genera (índice, id, parámetros) por cada línea no vacía del JSONL de entrada"""
+    with open(path, "r", encoding="utf-8") as f:
+        for index, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"input": item}
+            params = dict(item)
+            prompt_id = str(params.pop("id", index))
+            params.setdefault("model", default_model)
+            yield index, prompt_id, params
+
+
+def completed_ids(path):
+    """Id ya resueltos en un archivo de salida previo (las líneas con error se reintentan)"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    # Una última línea cortada por una interrupción se descarta: ese prompt se repite
+    trim_partial_line(path)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict) or "id" not in record:
+                continue
+            if "error" not in record:
+                done.add(record["id"])
+    return done
+
+
+def _status_code(error):
+    return getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+
+
+class BulkRunner:
+    """Reparte los prompts entre N trabajadores y escribe cada resultado al terminar"""
+
+    def __init__(self, client, concurrency=16, retries=5, backoff=1.0, max_backoff=60.0):
+        self.client = client
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats = {"ok": 0, "failed": 0, "skipped": 0, "input_tokens": 0, "output_tokens": 0}
+
+    async def call(self, params):
+        for attempt in range(self.retries + 1):
+            try:
+                return await self.client.responses.create(**params)
+            except Exception as e:
+                status = _status_code(e)
+                retryable = status in RETRY_STATUS or isinstance(e, (openai.APIConnectionError, openai.APITimeoutError))
+                if not retryable or attempt == self.retries:
+                    raise
+                # Backoff exponencial con jitter completo: los límites de tasa marcan el ritmo
+                await asyncio.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+
+    async def run_one(self, index, prompt_id, params):
+        start = time.perf_counter()
+        record = {"index": index, "id": prompt_id}
+        try:
+            response = await self.call(params)
+            record["response_id"] = response.id
+            record["output"] = response.output_text
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                record["usage"] = {"input_tokens": usage.input_tokens, "output_tokens": usage.output_tokens}
+                self.stats["input_tokens"] += usage.input_tokens
+                self.stats["output_tokens"] += usage.output_tokens
+            self.stats["ok"] += 1
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            self.stats["failed"] += 1
+        record["seconds"] = round(time.perf_counter() - start, 3)
+        return record
+
+    async def run(self, prompts, output_path, skip=()):
+        """Procesa los prompts escribiendo output_path en modo append; devuelve las estadísticas"""
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        trim_partial_line(output_path)
+        with open(output_path, "a", encoding="utf-8") as out:
+            async def worker():
+                while True:
+                    item = await queue.get()
+                    try:
+                        if item is None:
+                            return
+                        record = await self.run_one(*item)
+                        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        out.flush()
+                    finally:
+                        queue.task_done()
+
+            workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+            try:
+                # La cola acotada evita cargar en memoria todo el archivo de entrada
+                for index, prompt_id, params in prompts:
+                    if prompt_id in skip:
+                        self.stats["skipped"] += 1
+                        continue
+                    await queue.put((index, prompt_id, params))
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+        return self.stats
+
+
+def run_batch_cli(args):
+    from openai import OpenAI
+    from batch_runner import BatchRunner
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=args.timeout)
+    skip = completed_ids(args.output) if not args.no_resume else set()
+    runner = BatchRunner(client, args.output + ".batches.json", poll_interval=args.poll_interval,
+                         max_requests=args.batch_size)
+    stats = runner.run(read_prompts(args.input, args.model), args.output, skip, wait=not args.no_wait)
+    print(f"Lotes enviados: {stats['batches']}  Completados: {stats['ok']}  Fallidos: {stats['failed']}  "
+          f"Saltados: {stats['skipped']}")
+    if runner.pending:
+        print(f"{len(runner.pending)} lote(s) pendiente(s): vuelve a lanzar el mismo comando para recoger los resultados.")
+    return 1 if stats["failed"] else 0
+
+
+async def run_cli(args):
+    from openai import AsyncOpenAI
+    # Los reintentos los gestiona BulkRunner, con jitter, en lugar del SDK
+    from telemetry import instrument
+    client = instrument(AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0, timeout=args.timeout))
+    skip = completed_ids(args.output) if not args.no_resume else set()
+    runner = BulkRunner(client, concurrency=args.concurrency, retries=args.retries)
+    start = time.perf_counter()
+    try:
+        stats = await runner.run(read_prompts(args.input, args.model), args.output, skip)
+    finally:
+        await client.close()
+    elapsed = time.perf_counter() - start
+    done = stats["ok"] + stats["failed"]
+    print(f"Completados: {stats['ok']}  Fallidos: {stats['failed']}  Saltados: {stats['skipped']}  "
+          f"en {elapsed:.1f}s ({done / elapsed if elapsed else 0:.1f} prompts/s, "
+          f"{stats['input_tokens']} tokens de entrada, {stats['output_tokens']} de salida)")
+    return 1 if stats["failed"] else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ejecuta prompts de un JSONL contra la Responses API en paralelo")
+    parser.add_argument("input", help="JSONL de entrada (texto u objeto con input/id/instructions/model)")
+    parser.add_argument("output", help="JSONL de salida; si ya existe se reanuda")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="modelo para las líneas que no indiquen uno")
+    parser.add_argument("--concurrency", type=int, default=16, help="peticiones simultáneas")
+    parser.add_argument("--retries", type=int, default=5, help="reintentos ante 429/5xx")
+    parser.add_argument("--timeout", type=float, default=120.0, help="timeout por petición (s)")
+    parser.add_argument("--no-resume", action="store_true", help="no saltar los id ya presentes en la salida")
+    parser.add_argument("--batch", action="store_true", help="usar la Batch API en lugar de llamadas síncronas")
+    parser.add_argument("--batch-size", type=int, default=50000, help="peticiones máximas por lote")
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="intervalo inicial de consulta de los lotes (s)")
+    parser.add_argument("--no-wait", action="store_true", help="enviar los lotes y salir sin esperar")
+    args = parser.parse_args()
+    try:
+        if args.batch:
+            sys.exit(run_batch_cli(args))
+        sys.exit(asyncio.run(run_cli(args)))
+    except KeyboardInterrupt:
+        print("\nInterrumpido: vuelve a lanzar el mismo comando para continuar.")
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
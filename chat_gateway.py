@@ -0,0 +1,285 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import argparse
+from collections import OrderedDict, deque
+from openai import AsyncOpenAI
+import dotenv
+from telemetry import PromptCacheStats, instrument
+
+# Pasarela HTTP asíncrona con varias sesiones de chat (Responses API).
+#
+# Cada sesión encadena sus turnos con previous_response_id, igual que
+# statefulchat.py, pero muchas sesiones conviven en un mismo proceso:
+#
+#   POST   /sessions                    -> {"session_id": ...}
+#   POST   /sessions/<id>/messages      {"input": "..."} -> stream SSE
+#   GET    /sessions/<id>               -> historial reciente y uso de la caché de prompts
+#   DELETE /sessions/<id>
+#   GET    /health
+#
+# El stream SSE emite {"type": "delta", "delta": ...} por fragmento y un
+# {"type": "done", "response_id": ..., "text": ...} final.
+
+dotenv.load_dotenv()
+
+INSTRUCTIONS = "You are a helpful assistant. Remember facts the user tells you and reference them in future responses."
+MAX_BODY_BYTES = 64 * 1024
+# Segundos para recibir la petición completa; un cliente inactivo no retiene la conexión
+READ_TIMEOUT = 30.0
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           408: "Request Timeout", 413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error"}
+
+
+class Session:
+    """Estado de una conversación: solo el id de la última respuesta y un historial acotado"""
+
+    def __init__(self, session_id, history_size, max_chars):
+        self.id = session_id
+        self.previous_response_id = None
+        self.history = deque(maxlen=history_size)
+        self.max_chars = max_chars
+        self.last_used = time.monotonic()
+        self.cache_stats = PromptCacheStats()
+        # Los turnos de una misma sesión se encadenan, así que van de uno en uno
+        self.lock = asyncio.Lock()
+
+    def remember(self, role, text):
+        if len(text) > self.max_chars:
+            text = text[:self.max_chars - 3] + "..."
+        self.history.append({"role": role, "content": text})
+
+
+class ChatGateway:
+    """Gestiona sesiones, desalojo por inactividad y el límite global de peticiones"""
+
+    def __init__(self, client, model="gpt-4o-mini", max_in_flight=16, max_sessions=1000,
+                 idle_timeout=1800.0, history_size=20, max_chars=2000, read_timeout=READ_TIMEOUT):
+        self.client = client
+        self.model = model
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.history_size = history_size
+        self.max_chars = max_chars
+        self.read_timeout = read_timeout
+        self.sessions = OrderedDict()
+        self.in_flight = 0
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    # --- sesiones -------------------------------------------------------
+
+    def create_session(self):
+        session = Session(uuid.uuid4().hex, self.history_size, self.max_chars)
+        self.sessions[session.id] = session
+        self._evict_overflow()
+        return session
+
+    def get_session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is not None:
+            session.last_used = time.monotonic()
+            self.sessions.move_to_end(session_id)
+        return session
+
+    def _evict_overflow(self):
+        # Se desalojan primero las sesiones usadas hace más tiempo que no estén ocupadas
+        for session_id in list(self.sessions):
+            if len(self.sessions) <= self.max_sessions:
+                break
+            if not self.sessions[session_id].lock.locked():
+                del self.sessions[session_id]
+
+    def evict_idle(self):
+        """Elimina las sesiones inactivas durante más de idle_timeout segundos"""
+        limit = time.monotonic() - self.idle_timeout
+        for session_id, session in list(self.sessions.items()):
+            if session.last_used < limit and not session.lock.locked():
+                del self.sessions[session_id]
+
+    async def evict_idle_forever(self, interval=30.0):
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_idle()
+
+    # --- turnos ---------------------------------------------------------
+
+    async def stream_turn(self, session, user_input):
+        """Envía un turno y produce los fragmentos de texto según llegan"""
+        async with session.lock, self._slots:
+            self.in_flight += 1
+            try:
+                params = {"model": self.model, "input": user_input, "instructions": INSTRUCTIONS, "stream": True}
+                if session.previous_response_id:
+                    params["previous_response_id"] = session.previous_response_id
+                stream = await self.client.responses.create(**params)
+                parts = []
+                response_id = None
+                async for event in stream:
+                    if event.type == "response.output_text.delta":
+                        parts.append(event.delta)
+                        yield {"type": "delta", "delta": event.delta}
+                    elif event.type == "response.created":
+                        response_id = event.response.id
+                    elif event.type == "response.completed":
+                        response_id = event.response.id
+                        session.cache_stats.add(event.response.usage)
+                    elif event.type in ("response.failed", "error"):
+                        raise RuntimeError(f"La respuesta falló: {getattr(event, 'message', event.type)}")
+                text = "".join(parts)
+                session.previous_response_id = response_id
+                session.remember("user", user_input)
+                session.remember("assistant", text)
+                session.last_used = time.monotonic()
+                yield {"type": "done", "response_id": response_id, "text": text}
+            finally:
+                self.in_flight -= 1
+
+    # --- HTTP -----------------------------------------------------------
+
+    async def handle(self, reader, writer):
+        try:
+            try:
+                method, path, body = await asyncio.wait_for(read_request(reader), self.read_timeout)
+            except asyncio.TimeoutError:
+                raise HttpError(408, "request timeout")
+            await self.route(method, path, body, writer)
+        except HttpError as e:
+            await send_json(writer, e.status, {"error": e.message})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            try:
+                await send_json(writer, 500, {"error": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body, writer):
+        parts = [part for part in path.split("?")[0].split("/") if part]
+        if parts == ["health"] and method == "GET":
+            await send_json(writer, 200, {"sessions": len(self.sessions), "in_flight": self.in_flight})
+        elif parts == ["sessions"] and method == "POST":
+            session = self.create_session()
+            await send_json(writer, 201, {"session_id": session.id})
+        elif len(parts) >= 2 and parts[0] == "sessions":
+            session = self.get_session(parts[1])
+            if session is None:
+                raise HttpError(404, "session not found")
+            if len(parts) == 2 and method == "GET":
+                stats = session.cache_stats
+                await send_json(writer, 200, {"session_id": session.id, "history": list(session.history),
+                                              "input_tokens": stats.input_tokens, "cached_tokens": stats.cached_tokens,
+                                              "cache_hit_rate": round(stats.hit_rate, 4)})
+            elif len(parts) == 2 and method == "DELETE":
+                self.sessions.pop(session.id, None)
+                await send_json(writer, 200, {"deleted": session.id})
+            elif parts[2:] == ["messages"] and method == "POST":
+                try:
+                    user_input = json.loads(body or b"{}")["input"]
+                except (ValueError, KeyError, TypeError):
+                    raise HttpError(400, 'body must be JSON with an "input" field')
+                if not isinstance(user_input, str) or not user_input.strip():
+                    raise HttpError(400, '"input" must be a non-empty string')
+                await self.send_stream(writer, session, user_input)
+            else:
+                raise HttpError(405, "method not allowed")
+        else:
+            raise HttpError(404, "not found")
+
+    async def send_stream(self, writer, session, user_input):
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n"
+        )
+        try:
+            async for event in self.stream_turn(session, user_input):
+                writer.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                await writer.drain()
+        except ConnectionError:
+            raise
+        except Exception as e:
+            writer.write(f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n".encode("utf-8"))
+            await writer.drain()
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+async def read_request(reader):
+    """Lee una petición HTTP/1.1 sencilla: (método, ruta, cuerpo)"""
+    request_line = await reader.readline()
+    if not request_line:
+        raise ConnectionError("connection closed")
+    try:
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "bad request line")
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            try:
+                length = int(value.strip() or 0)
+            except ValueError:
+                raise HttpError(400, "bad Content-Length")
+            if length < 0:
+                raise HttpError(400, "bad Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, body
+
+
+async def send_json(writer, status, payload):
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    writer.write(
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data
+    )
+    await writer.drain()
+
+
+async def serve(args):
+    client = instrument(AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")))
+    gateway = ChatGateway(client, model=args.model, max_in_flight=args.max_in_flight,
+                          max_sessions=args.max_sessions, idle_timeout=args.idle_timeout,
+                          read_timeout=args.read_timeout)
+    server = await asyncio.start_server(gateway.handle, args.host, args.port)
+    evictor = asyncio.create_task(gateway.evict_idle_forever())
+    print(f"Chat gateway escuchando en http://{args.host}:{args.port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        evictor.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pasarela HTTP multi-sesión para el chat con la Responses API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--max-in-flight", type=int, default=16, help="peticiones simultáneas al modelo")
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    parser.add_argument("--idle-timeout", type=float, default=1800.0, help="segundos sin uso antes de desalojar una sesión")
+    parser.add_argument("--read-timeout", type=float, default=READ_TIMEOUT, help="segundos para recibir cada petición")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
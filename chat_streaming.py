@@ -0,0 +1,69 @@
+import sys
+
+# Utilidades para mostrar respuestas en streaming en los chats interactivos.
+# Los generadores convierten los eventos de cada API en fragmentos de texto y
+# render_stream los pinta a medida que llegan (rich Live o stdout).
+
+
+def response_text_deltas(stream, result):
+    """Extrae los fragmentos de texto de un stream de la Responses API.
+
+    Al terminar deja la respuesta completa en result["response"] para poder
+    encadenar el siguiente turno con previous_response_id.
+    """
+    for event in stream:
+        if event.type == "response.output_text.delta":
+            yield event.delta
+        elif event.type == "response.created":
+            result["response"] = event.response
+        elif event.type == "response.completed":
+            result["response"] = event.response
+        elif event.type in ("response.failed", "error"):
+            error = getattr(getattr(event, "response", None), "error", None) or getattr(event, "message", None)
+            raise RuntimeError(f"La respuesta falló: {error}")
+
+
+def chat_completion_deltas(stream, result=None):
+    """Extrae los fragmentos de texto de un stream de Chat Completions.
+
+    Si se pide stream_options={"include_usage": True}, el último fragmento
+    trae el consumo de tokens y se deja en result["usage"].
+    """
+    for chunk in stream:
+        if result is not None and getattr(chunk, "usage", None) is not None:
+            result["usage"] = chunk.usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
+def render_stream(deltas, console=None, title="Agente", border_style="green", prefix="Bot: "):
+    """Muestra los fragmentos conforme llegan y devuelve el texto completo.
+
+    Con un Console de rich se usa Live sobre un panel; sin rich se escribe
+    directamente en stdout.
+    """
+    parts = []
+    if console is not None:
+        from rich.live import Live
+        from rich.panel import Panel
+        from rich.text import Text
+
+        # Text se modifica en sitio: cada fragmento cuesta O(1) y Live refresca solo
+        text = Text()
+        panel = Panel(text, title=title, title_align="left", border_style=border_style)
+        with Live(panel, console=console, refresh_per_second=15):
+            for delta in deltas:
+                parts.append(delta)
+                text.append(delta)
+    else:
+        sys.stdout.write(prefix)
+        sys.stdout.flush()
+        for delta in deltas:
+            parts.append(delta)
+            sys.stdout.write(delta)
+            sys.stdout.flush()
+        sys.stdout.write("\n")
+    return "".join(parts)
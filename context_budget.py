@@ -0,0 +1,174 @@
+import os
+import importlib.util
+from functools import lru_cache
+
+# tiktoken es opcional y tarda en importarse: solo se comprueba que exista y
+# se carga al contar el primer texto
+TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
+
+# Presupuesto de contexto para la API de Chat Completions.
+#
+# Antes de cada llamada se recorta la conversación para que quepa en el
+# presupuesto de tokens del modelo: siempre se conserva el mensaje de sistema
+# y los turnos más recientes; los turnos antiguos que no caben se resumen en
+# una nota breve. La conversación original (la que se guarda en disco) no se
+# modifica.
+#
+# El proveedor cachea los prefijos idénticos de las peticiones, así que el
+# recorte tiene histéresis: al superar el presupuesto se recorta hasta
+# refill_ratio del presupuesto y ese punto de corte (con su nota) se reutiliza
+# en los turnos siguientes mientras quepa. Así el prefijo solo cambia cada
+# varios turnos en lugar de en todos.
+
+# Tokens de entrada por petición. Las ventanas de contexto reales son mayores;
+# el presupuesto limita latencia y coste en conversaciones largas.
+MODEL_BUDGETS = {
+    "gpt-4o-mini": 32000,
+    "gpt-4o": 32000,
+    "gpt-4.1": 64000,
+    "gpt-4.1-mini": 64000,
+    "gpt-4.1-nano": 32000,
+}
+DEFAULT_BUDGET = 16000
+
+# Tokens fijos por mensaje (rol y separadores del formato de chat)
+MESSAGE_OVERHEAD = 4
+
+# Claves que acepta la API; el resto (p. ej. "title") son metadatos locales
+API_MESSAGE_KEYS = ("role", "content", "name", "tool_calls", "tool_call_id")
+
+
+@lru_cache(maxsize=None)
+def _encoding(model):
+    import tiktoken
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+@lru_cache(maxsize=8192)
+def count_text_tokens(text, model):
+    """Cuenta los tokens de un texto (tiktoken si está instalado, si no ~4 caracteres por token)"""
+    if TIKTOKEN_AVAILABLE:
+        return len(_encoding(model).encode(text))
+    return (len(text) + 3) // 4
+
+
+def api_message(message):
+    """Copia del mensaje solo con las claves de la API, siempre en el mismo orden"""
+    return {key: message[key] for key in API_MESSAGE_KEYS if key in message}
+
+
+def budget_for_model(model):
+    """Devuelve el presupuesto configurado (CONTEXT_BUDGET_TOKENS tiene prioridad)"""
+    override = os.getenv("CONTEXT_BUDGET_TOKENS")
+    if override:
+        return int(override)
+    return MODEL_BUDGETS.get(model, DEFAULT_BUDGET)
+
+
+class ContextBudget:
+    """Ajusta la lista de mensajes al presupuesto de tokens del modelo"""
+
+    def __init__(self, model, max_tokens=None, keep_recent=6, fold_tokens=None, excerpt_chars=160, refill_ratio=0.75):
+        self.model = model
+        self.max_tokens = max_tokens or budget_for_model(model)
+        self.keep_recent = keep_recent
+        # Espacio reservado para la nota con los turnos resumidos
+        self.fold_tokens = fold_tokens if fold_tokens is not None else self.max_tokens // 10
+        self.excerpt_chars = excerpt_chars
+        # Fracción del presupuesto que se ocupa tras un recorte (el resto es margen para los turnos siguientes)
+        self.refill_ratio = refill_ratio
+        self._fold_start = None
+        self._fold_note = None
+
+    def message_tokens(self, message):
+        content = message.get("content") or ""
+        if not isinstance(content, str):
+            content = str(content)
+        return MESSAGE_OVERHEAD + count_text_tokens(content, self.model)
+
+    def fit(self, conversation):
+        """Devuelve (mensajes a enviar, informe) sin modificar conversation"""
+        costs = [self.message_tokens(msg) for msg in conversation]
+        total = sum(costs)
+        report = {"budget": self.max_tokens, "total_tokens": total, "sent_tokens": total,
+                  "saved_tokens": 0, "dropped_messages": 0}
+        if total <= self.max_tokens:
+            self._fold_start = self._fold_note = None
+            return [api_message(msg) for msg in conversation], report
+
+        has_system = bool(conversation) and conversation[0].get("role") == "system"
+        head = 1 if has_system else 0
+        system_cost = costs[0] if has_system else 0
+
+        # Reutilizar el corte anterior mientras quepa: mismo prefijo, misma caché
+        start = self._fold_start
+        if start is not None and head < start < len(conversation):
+            note_cost = self.message_tokens(self._fold_note) if self._fold_note else 0
+            if system_cost + note_cost + sum(costs[start:]) > self.max_tokens:
+                start = None
+        else:
+            start = None
+        if start is None:
+            room = self.max_tokens - system_cost
+            start = self._cut(conversation, costs, head, int(self.max_tokens * self.refill_ratio) - system_cost, room)
+            dropped = conversation[head:start]
+            self._fold_start = start
+            self._fold_note = self._fold(dropped, room - sum(costs[start:])) if dropped else None
+
+        messages = [api_message(msg) for msg in conversation[:head]]
+        if self._fold_note is not None:
+            messages.append(self._fold_note)
+        messages.extend(api_message(msg) for msg in conversation[start:])
+
+        sent = sum(self.message_tokens(msg) for msg in messages)
+        report.update(sent_tokens=sent, saved_tokens=total - sent, dropped_messages=start - head)
+        return messages, report
+
+    def _cut(self, conversation, costs, head, target, room):
+        """Índice del primer mensaje conservado: se llena hasta target sin pasar de room"""
+        # Conservar turnos desde el final mientras quepan. Los keep_recent últimos
+        # pueden usar el espacio reservado para el resumen y el margen de
+        # histéresis, pero nunca exceder el presupuesto (salvo el último
+        # mensaje, que siempre se envía).
+        start = len(conversation)
+        used = 0
+        while start > head:
+            cost = costs[start - 1]
+            kept = len(conversation) - start
+            if used + cost > target - self.fold_tokens and kept >= self.keep_recent:
+                break
+            if used + cost > room and kept >= 1:
+                break
+            used += cost
+            start -= 1
+        # No empezar con una respuesta del agente sin su pregunta
+        while start < len(conversation) - 1 and conversation[start].get("role") == "assistant":
+            start += 1
+        return start
+
+    def _fold(self, dropped, room):
+        """Resume los turnos omitidos en una nota de sistema que quepa en room tokens"""
+        header = f"Resumen de {len(dropped)} mensajes anteriores omitidos por longitud:"
+        lines = []
+        used = self.message_tokens({"content": header})
+        # Los más recientes primero: son los más relevantes para el turno actual
+        for msg in reversed(dropped):
+            content = msg.get("content") or ""
+            if not isinstance(content, str):
+                content = str(content)
+            excerpt = content[:self.excerpt_chars].replace("\n", " ")
+            if len(content) > self.excerpt_chars:
+                excerpt += "..."
+            line = f"- {msg.get('role', 'unknown')}: {excerpt}"
+            cost = count_text_tokens(line, self.model) + 1
+            if used + cost > min(self.fold_tokens, room):
+                break
+            lines.append(line)
+            used += cost
+        if not lines:
+            return None
+        lines.reverse()
+        return {"role": "system", "content": "\n".join([header] + lines)}
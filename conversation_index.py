@@ -0,0 +1,352 @@
+import os
+import sqlite3
+from datetime import datetime
+from conversation_store import JOURNAL_SUFFIX, read_conversation
+
+# Catálogo persistente de las conversaciones guardadas en logs/.
+# Guarda título, número de mensajes, fechas y tamaño de cada archivo para que
+# el menú no tenga que abrir (ni parsear) cada conversación al arrancar.
+#
+# También mantiene un índice de texto completo (SQLite FTS5) de los mensajes
+# de usuario y agente para el comando "buscar". Al guardar solo se indexan los
+# mensajes nuevos; los archivos modificados fuera del programa se reindexan
+# enteros antes de buscar.
+
+CATALOG_FILENAME = "catalog.db"
+CONVERSATION_PREFIX = "conversation_"
+CONVERSATION_SUFFIX = ".json"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    file TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    messages INTEGER NOT NULL,
+    created TEXT NOT NULL,
+    updated TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+)
+"""
+
+# Sin tildes ni mayúsculas: "canción" encuentra "cancion". El rowid de cada
+# mensaje es (id del archivo << 20) | posición, así que borrar o reindexar un
+# archivo es un rango de rowids y no un recorrido de toda la tabla.
+_SEARCH_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+    "content, role UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')",
+    # Mensajes ya indexados de cada archivo y su mtime/tamaño en ese momento
+    "CREATE TABLE IF NOT EXISTS search_files (id INTEGER PRIMARY KEY, file TEXT NOT NULL UNIQUE, "
+    "messages INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL)",
+)
+POSITION_BITS = 20
+
+SEARCHABLE_ROLES = ("user", "assistant")
+
+# Marcas del fragmento devuelto por snippet() alrededor de cada coincidencia
+MATCH_START, MATCH_END = "\x02", "\x03"
+
+
+def generate_conversation_title(conversation):
+    """Genera un título para la conversación basado en el primer mensaje del usuario"""
+    for msg in conversation:
+        if msg.get("role") == "user":
+            user_message = msg.get("content", "")
+            # Crear título truncando el primer mensaje (máximo 50 caracteres)
+            if len(user_message) > 50:
+                title = user_message[:47] + "..."
+            else:
+                title = user_message
+            return title
+    return "Conversación sin título"
+
+
+def conversation_title(conversation):
+    """Devuelve el título guardado en el mensaje de sistema o genera uno"""
+    for msg in conversation:
+        if msg.get("role") == "system" and "title" in msg:
+            return msg["title"]
+    return generate_conversation_title(conversation)
+
+
+def split_conversation_filename(file_path):
+    """Extrae (fecha, hora) del nombre conversation_<fecha>_<hora>.json"""
+    filename = os.path.basename(file_path)
+    parts = filename[len(CONVERSATION_PREFIX):-len(CONVERSATION_SUFFIX)].split("_")
+    if len(parts) >= 2:
+        return parts[0], parts[1]
+    return None, None
+
+
+def search_expression(text):
+    """Convierte texto libre en una consulta FTS5 segura (todas las palabras, la última como prefijo)"""
+    words = "".join(ch if ch.isalnum() else " " for ch in text).split()
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _created_from_filename(file_path, fallback_ts):
+    date_part, time_part = split_conversation_filename(file_path)
+    try:
+        return datetime.strptime(f"{date_part} {time_part}", "%Y-%m-%d %H-%M-%S").isoformat()
+    except (TypeError, ValueError):
+        return datetime.fromtimestamp(fallback_ts).isoformat(timespec="seconds")
+
+
+class ConversationCatalog:
+    """Índice SQLite de conversaciones, actualizado de forma incremental"""
+
+    def __init__(self, logs_dir):
+        self.logs_dir = logs_dir
+        self.path = os.path.join(logs_dir, CATALOG_FILENAME)
+        self._conn = None
+        self.search_available = True
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(self.logs_dir, exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute(_SCHEMA)
+            try:
+                for statement in _SEARCH_SCHEMA:
+                    self._conn.execute(statement)
+            except sqlite3.OperationalError:
+                # SQLite compilado sin FTS5: el catálogo funciona, la búsqueda no
+                self.search_available = False
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def list_files(self):
+        """Lista (ruta, mtime_ns, tamaño) de las conversaciones, más recientes primero.
+
+        Solo hace stat de cada archivo; nunca lee su contenido. El mtime y el
+        tamaño combinan la instantánea .json y su journal .jsonl.
+        """
+        if not os.path.isdir(self.logs_dir):
+            return []
+        snapshots = {}
+        journals = {}
+        with os.scandir(self.logs_dir) as it:
+            for entry in it:
+                name = entry.name
+                if not name.startswith(CONVERSATION_PREFIX):
+                    continue
+                if name.endswith(CONVERSATION_SUFFIX):
+                    target = snapshots
+                elif name.endswith(JOURNAL_SUFFIX):
+                    target = journals
+                else:
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                target[os.path.splitext(entry.path)[0]] = (st.st_mtime_ns, st.st_size)
+        files = []
+        for base, (mtime_ns, size) in snapshots.items():
+            journal = journals.get(base)
+            if journal is not None:
+                mtime_ns = max(mtime_ns, journal[0])
+                size += journal[1]
+            files.append((base + CONVERSATION_SUFFIX, mtime_ns, size))
+        files.sort(key=lambda item: item[1], reverse=True)
+        return files
+
+    def stat(self, path):
+        """Devuelve (ruta, mtime_ns, tamaño) de una conversación y su journal"""
+        st = os.stat(path)
+        mtime_ns, size = st.st_mtime_ns, st.st_size
+        try:
+            jst = os.stat(os.path.splitext(path)[0] + JOURNAL_SUFFIX)
+            mtime_ns, size = max(mtime_ns, jst.st_mtime_ns), size + jst.st_size
+        except OSError:
+            pass
+        return path, mtime_ns, size
+
+    def entries(self, files):
+        """Devuelve las entradas del catálogo para los archivos indicados.
+
+        Solo se vuelven a leer los archivos cuyo mtime o tamaño cambió desde
+        la última indexación; el resto sale directamente del catálogo.
+        """
+        db = self._db()
+        names = [os.path.basename(path) for path, _, _ in files]
+        cached = {}
+        # SQLite limita el número de parámetros por consulta
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for row in db.execute(
+                f"SELECT file, title, messages, created, updated, size, mtime_ns "
+                f"FROM conversations WHERE file IN ({placeholders})",
+                chunk,
+            ):
+                cached[row[0]] = row
+
+        result = []
+        dirty = False
+        for (path, mtime_ns, size), name in zip(files, names):
+            row = cached.get(name)
+            if row is None or row[5] != size or row[6] != mtime_ns:
+                row = self._index_file(path, mtime_ns, size)
+                if row is None:
+                    continue
+                dirty = True
+            result.append({
+                "path": path,
+                "title": row[1],
+                "messages": row[2],
+                "created": row[3],
+                "updated": row[4],
+                "size": row[5],
+            })
+        if dirty:
+            db.commit()
+        return result
+
+    def _index_file(self, path, mtime_ns, size):
+        try:
+            conversation = read_conversation(path)
+        except Exception:
+            return None
+        # Cambió fuera de este proceso: el texto se reindexa desde cero
+        self._index_messages(path, conversation, mtime_ns, size, full=True)
+        return self._upsert(path, conversation, mtime_ns, size)
+
+    def _index_messages(self, path, conversation, mtime_ns, size, full=False):
+        """Añade al índice de texto los mensajes que aún no estaban (o todos con full)"""
+        if not self.search_available:
+            return
+        db = self._db()
+        name = os.path.basename(path)
+        row = db.execute("SELECT id, messages FROM search_files WHERE file = ?", (name,)).fetchone()
+        if row is None:
+            file_id = db.execute("INSERT INTO search_files (file, messages, mtime_ns, size) VALUES (?, 0, 0, 0)",
+                                 (name,)).lastrowid
+            start = 0
+        else:
+            file_id, start = row
+            if full or start > len(conversation):
+                self._delete_messages(file_id)
+                start = 0
+        base = file_id << POSITION_BITS
+        db.executemany(
+            "INSERT INTO messages_fts (rowid, content, role) VALUES (?, ?, ?)",
+            [(base | position, msg.get("content"), msg.get("role"))
+             for position, msg in enumerate(conversation[start:1 << POSITION_BITS], start)
+             if msg.get("role") in SEARCHABLE_ROLES and isinstance(msg.get("content"), str) and msg.get("content")],
+        )
+        db.execute("UPDATE search_files SET messages = ?, mtime_ns = ?, size = ? WHERE id = ?",
+                   (len(conversation), mtime_ns, size, file_id))
+
+    def _delete_messages(self, file_id):
+        self._db().execute("DELETE FROM messages_fts WHERE rowid BETWEEN ? AND ?",
+                           (file_id << POSITION_BITS, ((file_id + 1) << POSITION_BITS) - 1))
+
+    def _forget(self, name):
+        row = self._db().execute("SELECT id FROM search_files WHERE file = ?", (name,)).fetchone()
+        if row is not None:
+            self._delete_messages(row[0])
+            self._db().execute("DELETE FROM search_files WHERE id = ?", (row[0],))
+
+    def _upsert(self, path, conversation, mtime_ns, size):
+        name = os.path.basename(path)
+        row = (
+            name,
+            conversation_title(conversation),
+            len(conversation),
+            _created_from_filename(path, mtime_ns / 1e9),
+            datetime.fromtimestamp(mtime_ns / 1e9).isoformat(timespec="seconds"),
+            size,
+            mtime_ns,
+        )
+        self._db().execute(
+            "INSERT OR REPLACE INTO conversations "
+            "(file, title, messages, created, updated, size, mtime_ns) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            row,
+        )
+        return row
+
+    def update(self, path, conversation):
+        """Actualiza la entrada de una conversación recién guardada (sin releerla)"""
+        try:
+            _, mtime_ns, size = self.stat(path)
+        except OSError:
+            return
+        self._index_messages(path, conversation, mtime_ns, size)
+        self._upsert(path, conversation, mtime_ns, size)
+        self._db().commit()
+
+    def remove(self, path):
+        """Elimina una conversación del catálogo"""
+        db = self._db()
+        db.execute("DELETE FROM conversations WHERE file = ?", (os.path.basename(path),))
+        if self.search_available:
+            self._forget(os.path.basename(path))
+        db.commit()
+
+    def sync_search(self, files=None):
+        """Reindexa las conversaciones cambiadas fuera del programa y olvida las borradas.
+
+        Solo compara mtime y tamaño (como entries); devuelve cuántas se leyeron.
+        """
+        db = self._db()
+        if not self.search_available:
+            return 0
+        files = self.list_files() if files is None else files
+        indexed = {row[0]: (row[1], row[2]) for row in db.execute("SELECT file, mtime_ns, size FROM search_files")}
+        present = set()
+        reindexed = 0
+        for path, mtime_ns, size in files:
+            name = os.path.basename(path)
+            present.add(name)
+            if indexed.get(name) != (mtime_ns, size):
+                if self._index_file(path, mtime_ns, size) is not None:
+                    reindexed += 1
+        for name in set(indexed) - present:
+            self._forget(name)
+        db.commit()
+        return reindexed
+
+    def search(self, text, limit=20):
+        """Conversaciones que contienen todas las palabras, de más a menos relevante.
+
+        Cada resultado lleva el título, el número de mensajes que coinciden y
+        un fragmento del mejor de ellos con las coincidencias entre
+        MATCH_START y MATCH_END.
+        """
+        expression = search_expression(text)
+        if expression is None or not self.search_available:
+            return []
+        db = self._db()
+        results = {}
+        rows = db.execute(
+            f"SELECT rowid, role, snippet(messages_fts, 0, '{MATCH_START}', '{MATCH_END}', '…', 16) "
+            "FROM messages_fts WHERE messages_fts MATCH ? ORDER BY rank LIMIT ?",
+            (expression, limit * 10),
+        )
+        for rowid, role, snippet in rows:
+            file_id = rowid >> POSITION_BITS
+            hit = results.get(file_id)
+            if hit is None:
+                if len(results) >= limit:
+                    continue
+                hit = results[file_id] = {"position": rowid & ((1 << POSITION_BITS) - 1), "role": role,
+                                          "snippet": snippet, "matches": 0, "title": "Conversación sin título"}
+            hit["matches"] += 1
+        if not results:
+            return []
+        ids = list(results)
+        placeholders = ",".join("?" * len(ids))
+        for file_id, name, title in db.execute(
+                f"SELECT s.id, s.file, c.title FROM search_files s LEFT JOIN conversations c ON c.file = s.file "
+                f"WHERE s.id IN ({placeholders})", ids):
+            results[file_id].update(path=os.path.join(self.logs_dir, name), title=title or results[file_id]["title"])
+        return [hit for hit in results.values() if "path" in hit]
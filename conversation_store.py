@@ -0,0 +1,138 @@
+import os
+import json
+import time
+from file_io import trim_partial_line
+
+# Almacenamiento de conversaciones con journal de solo-anexado.
+#
+# Cada conversación tiene una instantánea conversation_<fecha>_<hora>.json
+# (el mismo formato de siempre) y un journal conversation_<fecha>_<hora>.jsonl
+# donde cada línea es {"i": posición, "m": mensaje}. Guardar un turno solo
+# añade las líneas nuevas al journal; la instantánea se reescribe (de forma
+# atómica) cuando el journal crece demasiado o al cerrar la conversación.
+
+JOURNAL_SUFFIX = ".jsonl"
+
+
+def journal_path(json_path):
+    """Devuelve la ruta del journal asociado a una instantánea .json"""
+    return os.path.splitext(json_path)[0] + JOURNAL_SUFFIX
+
+
+def read_conversation(json_path):
+    """Lee la instantánea y reaplica el journal línea a línea"""
+    conversation = []
+    if os.path.exists(json_path):
+        with open(json_path, "r", encoding="utf-8") as f:
+            conversation = json.load(f)
+    journal = journal_path(json_path)
+    if os.path.exists(journal):
+        with open(journal, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    index, message = record["i"], record["m"]
+                except (ValueError, KeyError, TypeError):
+                    # Línea incompleta por un corte a mitad de escritura
+                    continue
+                if index < len(conversation):
+                    conversation[index] = message
+                else:
+                    conversation.append(message)
+    return conversation
+
+
+def write_json_atomic(path, data, indent=2):
+    """Escribe JSON en un archivo temporal y lo renombra sobre el destino"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ConversationStore:
+    """Persiste una conversación anexando solo los mensajes nuevos"""
+
+    def __init__(self, json_path, fsync_every=8, fsync_interval=2.0, compact_every=200):
+        self.json_path = json_path
+        self.journal_path = journal_path(json_path)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        self._persisted = 0
+        self._journal = None
+        self._journal_records = 0
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+
+    def load(self):
+        """Carga la conversación y deja el store listo para seguir anexando"""
+        conversation = read_conversation(self.json_path)
+        self._persisted = len(conversation)
+        self._journal_records = trim_partial_line(self.journal_path)
+        return conversation
+
+    def _append(self, index, message):
+        if self._journal is None:
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        record = json.dumps({"i": index, "m": message}, ensure_ascii=False, separators=(",", ":"))
+        # Una sola escritura por línea: si se corta, la línea queda incompleta y se ignora
+        self._journal.write(record + "\n")
+        self._journal_records += 1
+        self._unsynced += 1
+
+    def sync(self, conversation):
+        """Anexa al journal los mensajes que aún no se han guardado"""
+        if not os.path.exists(self.json_path):
+            # Primera escritura: crear la instantánea para que la conversación sea visible
+            self.compact(conversation)
+            return
+        for index in range(self._persisted, len(conversation)):
+            self._append(index, conversation[index])
+        self._persisted = len(conversation)
+        if self._journal_records >= self.compact_every:
+            self.compact(conversation)
+        else:
+            self.flush(force=False)
+
+    def replace(self, index, message):
+        """Registra la modificación de un mensaje ya guardado"""
+        if index < self._persisted:
+            self._append(index, message)
+            self.flush(force=False)
+
+    def flush(self, force=True):
+        """Vuelca el journal a disco; el fsync se agrupa por número de líneas o tiempo"""
+        if self._journal is None:
+            return
+        self._journal.flush()
+        if not self._unsynced:
+            return
+        now = time.monotonic()
+        if force or self._unsynced >= self.fsync_every or now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._journal.fileno())
+            self._unsynced = 0
+            self._last_fsync = now
+
+    def compact(self, conversation):
+        """Reescribe la instantánea de forma atómica y vacía el journal"""
+        write_json_atomic(self.json_path, conversation)
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._persisted = len(conversation)
+        self._journal_records = 0
+        self._unsynced = 0
+
+    def close(self, conversation=None):
+        """Cierra el journal; si se pasa la conversación, la compacta"""
+        if conversation is not None:
+            self.compact(conversation)
+        elif self._journal is not None:
+            self.flush()
+            self._journal.close()
+            self._journal = None
@@ -0,0 +1,480 @@
+import os
+import sys
+import time
+import uuid
+import random
+import atexit
+import sqlite3
+import smtplib
+import threading
+from email.message import EmailMessage
+from email.utils import make_msgid
+
+# Bandeja de salida de emails: send_email encola y vuelve enseguida.
+#
+# Los mensajes se guardan en SQLite (sobreviven a un cierre del proceso) y un
+# pool de hilos los entrega en segundo plano. Cada hilo mantiene abierta su
+# conexión SMTP y envía los mensajes en lotes por la misma sesión; los fallos
+# temporales se reintentan con backoff exponencial y los permanentes (o los
+# que agotan los intentos) pasan a "dead" para revisarlos a mano. Los fallos de
+# conexión, autenticación o saludo no son culpa de ningún mensaje: el lote
+# vuelve a la cola con backoff sin gastar intentos.
+#
+# Cada instancia reclama los mensajes con un "lease" (dueño y fecha límite),
+# así que varios procesos pueden compartir la cola (p. ej. el chat y
+# `python email_outbox.py drain`); un mensaje en envío solo se recupera cuando
+# su lease ha caducado.
+#
+#   SMTP_HOST=localhost SMTP_PORT=8025          -> servidor SMTP (sin SMTP_HOST
+#                                                  send_email solo simula el envío)
+#   SMTP_USER / SMTP_PASSWORD                   -> autenticación
+#   SMTP_SECURITY=starttls|ssl|none             -> cifrado (por defecto none)
+#   EMAIL_FROM=agente@example.com               -> remitente
+#   OUTBOX_PATH=logs/outbox.db                  -> cola en disco
+#   OUTBOX_WORKERS=2  OUTBOX_BATCH_SIZE=20      -> hilos y mensajes por sesión
+#   OUTBOX_MAX_ATTEMPTS=6 OUTBOX_RETRY_DELAY=30 -> reintentos (segundos, se duplica)
+#   OUTBOX_DRAIN_TIMEOUT=10                     -> espera al salir del proceso
+#
+#   python email_outbox.py status | dead | requeue | drain
+
+DEFAULT_PATH = os.path.join("logs", "outbox.db")
+
+# Estados de un mensaje
+QUEUED, SENDING, SENT, DEAD = "queued", "sending", "sent", "dead"
+
+# Errores de un mensaje concreto al enviarlo (SMTPNotSupportedError: dirección no ASCII
+# sin SMTPUTF8 en el servidor); cualquier otro error durante el envío invalida la conexión
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError,
+                  smtplib.SMTPNotSupportedError)
+
+
+class SmtpSettings:
+    """Conexión SMTP leída de las variables de entorno"""
+
+    def __init__(self, host, port=25, user=None, password=None, security="none", sender=None, timeout=30.0):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.security = security
+        self.sender = sender or (user if user and "@" in user else "agent@localhost")
+        self.timeout = timeout
+
+    @classmethod
+    def from_env(cls):
+        host = os.getenv("SMTP_HOST")
+        if not host:
+            return None
+        security = os.getenv("SMTP_SECURITY", "none").lower()
+        default_port = {"ssl": 465, "starttls": 587}.get(security, 25)
+        return cls(host, int(os.getenv("SMTP_PORT", default_port)), os.getenv("SMTP_USER") or None,
+                   os.getenv("SMTP_PASSWORD") or None, security, os.getenv("EMAIL_FROM") or None,
+                   float(os.getenv("SMTP_TIMEOUT", "30")))
+
+    def connect(self):
+        if self.security == "ssl":
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.security == "starttls":
+                smtp.starttls()
+        # El saludo se hace aquí para que un fallo de HELO cuente como error de conexión
+        smtp.ehlo_or_helo_if_needed()
+        if self.user:
+            smtp.login(self.user, self.password or "")
+        return smtp
+
+
+class ConnectError(Exception):
+    """No se pudo abrir la sesión SMTP (conexión, TLS, saludo o login)"""
+
+    def __init__(self, error):
+        super().__init__(str(error))
+        self.error = error
+
+
+def is_permanent(error):
+    """Errores que no se arreglan reintentando (respuestas SMTP 5xx o un mensaje que no se puede construir)"""
+    if isinstance(error, (ValueError, TypeError, smtplib.SMTPNotSupportedError)):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+class Outbox:
+    """Cola SQLite de emails con un pool de hilos que los entrega por SMTP"""
+
+    def __init__(self, path, settings, workers=2, batch_size=20, max_attempts=6, retry_delay=30.0,
+                 max_retry_delay=600.0, lease=None):
+        self.path = path
+        self.settings = settings
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        # Tiempo máximo de un lote: conexión más un timeout por mensaje
+        self.lease = lease or settings.timeout * (batch_size + 2)
+        self._owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._stopping = False
+        self._threads = []
+        self._inflight = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id TEXT PRIMARY KEY, recipient TEXT NOT NULL, subject TEXT NOT NULL, body TEXT NOT NULL, "
+            "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL, "
+            "last_error TEXT, created REAL NOT NULL, sent REAL, owner TEXT, lease_until REAL)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(outbox)")}
+        for column in ("owner TEXT", "lease_until REAL"):
+            if column.split()[0] not in columns:
+                self._db.execute(f"ALTER TABLE outbox ADD COLUMN {column}")
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt)")
+        self._db.commit()
+
+    # --- cola -----------------------------------------------------------
+
+    def enqueue(self, to, subject, body):
+        """Guarda el mensaje y devuelve su ID; la entrega ocurre en segundo plano.
+
+        Lanza ValueError si el destinatario o el asunto tienen saltos de línea
+        (no caben en una cabecera).
+        """
+        if any(ch in value for value in (to, subject) for ch in "\r\n"):
+            raise ValueError("recipient and subject must not contain line breaks")
+        message_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO outbox (id, recipient, subject, body, status, next_attempt, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (message_id, to, subject, body, QUEUED, time.time(), time.time()),
+            )
+            self._db.commit()
+            self._wake.notify()
+        self.start()
+        return message_id
+
+    def status(self, message_id):
+        """(estado, intentos, último error) de un mensaje, o None"""
+        with self._lock:
+            return self._db.execute("SELECT status, attempts, last_error FROM outbox WHERE id = ?",
+                                    (message_id,)).fetchone()
+
+    def counts(self):
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+    def dead(self, limit=50):
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, recipient, subject, attempts, last_error FROM outbox WHERE status = ? "
+                "ORDER BY created DESC LIMIT ?", (DEAD, limit)).fetchall()
+
+    def requeue_dead(self):
+        """Vuelve a encolar los mensajes muertos con los intentos a cero"""
+        with self._lock:
+            count = self._db.execute(
+                "UPDATE outbox SET status = ?, attempts = 0, next_attempt = ?, last_error = NULL WHERE status = ?",
+                (QUEUED, time.time(), DEAD)).rowcount
+            self._db.commit()
+            self._wake.notify_all()
+        return count
+
+    def _claim(self):
+        """Marca como enviándose un lote de mensajes pendientes y lo devuelve.
+
+        También recupera los mensajes cuyo lease caducó (un proceso que se
+        cerró a mitad de envío). BEGIN IMMEDIATE evita que otro proceso
+        reclame las mismas filas entre la consulta y la actualización.
+        """
+        now = time.time()
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._db.execute(
+                "SELECT id, recipient, subject, body, attempts FROM outbox "
+                "WHERE (status = ? AND next_attempt <= ?) OR (status = ? AND COALESCE(lease_until, 0) <= ?) "
+                "ORDER BY next_attempt LIMIT ?", (QUEUED, now, SENDING, now, self.batch_size)).fetchall()
+            self._db.executemany("UPDATE outbox SET status = ?, owner = ?, lease_until = ? WHERE id = ?",
+                                 [(SENDING, self._owner, now + self.lease, row[0]) for row in rows])
+            self._db.commit()
+        except BaseException:
+            self._db.rollback()
+            raise
+        self._inflight += len(rows)
+        return rows
+
+    def _next_due(self):
+        """Próximo momento en que habrá algo que reclamar (un reintento o un lease que caduca)"""
+        row = self._db.execute(
+            "SELECT MIN(CASE WHEN status = ? THEN next_attempt ELSE COALESCE(lease_until, 0) END) "
+            "FROM outbox WHERE status IN (?, ?)", (QUEUED, QUEUED, SENDING)).fetchone()
+        return row[0]
+
+    def _retry_delay(self, failures):
+        # Backoff exponencial con jitter para no reintentar todos a la vez
+        return min(self.max_retry_delay, self.retry_delay * 2 ** failures) * random.uniform(0.5, 1.0)
+
+    def _finish(self, results, deferred=(), failures=0):
+        """Guarda el resultado de un lote en una sola transacción.
+
+        deferred son los mensajes que no llegaron a enviarse por un fallo de
+        conexión: vuelven a la cola sin sumar un intento, con un backoff según
+        los fallos de conexión seguidos (failures).
+        """
+        now = time.time()
+        updates = []
+        for (message_id, attempts), error in results:
+            if error is None:
+                updates.append((SENT, attempts + 1, now, None, now, message_id))
+            elif is_permanent(error) or attempts + 1 >= self.max_attempts:
+                updates.append((DEAD, attempts + 1, now, _describe(error), None, message_id))
+            else:
+                updates.append((QUEUED, attempts + 1, now + self._retry_delay(attempts), _describe(error), None,
+                                message_id))
+        for message_id, attempts, error in deferred:
+            updates.append((QUEUED, attempts, now + self._retry_delay(failures), _describe(error), None, message_id))
+        with self._lock:
+            # Solo las filas que siguen siendo nuestras (el lease no caducó y otro proceso no las tomó)
+            self._db.executemany(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, last_error = ?, sent = ?, "
+                "owner = NULL, lease_until = NULL WHERE id = ? AND owner = ?",
+                [update + (self._owner,) for update in updates])
+            self._db.commit()
+            self._inflight -= len(updates)
+            self._wake.notify_all()
+
+    # --- entrega ----------------------------------------------------------
+
+    def _message(self, recipient, subject, body):
+        message = EmailMessage()
+        message["From"] = self.settings.sender
+        message["To"] = recipient
+        message["Subject"] = subject
+        message["Message-ID"] = make_msgid()
+        message.set_content(body)
+        return message
+
+    def _connect(self):
+        try:
+            return self.settings.connect()
+        except OSError as e:
+            raise ConnectError(e) from e
+
+    def _send(self, smtp, message):
+        """Envía por la conexión abierta; si el servidor la había cerrado se reabre una vez"""
+        if smtp is not None:
+            try:
+                smtp.send_message(message)
+                return smtp
+            except smtplib.SMTPServerDisconnected:
+                _close(smtp)
+        smtp = self._connect()
+        smtp.send_message(message)
+        return smtp
+
+    def _deliver(self, smtp, rows):
+        """Envía un lote por la misma sesión; devuelve (conexión, resultados, aplazados)"""
+        results = []
+        deferred = []
+        for index, (message_id, recipient, subject, body, attempts) in enumerate(rows):
+            try:
+                message = self._message(recipient, subject, body)
+            except (ValueError, TypeError) as e:
+                # Cabeceras imposibles (p. ej. filas antiguas con saltos de línea): no se reintenta
+                results.append(((message_id, attempts), e))
+                continue
+            try:
+                smtp = self._send(smtp, message)
+                results.append(((message_id, attempts), None))
+            except MESSAGE_ERRORS as e:
+                # Rechazo de este mensaje: la sesión sigue siendo válida salvo un 421
+                results.append(((message_id, attempts), e))
+                if isinstance(e, smtplib.SMTPResponseException) and e.smtp_code == 421:
+                    smtp = _close(smtp)
+            except ConnectError as e:
+                # Conexión, TLS, saludo o login: aunque la respuesta sea un 5xx no es culpa
+                # de ningún mensaje, así que el resto del lote se aplaza sin gastar intentos
+                deferred.extend((row[0], row[4], e.error) for row in rows[index:])
+                smtp = None
+                break
+            except OSError as e:
+                # La sesión se cayó a mitad de este mensaje (smtplib.SMTPException también es
+                # OSError): cuenta como un intento suyo y el resto del lote se aplaza
+                smtp = _close(smtp)
+                results.append(((message_id, attempts), e))
+                deferred.extend((row[0], row[4], e) for row in rows[index + 1:])
+                break
+        return smtp, results, deferred
+
+    def _release(self, rows, error):
+        """Devuelve a la cola un lote que falló de forma inesperada.
+
+        Si ni eso es posible (p. ej. la base de datos sigue bloqueada), los
+        mensajes se recuperan cuando caduque su lease.
+        """
+        with self._lock:
+            self._inflight -= len(rows)
+            try:
+                self._db.rollback()
+                self._db.executemany(
+                    "UPDATE outbox SET status = ?, last_error = ?, owner = NULL, lease_until = NULL "
+                    "WHERE id = ? AND owner = ?",
+                    [(QUEUED, _describe(error), row[0], self._owner) for row in rows])
+                self._db.commit()
+            except sqlite3.Error:
+                pass
+            self._wake.notify_all()
+
+    def _worker(self):
+        smtp = None
+        failures = 0
+        try:
+            while True:
+                rows = []
+                try:
+                    with self._lock:
+                        rows = self._claim()
+                        while not rows and not self._stopping:
+                            due = self._next_due()
+                            timeout = 30.0 if due is None else min(30.0, max(0.0, due - time.time()))
+                            if not self._wake.wait(timeout) and due is None:
+                                # Sin trabajo durante un rato: se libera la conexión
+                                smtp = _close(smtp)
+                            rows = self._claim()
+                        if not rows:
+                            return
+                    smtp, results, deferred = self._deliver(smtp, rows)
+                    failures = failures + 1 if deferred else 0
+                    self._finish(results, deferred, failures - 1)
+                except Exception as e:
+                    # Un fallo inesperado (p. ej. "database is locked") no debe acabar con el
+                    # hilo: start() no lo vuelve a lanzar. Se avisa y se reintenta con backoff
+                    print(f"outbox: error en {threading.current_thread().name}: {_describe(e)}", file=sys.stderr)
+                    smtp = _close(smtp)
+                    if rows:
+                        self._release(rows, e)
+                    failures += 1
+                    with self._lock:
+                        if not self._stopping:
+                            self._wake.wait(self._retry_delay(failures - 1))
+        finally:
+            if smtp is not None:
+                try:
+                    smtp.quit()
+                except OSError:
+                    pass
+
+    def start(self):
+        """Arranca el pool de hilos (una vez)"""
+        with self._lock:
+            if self._threads or self._stopping:
+                return
+            self._threads = [threading.Thread(target=self._worker, name=f"outbox-{i}", daemon=True)
+                             for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def drain(self, timeout=None):
+        """Espera a que no quede nada listo para enviar; devuelve True si se vació"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            while True:
+                due = self._next_due()
+                if self._inflight == 0 and (due is None or due > time.time()):
+                    return True
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._wake.wait(min(remaining, 1.0) if remaining is not None else 1.0)
+
+    def close(self, drain_timeout=0.0):
+        if drain_timeout and self._threads:
+            self.drain(drain_timeout)
+        with self._lock:
+            self._stopping = True
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        if any(thread.is_alive() for thread in self._threads):
+            # Un hilo sigue esperando al servidor SMTP: guardará su resultado al terminar
+            return
+        with self._lock:
+            self._db.close()
+
+
+def _describe(error):
+    return f"{type(error).__name__}: {error}"
+
+
+def _close(smtp):
+    if smtp is not None:
+        try:
+            smtp.close()
+        except OSError:
+            pass
+    return None
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox():
+    """Bandeja de salida del proceso, o None si SMTP_HOST no está configurado"""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            settings = SmtpSettings.from_env()
+            if settings is None:
+                return None
+            _outbox = Outbox(
+                os.getenv("OUTBOX_PATH") or DEFAULT_PATH, settings,
+                workers=int(os.getenv("OUTBOX_WORKERS", "2")),
+                batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", "20")),
+                max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6")),
+                retry_delay=float(os.getenv("OUTBOX_RETRY_DELAY", "30")),
+            )
+            # Al salir se da un margen para entregar lo encolado; lo que quede sigue en disco
+            atexit.register(_outbox.close, float(os.getenv("OUTBOX_DRAIN_TIMEOUT", "10")))
+        return _outbox
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Bandeja de salida de emails")
+    parser.add_argument("command", choices=["status", "dead", "requeue", "drain"])
+    parser.add_argument("--timeout", type=float, default=None, help="segundos máximos para drain")
+    args = parser.parse_args(argv)
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    outbox = get_outbox()
+    if outbox is None:
+        sys.exit("SMTP_HOST no está configurado")
+    if args.command == "status":
+        for status, count in sorted(outbox.counts().items()):
+            print(f"{status:<8} {count}")
+    elif args.command == "dead":
+        for message_id, recipient, subject, attempts, error in outbox.dead():
+            print(f"{message_id}  {recipient}  {subject!r}  intentos={attempts}  {error}")
+    elif args.command == "requeue":
+        print(f"{outbox.requeue_dead()} mensajes encolados de nuevo")
+    else:
+        outbox.start()
+        print("Cola vacía" if outbox.drain(args.timeout) else "Tiempo agotado; quedan mensajes pendientes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import os
+
+# Utilidades de archivos compartidas por los registros en modo append
+# (diario de conversaciones, salida JSONL de los runners).
+
+
+def trim_partial_line(path):
+    """Recorta una última línea incompleta (escritura interrumpida) para no pegarle la siguiente.
+
+    Devuelve el número de líneas completas que quedan en el archivo.
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+        return data.count(b"\n")
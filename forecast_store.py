@@ -0,0 +1,142 @@
+import time
+import threading
+import numpy as np
+from tool_cache import coordinate_key
+from weather import fetch_forecast, weather_cache_ttl
+
+# Pronóstico horario en memoria, como arrays de NumPy por ubicación.
+#
+# La primera consulta de una ubicación descarga el pronóstico (fetch_forecast)
+# y convierte cada serie horaria en un array; hasta que caduca, las preguntas
+# de seguimiento (valores por hora, mínimo/máximo/media en una ventana, horas
+# hasta que una variable cruza un umbral) se responden con operaciones
+# vectorizadas sin otra petición HTTP.
+
+# Variables horarias disponibles (las que pide fetch_forecast)
+FORECAST_VARIABLES = ("temperature_2m", "relative_humidity_2m", "wind_speed_10m",
+                      "precipitation_probability", "precipitation")
+
+
+def _format_time(moment):
+    return str(moment).replace("T", " ")
+
+
+class Forecast:
+    """Serie horaria de una ubicación: tiempos locales y un array por variable"""
+
+    def __init__(self, data, expires):
+        hourly = data["hourly"]
+        self.times = np.array(hourly["time"], dtype="datetime64[m]")
+        # Los huecos (null) se convierten en NaN para que no rompan min/max/mean
+        self.values = {name: np.array(values, dtype=float) for name, values in hourly.items() if name != "time"}
+        self.current = data.get("current") or {}
+        self.offset = np.timedelta64(int(data.get("utc_offset_seconds") or 0), "s")
+        self.expires = expires
+
+    def now(self):
+        """Hora local de la ubicación"""
+        return np.datetime64(int(time.time()), "s") + self.offset
+
+    def window(self, start_hour=0, hours=24):
+        """Slice de la ventana que empieza start_hour horas después de la hora actual"""
+        base = max(0, int(np.searchsorted(self.times, self.now(), side="right")) - 1)
+        start = min(len(self.times), base + max(0, start_hour))
+        return slice(start, min(len(self.times), start + max(1, hours)))
+
+    def series(self, variable):
+        values = self.values.get(variable)
+        if values is None:
+            raise ValueError(f"unknown variable '{variable}'")
+        return values
+
+    def hourly(self, variable, start_hour=0, hours=24):
+        """[(hora, valor)] en la ventana"""
+        window = self.window(start_hour, hours)
+        return list(zip(map(_format_time, self.times[window]), self.series(variable)[window].tolist()))
+
+    def summary(self, variable, start_hour=0, hours=24):
+        """Mínimo, máximo y media en la ventana, con la hora del mínimo y del máximo"""
+        window = self.window(start_hour, hours)
+        values = self.series(variable)[window]
+        times = self.times[window]
+        if not values.size or np.isnan(values).all():
+            return None
+        low, high = int(np.nanargmin(values)), int(np.nanargmax(values))
+        return {
+            "start": _format_time(times[0]),
+            "end": _format_time(times[-1]),
+            "min": float(values[low]),
+            "min_time": _format_time(times[low]),
+            "max": float(values[high]),
+            "max_time": _format_time(times[high]),
+            "mean": round(float(np.nanmean(values)), 2),
+        }
+
+    def hours_until(self, variable, threshold, start_hour=0):
+        """Horas desde ahora hasta que la variable cruza el umbral y la hora en que ocurre.
+
+        Si el valor actual está por debajo del umbral se busca el primer valor
+        que lo alcanza, y al revés si está por encima. Devuelve None si no lo
+        cruza dentro del pronóstico.
+        """
+        window = self.window(start_hour, len(self.times))
+        values = self.series(variable)[window]
+        if not values.size:
+            return None
+        mask = values >= threshold if values[0] < threshold else values <= threshold
+        hits = np.flatnonzero(mask)
+        if not hits.size:
+            return None
+        index = int(hits[0])
+        return max(0, start_hour) + index, _format_time(self.times[window][index]), float(values[index])
+
+
+class ForecastStore:
+    """Pronósticos por celda de la rejilla, válidos durante ttl segundos"""
+
+    def __init__(self, ttl=600.0, maxsize=256, fetch=fetch_forecast):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.fetch = fetch
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, latitude, longitude):
+        """Pronóstico de unas coordenadas; solo se descarga si no hay uno vigente"""
+        key = coordinate_key(latitude, longitude)
+        now = time.time()
+        with self._lock:
+            forecast = self._entries.get(key)
+            if forecast is not None and forecast.expires > now:
+                self.hits += 1
+                return forecast
+        data = self.fetch(latitude, longitude)
+        expires = now + self.ttl
+        cache = getattr(self.fetch, "cache", None)
+        if cache is not None:
+            # Los datos pueden venir de la caché de fetch_forecast: no deben durar más que allí
+            expires = min(expires, cache.expires(key) or expires)
+        forecast = Forecast(data, expires)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = forecast
+            if len(self._entries) > self.maxsize:
+                # Primero los caducados; si no basta, los más antiguos
+                for old in [k for k, f in self._entries.items() if f.expires <= now] or list(self._entries)[:1]:
+                    del self._entries[old]
+        return forecast
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_forecast_store():
+    """Almacén de pronósticos compartido del proceso"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ForecastStore(ttl=weather_cache_ttl())
+        return _store
@@ -0,0 +1,178 @@
+import os
+import math
+import heapq
+import bisect
+import difflib
+import threading
+import unicodedata
+from collections import namedtuple
+
+# Nomenclátor offline para resolver ciudades sin llamar a ninguna API.
+#
+# Las ciudades se cargan una vez desde un TSV compacto (data/cities.tsv o
+# GAZETTEER_PATH). Los nombres y alias normalizados (sin tildes ni mayúsculas)
+# van a un diccionario para la búsqueda exacta y a una lista ordenada para la
+# búsqueda por prefijo con bisect; si no hay coincidencias se prueba una
+# búsqueda aproximada con difflib. La ciudad más cercana a unas coordenadas se
+# obtiene con un k-d tree sobre puntos de la esfera unidad.
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cities.tsv")
+
+EARTH_RADIUS_KM = 6371.0
+
+City = namedtuple("City", "name aliases country_code country latitude longitude population")
+
+
+def normalize(text):
+    """Clave de búsqueda: sin tildes, en minúsculas y con los separadores simplificados"""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return " ".join("".join(ch if ch.isalnum() else " " for ch in text).split())
+
+
+def _unit_vector(latitude, longitude):
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def _build_tree(points, depth=0):
+    """Nodo (punto, índice, eje, izquierda, derecha) con la mediana del eje como pivote"""
+    if not points:
+        return None
+    axis = depth % 3
+    points.sort(key=lambda p: p[0][axis])
+    mid = len(points) // 2
+    return (points[mid][0], points[mid][1], axis,
+            _build_tree(points[:mid], depth + 1), _build_tree(points[mid + 1:], depth + 1))
+
+
+def _search_tree(node, target, k, heap):
+    # heap guarda (-distancia², índice) de los k mejores candidatos
+    if node is None:
+        return
+    point, index, axis, left, right = node
+    distance = (point[0] - target[0]) ** 2 + (point[1] - target[1]) ** 2 + (point[2] - target[2]) ** 2
+    if len(heap) < k:
+        heapq.heappush(heap, (-distance, index))
+    elif distance < -heap[0][0]:
+        heapq.heapreplace(heap, (-distance, index))
+    diff = target[axis] - point[axis]
+    near, far = (left, right) if diff < 0 else (right, left)
+    _search_tree(near, target, k, heap)
+    if len(heap) < k or diff * diff < -heap[0][0]:
+        _search_tree(far, target, k, heap)
+
+
+class Gazetteer:
+    """Índices de nombres y k-d tree sobre una lista de ciudades"""
+
+    def __init__(self, cities):
+        self.cities = list(cities)
+        self._exact = {}
+        for index, city in enumerate(self.cities):
+            for key in city_keys(city):
+                self._exact.setdefault(key, []).append(index)
+        for indexes in self._exact.values():
+            indexes.sort(key=lambda i: -self.cities[i].population)
+        self._keys = sorted(self._exact)
+        self._tree = _build_tree([(_unit_vector(c.latitude, c.longitude), i) for i, c in enumerate(self.cities)])
+
+    @classmethod
+    def load(cls, path=None):
+        """Lee el TSV: nombre, alias, código de país, país, latitud, longitud, población (miles).
+
+        Sin path se usa GAZETTEER_PATH, leída al cargar (después de load_dotenv()).
+        """
+        path = path or os.getenv("GAZETTEER_PATH") or DEFAULT_PATH
+        cities = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                name, alias, code, country, latitude, longitude, population = line.rstrip("\n").split("\t")
+                cities.append(City(name, tuple(alias.split(",")) if alias else (), code, country,
+                                   float(latitude), float(longitude), int(population) * 1000))
+        return cls(cities)
+
+    def _country_filter(self, country):
+        if not country:
+            return lambda city: True
+        key = normalize(country)
+        if len(key) == 2:
+            # Código ISO: "ES" no debe coincidir con "Estonia"
+            return lambda city: key == city.country_code.casefold()
+        return lambda city: normalize(city.country).startswith(key)
+
+    def search(self, query, limit=5):
+        """Ciudades que coinciden con el nombre (exacto, prefijo o aproximado), más pobladas primero.
+
+        Acepta "Ciudad, País" (nombre o código ISO del país) para desambiguar.
+        """
+        name, _, country = query.rpartition(",") if "," in query else (query, "", "")
+        key = normalize(name)
+        if not key:
+            return []
+        matches = self._country_filter(country)
+        found = []
+
+        def add(indexes):
+            for index in indexes:
+                city = self.cities[index]
+                if index not in found and matches(city):
+                    found.append(index)
+
+        add(self._exact.get(key, ()))
+        if len(found) < limit:
+            # Prefijo: las claves que empiezan por `key` son contiguas en la lista ordenada
+            prefixed = []
+            position = bisect.bisect_left(self._keys, key)
+            while position < len(self._keys) and self._keys[position].startswith(key):
+                prefixed.extend(self._exact[self._keys[position]])
+                position += 1
+            add(sorted(prefixed, key=lambda i: -self.cities[i].population))
+        if not found:
+            for close in difflib.get_close_matches(key, self._keys, n=limit, cutoff=0.75):
+                add(self._exact[close])
+        if not found and country:
+            # País no reconocido (p. ej. escrito en otro idioma): se ignora
+            return self.search(name, limit)
+        return [self.cities[index] for index in found[:limit]]
+
+    def resolve(self, query):
+        """La ciudad más probable para un texto libre, o None"""
+        results = self.search(query, limit=1)
+        return results[0] if results else None
+
+    def nearest(self, latitude, longitude, k=1):
+        """Las k ciudades más cercanas a unas coordenadas como [(ciudad, distancia en km)]"""
+        heap = []
+        _search_tree(self._tree, _unit_vector(latitude, longitude), k, heap)
+        results = []
+        for negative, index in sorted(heap, reverse=True):
+            # Distancia de cuerda en la esfera unidad -> distancia sobre la superficie
+            chord = math.sqrt(-negative)
+            results.append((self.cities[index], 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))))
+        return results
+
+
+def city_keys(city):
+    """Claves normalizadas de una ciudad: nombre y alias"""
+    return {key for key in map(normalize, (city.name, *city.aliases)) if key}
+
+
+def describe(city):
+    return f"{city.name}, {city.country}"
+
+
+_gazetteer = None
+_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """Nomenclátor compartido, cargado la primera vez que se usa"""
+    global _gazetteer
+    if _gazetteer is None:
+        with _lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer.load()
+    return _gazetteer
@@ -0,0 +1,98 @@
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from telemetry import get_telemetry
+
+# Cliente HTTP compartido por las herramientas.
+#
+# Usa una requests.Session con pool de conexiones (keep-alive), timeouts de
+# conexión y lectura, reintentos acotados con backoff exponencial y jitter, y
+# un límite de peticiones simultáneas por host.
+
+# (conexión, lectura) en segundos
+DEFAULT_TIMEOUT = (3.05, 10.0)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class HttpError(Exception):
+    """Error definitivo tras agotar los reintentos"""
+
+
+class HttpClient:
+    """Sesión HTTP con pool, timeouts, reintentos y límite por host"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=3, backoff=0.25, max_backoff=4.0,
+                 per_host_limit=4, pool_maxsize=16):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.per_host_limit = per_host_limit
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._host_limits = {}
+        self._lock = threading.Lock()
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            limit = self._host_limits.get(host)
+            if limit is None:
+                limit = self._host_limits[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return limit
+
+    def _sleep_before_retry(self, attempt, response=None):
+        delay = None
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                delay = min(float(retry_after), self.max_backoff)
+        if delay is None:
+            # Backoff exponencial con "full jitter"
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+        time.sleep(delay)
+
+    def get(self, url, params=None, timeout=None):
+        """GET con reintentos; devuelve la respuesta o lanza HttpError"""
+        last_error = None
+        with self._host_limit(url):
+            for attempt in range(self.retries + 1):
+                response = None
+                try:
+                    response = self.session.get(url, params=params, timeout=timeout or self.timeout)
+                    if response.status_code not in RETRY_STATUS:
+                        response.raise_for_status()
+                        return response
+                    last_error = f"HTTP {response.status_code}"
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    last_error = str(e)
+                except requests.HTTPError as e:
+                    raise HttpError(str(e)) from e
+                if attempt < self.retries:
+                    get_telemetry().note_retry()
+                    self._sleep_before_retry(attempt, response)
+        raise HttpError(f"GET {url} failed after {self.retries + 1} attempts: {last_error}")
+
+    def get_json(self, url, params=None, timeout=None):
+        return self.get(url, params=params, timeout=timeout).json()
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Devuelve el cliente HTTP compartido del proceso"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
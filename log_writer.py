@@ -0,0 +1,114 @@
+import os
+import glob
+import gzip
+import shutil
+import atexit
+import threading
+from datetime import datetime
+
+# Escritor de logs con búfer en memoria.
+#
+# write() solo añade la línea a una lista; un hilo en segundo plano la vuelca
+# al archivo (que se mantiene abierto) cuando se acumulan max_buffer_lines
+# líneas o pasan flush_interval segundos. Cuando el archivo supera max_bytes
+# se rota a <archivo>.1.gz, <archivo>.2.gz, ... conservando backup_count copias.
+# Con timestamps=False las líneas se escriben tal cual (p. ej. JSONL).
+
+
+class BufferedLogWriter:
+    """Sink de log que agrupa escrituras y las vuelca desde un hilo de fondo"""
+
+    def __init__(self, path, max_buffer_lines=64, flush_interval=1.0, max_bytes=5 * 1024 * 1024, backup_count=5,
+                 timestamps=True):
+        self.path = path
+        self.timestamps = timestamps
+        self.max_buffer_lines = max_buffer_lines
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._buffer = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._file = None
+        self._io_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, line):
+        """Encola una línea con su marca de tiempo; no toca el disco"""
+        if self.timestamps:
+            line = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {line}"
+        with self._cond:
+            if self._closed:
+                return
+            self._buffer.append(f"{line}\n")
+            if len(self._buffer) >= self.max_buffer_lines:
+                self._cond.notify()
+
+    def flush(self):
+        """Vuelca el búfer de inmediato desde el hilo que llama"""
+        self._drain()
+
+    def close(self):
+        """Detiene el hilo de fondo, vuelca lo pendiente y cierra el archivo"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        with self._io_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        atexit.unregister(self.close)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._buffer) < self.max_buffer_lines:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            self._drain()
+            if closed:
+                return
+
+    def _drain(self):
+        # El búfer se vacía y se escribe con el mismo candado: un flush() desde
+        # otro hilo no puede adelantar líneas más nuevas a las del hilo de fondo
+        with self._io_lock:
+            with self._cond:
+                lines, self._buffer = self._buffer, []
+            if lines:
+                self._write_locked(lines)
+
+    def _write_locked(self, lines):
+        try:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write("".join(lines))
+            self._file.flush()
+            if self.max_bytes and self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except Exception:
+            # Evitar que errores de logging rompan la conversación
+            pass
+
+    def _rotate(self):
+        """Comprime el archivo actual y desplaza los archivos ya rotados"""
+        self._file.close()
+        self._file = None
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}.gz"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}.gz")
+        if self.backup_count > 0:
+            with open(self.path, "rb") as src, gzip.open(f"{self.path}.1.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+
+
+def log_archives(path):
+    """Devuelve los archivos rotados (.N.gz) de un log"""
+    return glob.glob(glob.escape(path) + ".*.gz")
@@ -0,0 +1,578 @@
+import json
+import time
+import email.parser
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Servidor local que imita la API de OpenAI para pruebas y benchmarks sin red.
+#
+# Implementa POST /v1/responses (con streaming, function_call y
+# previous_response_id), POST /v1/chat/completions (con streaming) y un
+# GET /v1/forecast con la forma de Open-Meteo. También simula la Batch API:
+# POST /v1/files (purpose=batch), GET /v1/files/<id>/content y
+# POST/GET /v1/batches, que termina el lote --batch-delay segundos después de
+# crearlo procesando cada línea como una petición normal. Uso:
+#
+#   python mock_openai_server.py --port 8080 --latency 0.2 --tokens-per-second 80
+#   OPENAI_BASE_URL=http://127.0.0.1:8080/v1 OPENAI_API_KEY=test \
+#   OPEN_METEO_URL=http://127.0.0.1:8080/v1/forecast python statefulchat.py
+#
+# Si la petición incluye herramientas, no continúa una respuesta anterior y no
+# trae ningún function_call_output, el modelo simulado llama una vez a cada
+# función con argumentos generados a partir de su esquema; si no, responde
+# con texto.
+
+FILLER = ("este es un texto de relleno generado por el servidor simulado para medir "
+          "la latencia y el rendimiento del cliente sin depender de la red").split()
+
+# Valores de ejemplo para argumentos generados a partir del esquema
+SAMPLE_VALUES = {"latitude": 48.8566, "longitude": 2.3522, "to": "bob@email.com", "location": "Paris, France", "query": "Paris",
+                 "locations": ["Paris, France", "Bogotá, Colombia"]}
+
+
+def estimate_tokens(text):
+    return max(1, (len(text) + 3) // 4)
+
+
+def new_id(prefix):
+    return f"{prefix}_{uuid.uuid4().hex}"
+
+
+def input_text(value):
+    """Aplana el input de la Responses API (o los messages de chat) a texto"""
+    if isinstance(value, str):
+        return value
+    parts = []
+    for item in value or []:
+        if not isinstance(item, dict):
+            continue
+        content = item.get("content", item.get("output", item.get("arguments", "")))
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(str(content or ""))
+    return "\n".join(parts)
+
+
+def last_user_text(value):
+    if isinstance(value, str):
+        return value
+    for item in reversed(value or []):
+        if isinstance(item, dict) and item.get("role") == "user":
+            return input_text([item])
+    return input_text(value)
+
+
+def sample_arguments(parameters):
+    """Genera argumentos válidos para un esquema JSON de parámetros"""
+    args = {}
+    for name, schema in (parameters or {}).get("properties", {}).items():
+        if name not in (parameters or {}).get("required", []) and name not in SAMPLE_VALUES:
+            continue
+        kind = schema.get("type")
+        if name in SAMPLE_VALUES:
+            args[name] = SAMPLE_VALUES[name]
+        elif kind in ("number", "integer"):
+            args[name] = 1
+        elif kind == "boolean":
+            args[name] = True
+        elif kind == "array":
+            args[name] = []
+        elif kind == "object":
+            args[name] = {}
+        else:
+            args[name] = f"example {name}"
+    return args
+
+
+class MockState:
+    """Respuestas guardadas (para previous_response_id) y configuración"""
+
+    def __init__(self, args):
+        self.args = args
+        self.responses = {}
+        self.files = {}
+        self.batches = {}
+        self.lock = threading.Lock()
+        self.random = random.Random(args.seed)
+
+    def remember(self, response, context_tokens):
+        with self.lock:
+            self.responses[response["id"]] = context_tokens
+            # Mantener acotada la memoria del servidor
+            if len(self.responses) > 100000:
+                self.responses.pop(next(iter(self.responses)))
+
+    def context_tokens(self, response_id):
+        with self.lock:
+            return self.responses.get(response_id)
+
+    def add_file(self, filename, purpose, data):
+        file = {"id": new_id("file"), "object": "file", "bytes": len(data), "created_at": int(time.time()),
+                "filename": filename, "purpose": purpose, "status": "processed"}
+        with self.lock:
+            self.files[file["id"]] = (file, data)
+        return file
+
+    def get_file(self, file_id):
+        with self.lock:
+            return self.files.get(file_id)
+
+    def should_fail(self):
+        with self.lock:
+            return self.random.random() < self.args.error_rate
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockOpenAI/0.1"
+
+    def log_message(self, format, *args):
+        if self.server.state.args.verbose:
+            super().log_message(format, *args)
+
+    # --- utilidades -----------------------------------------------------
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length)
+
+    def read_form(self, data):
+        """Campos de un cuerpo multipart/form-data: {nombre: (filename, bytes)}"""
+        message = email.parser.BytesParser().parsebytes(
+            b"Content-Type: " + self.headers.get("Content-Type", "").encode("latin-1") + b"\r\n\r\n" + data)
+        fields = {}
+        for part in message.get_payload() if message.is_multipart() else []:
+            name = part.get_param("name", header="content-disposition")
+            fields[name] = (part.get_filename(), part.get_payload(decode=True))
+        return fields
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_json(self, status, message, error_type="server_error"):
+        self.send_json(status, {"error": {"message": message, "type": error_type, "param": None, "code": None}})
+
+    def start_sse(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+    def send_event(self, payload, event=None):
+        data = json.dumps(payload, ensure_ascii=False)
+        prefix = f"event: {event}\n" if event else ""
+        self.wfile.write(f"{prefix}data: {data}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def token_delay(self):
+        tps = self.server.state.args.tokens_per_second
+        if tps > 0:
+            time.sleep(1.0 / tps)
+
+    def reply_words(self, prompt):
+        excerpt = " ".join(prompt.split()[:12])
+        words = f"Respuesta simulada a: {excerpt}.".split()
+        count = self.server.state.args.output_tokens
+        while len(words) < count:
+            words.append(FILLER[len(words) % len(FILLER)])
+        return [word if i == 0 else " " + word for i, word in enumerate(words[:max(count, 1)])]
+
+    # --- rutas ----------------------------------------------------------
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        parts = path.split("/")
+        if path.endswith("/forecast"):
+            self.forecast()
+        elif len(parts) >= 3 and parts[-3] == "files" and parts[-1] == "content":
+            self.file_content(parts[-2])
+        elif len(parts) >= 2 and parts[-2] == "batches":
+            self.batch_retrieve(parts[-1])
+        elif path.endswith("/models"):
+            self.send_json(200, {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model", "created": 0, "owned_by": "mock"}]})
+        else:
+            self.send_error_json(404, f"Unknown path {self.path}", "invalid_request_error")
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        data = self.read_body()
+        if path.endswith("/files"):
+            body = None
+        else:
+            try:
+                body = json.loads(data or b"{}")
+            except ValueError:
+                self.send_error_json(400, "Invalid JSON body", "invalid_request_error")
+                return
+        state = self.server.state
+        if state.should_fail():
+            status = state.args.error_status
+            if status == 429:
+                self.send_error_json(429, "Rate limit reached (simulated)", "rate_limit_error")
+            else:
+                self.send_error_json(status, "Simulated server error")
+            return
+        if state.args.latency > 0:
+            time.sleep(state.args.latency)
+        if path.endswith("/responses"):
+            self.responses_create(body)
+        elif path.endswith("/chat/completions"):
+            self.chat_completions_create(body)
+        elif path.endswith("/files"):
+            self.file_upload(data)
+        elif path.endswith("/batches"):
+            self.batch_create(body)
+        else:
+            self.send_error_json(404, f"Unknown path {self.path}", "invalid_request_error")
+
+    # --- Responses API --------------------------------------------------
+
+    def responses_create(self, body):
+        state = self.server.state
+        try:
+            response, words = self.build_response(body)
+        except LookupError as e:
+            self.send_error_json(400, str(e), "invalid_request_error")
+            return
+        if not body.get("stream"):
+            if state.args.tokens_per_second > 0:
+                time.sleep(response["usage"]["output_tokens"] / state.args.tokens_per_second)
+            self.send_json(200, response)
+            return
+        self.stream_response(response, words)
+
+    def build_response(self, body):
+        """Genera la respuesta simulada (y sus palabras para el streaming)"""
+        state = self.server.state
+        previous_id = body.get("previous_response_id")
+        previous_tokens = 0
+        if previous_id:
+            previous_tokens = state.context_tokens(previous_id)
+            if previous_tokens is None:
+                raise LookupError(f"Previous response with id '{previous_id}' not found.")
+
+        items = body.get("input")
+        tools = [tool for tool in body.get("tools") or [] if tool.get("type") == "function"]
+        has_outputs = isinstance(items, list) and any(
+            isinstance(item, dict) and item.get("type") == "function_call_output" for item in items
+        )
+        prompt = (body.get("instructions") or "") + "\n" + json.dumps(body.get("tools") or []) + "\n" + input_text(items)
+        input_tokens = previous_tokens + estimate_tokens(prompt)
+        # Caché de prefijo simulada: el contexto de la respuesta anterior, en bloques de 128 tokens
+        cached_tokens = (previous_tokens // 128) * 128
+
+        if tools and not has_outputs and not previous_id:
+            output = [{
+                "type": "function_call",
+                "id": new_id("fc"),
+                "call_id": new_id("call"),
+                "name": tool["name"],
+                "arguments": json.dumps(sample_arguments(tool.get("parameters"))),
+                "status": "completed",
+            } for tool in tools]
+            words = []
+            output_tokens = sum(estimate_tokens(item["arguments"]) for item in output)
+        else:
+            words = self.reply_words(last_user_text(items))
+            output = [{
+                "type": "message",
+                "id": new_id("msg"),
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": "".join(words), "annotations": []}],
+            }]
+            output_tokens = len(words)
+
+        response = {
+            "id": new_id("resp"),
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": body.get("model", "gpt-4o-mini"),
+            "output": output,
+            "instructions": body.get("instructions"),
+            "previous_response_id": previous_id,
+            "tools": body.get("tools") or [],
+            "tool_choice": "auto",
+            "parallel_tool_calls": True,
+            "temperature": body.get("temperature", 1.0),
+            "top_p": 1.0,
+            "text": {"format": {"type": "text"}},
+            "error": None,
+            "incomplete_details": None,
+            "metadata": {},
+            "usage": {
+                "input_tokens": input_tokens,
+                "input_tokens_details": {"cached_tokens": cached_tokens},
+                "output_tokens": output_tokens,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": input_tokens + output_tokens,
+            },
+        }
+        state.remember(response, input_tokens + output_tokens)
+        return response, words
+
+    def stream_response(self, response, words):
+        self.start_sse()
+        seq = iter(range(1_000_000))
+        in_progress = dict(response, status="in_progress", output=[], usage=None)
+        self.send_event({"type": "response.created", "sequence_number": next(seq), "response": in_progress}, "response.created")
+        self.send_event({"type": "response.in_progress", "sequence_number": next(seq), "response": in_progress}, "response.in_progress")
+        for index, item in enumerate(response["output"]):
+            if item["type"] == "function_call":
+                self.send_event({"type": "response.output_item.added", "sequence_number": next(seq), "output_index": index,
+                                 "item": dict(item, arguments="", status="in_progress")}, "response.output_item.added")
+                arguments = item["arguments"]
+                for start in range(0, len(arguments), 8):
+                    self.token_delay()
+                    self.send_event({"type": "response.function_call_arguments.delta", "sequence_number": next(seq),
+                                     "item_id": item["id"], "output_index": index, "delta": arguments[start:start + 8]},
+                                    "response.function_call_arguments.delta")
+                self.send_event({"type": "response.function_call_arguments.done", "sequence_number": next(seq),
+                                 "item_id": item["id"], "output_index": index, "arguments": arguments},
+                                "response.function_call_arguments.done")
+            else:
+                self.send_event({"type": "response.output_item.added", "sequence_number": next(seq), "output_index": index,
+                                 "item": dict(item, content=[], status="in_progress")}, "response.output_item.added")
+                part = {"type": "output_text", "text": "", "annotations": []}
+                self.send_event({"type": "response.content_part.added", "sequence_number": next(seq), "item_id": item["id"],
+                                 "output_index": index, "content_index": 0, "part": part}, "response.content_part.added")
+                for word in words:
+                    self.token_delay()
+                    self.send_event({"type": "response.output_text.delta", "sequence_number": next(seq), "item_id": item["id"],
+                                     "output_index": index, "content_index": 0, "delta": word, "logprobs": []},
+                                    "response.output_text.delta")
+                text = item["content"][0]["text"]
+                self.send_event({"type": "response.output_text.done", "sequence_number": next(seq), "item_id": item["id"],
+                                 "output_index": index, "content_index": 0, "text": text, "logprobs": []},
+                                "response.output_text.done")
+                self.send_event({"type": "response.content_part.done", "sequence_number": next(seq), "item_id": item["id"],
+                                 "output_index": index, "content_index": 0, "part": item["content"][0]},
+                                "response.content_part.done")
+            self.send_event({"type": "response.output_item.done", "sequence_number": next(seq), "output_index": index,
+                             "item": item}, "response.output_item.done")
+        self.send_event({"type": "response.completed", "sequence_number": next(seq), "response": response}, "response.completed")
+
+    # --- Chat Completions -----------------------------------------------
+
+    def chat_completions_create(self, body):
+        state = self.server.state
+        messages = body.get("messages") or []
+        words = self.reply_words(last_user_text(messages))
+        text = "".join(words)
+        prompt_tokens = estimate_tokens(input_text(messages))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words),
+            "prompt_tokens_details": {"cached_tokens": (max(prompt_tokens - estimate_tokens(input_text(messages[-1:])), 0) // 128) * 128},
+        }
+        completion_id = new_id("chatcmpl")
+        created = int(time.time())
+        model = body.get("model", "gpt-4o-mini")
+
+        if not body.get("stream"):
+            if state.args.tokens_per_second > 0:
+                time.sleep(len(words) / state.args.tokens_per_second)
+            self.send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop", "logprobs": None,
+                             "message": {"role": "assistant", "content": text, "refusal": None}}],
+                "usage": usage,
+            })
+            return
+
+        self.start_sse()
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model}
+        self.send_event(dict(chunk, choices=[{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]))
+        for word in words:
+            self.token_delay()
+            self.send_event(dict(chunk, choices=[{"index": 0, "delta": {"content": word}, "finish_reason": None}]))
+        self.send_event(dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self.send_event(dict(chunk, choices=[], usage=usage))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    # --- Files y Batch API -----------------------------------------------
+
+    def file_upload(self, data):
+        fields = self.read_form(data)
+        if "file" not in fields:
+            self.send_error_json(400, "Missing file", "invalid_request_error")
+            return
+        filename, content = fields["file"]
+        purpose = (fields.get("purpose") or (None, b"batch"))[1].decode("utf-8")
+        self.send_json(200, self.server.state.add_file(filename or "upload.jsonl", purpose, content))
+
+    def file_content(self, file_id):
+        stored = self.server.state.get_file(file_id)
+        if stored is None:
+            self.send_error_json(404, f"No such File object: {file_id}", "invalid_request_error")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(stored[1])))
+        self.end_headers()
+        self.wfile.write(stored[1])
+
+    def batch_create(self, body):
+        state = self.server.state
+        stored = state.get_file(body.get("input_file_id"))
+        if stored is None:
+            self.send_error_json(400, f"No such File object: {body.get('input_file_id')}", "invalid_request_error")
+            return
+        lines = [line for line in stored[1].decode("utf-8").splitlines() if line.strip()]
+        now = int(time.time())
+        batch = {
+            "id": new_id("batch"), "object": "batch", "endpoint": body.get("endpoint"), "errors": None,
+            "input_file_id": body["input_file_id"], "completion_window": body.get("completion_window", "24h"),
+            "status": "validating", "output_file_id": None, "error_file_id": None, "created_at": now,
+            "in_progress_at": None, "expires_at": now + 24 * 3600, "finalizing_at": None, "completed_at": None,
+            "failed_at": None, "expired_at": None, "cancelling_at": None, "cancelled_at": None,
+            "request_counts": {"total": len(lines), "completed": 0, "failed": 0},
+            "metadata": body.get("metadata") or {},
+        }
+        # Los mismos límites que la API real, más pequeños si se configuran para probar el troceado
+        if len(lines) > state.args.batch_max_requests or len(stored[1]) > state.args.batch_max_bytes:
+            batch.update(status="failed", failed_at=now, errors={"object": "list", "data": [
+                {"code": "batch_too_large", "message": "The batch input file exceeds the maximum size.", "line": None, "param": None}]})
+        with state.lock:
+            state.batches[batch["id"]] = (time.monotonic(), batch)
+        self.send_json(200, batch)
+
+    def batch_retrieve(self, batch_id):
+        state = self.server.state
+        with state.lock:
+            entry = state.batches.get(batch_id)
+        if entry is None:
+            self.send_error_json(404, f"No such batch: {batch_id}", "invalid_request_error")
+            return
+        started, batch = entry
+        ready = False
+        with state.lock:
+            if batch["status"] in ("validating", "in_progress"):
+                if time.monotonic() - started < state.args.batch_delay:
+                    batch.update(status="in_progress", in_progress_at=batch["in_progress_at"] or int(time.time()))
+                else:
+                    # Solo una petición procesa el lote; las demás lo ven en "finalizing"
+                    batch["status"] = "finalizing"
+                    ready = True
+        if ready:
+            self.run_batch(batch)
+        self.send_json(200, batch)
+
+    def run_batch(self, batch):
+        """Procesa cada línea del archivo de entrada y genera los archivos de salida y de errores"""
+        state = self.server.state
+        outputs, errors = [], []
+        for line in state.get_file(batch["input_file_id"])[1].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            result = {"id": new_id("batch_req"), "custom_id": request.get("custom_id")}
+            body = dict(request.get("body") or {}, stream=False)
+            if request.get("url") != batch["endpoint"]:
+                errors.append(dict(result, response=None, error={"code": "invalid_url", "message": "URL does not match the batch endpoint."}))
+                continue
+            try:
+                if batch["endpoint"].endswith("/responses"):
+                    response, _ = self.build_response(body)
+                else:
+                    raise LookupError(f"Unsupported batch endpoint {batch['endpoint']}")
+                if state.should_fail():
+                    raise LookupError("Simulated server error")
+            except LookupError as e:
+                errors.append(dict(result, response=None, error={"code": "server_error", "message": str(e)}))
+                continue
+            outputs.append(dict(result, response={"status_code": 200, "request_id": new_id("req"), "body": response}, error=None))
+        now = int(time.time())
+        encode = lambda rows: "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode("utf-8")
+        if outputs:
+            batch["output_file_id"] = state.add_file(f"{batch['id']}_output.jsonl", "batch_output", encode(outputs))["id"]
+        if errors:
+            batch["error_file_id"] = state.add_file(f"{batch['id']}_error.jsonl", "batch_output", encode(errors))["id"]
+        batch.update(status="completed", finalizing_at=now, completed_at=now,
+                     request_counts={"total": len(outputs) + len(errors), "completed": len(outputs), "failed": len(errors)})
+
+    # --- Open-Meteo -----------------------------------------------------
+
+    def forecast(self):
+        from urllib.parse import parse_qs, urlsplit
+        query = parse_qs(urlsplit(self.path).query)
+        latitudes = query.get("latitude", ["0"])[0].split(",")
+        longitudes = query.get("longitude", ["0"])[0].split(",")
+        current_fields = [f for f in query.get("current", [""])[0].split(",") if f]
+        hourly_fields = [f for f in query.get("hourly", [""])[0].split(",") if f]
+        now = int(time.time()) // 3600 * 3600
+        hours = [time.strftime("%Y-%m-%dT%H:%M", time.gmtime(now + 3600 * h)) for h in range(168)]
+        locations = []
+        for lat, lon in zip(latitudes, longitudes):
+            base = 25.0 - abs(float(lat)) / 4
+            location = {"latitude": float(lat), "longitude": float(lon), "timezone": "GMT", "utc_offset_seconds": 0}
+            if current_fields:
+                location["current"] = {"time": hours[0], "interval": 900}
+                for field in current_fields:
+                    location["current"][field] = round(base, 1) if field.startswith("temperature") else 10.0
+            if hourly_fields:
+                location["hourly"] = {"time": hours}
+                for field in hourly_fields:
+                    if field.startswith("temperature"):
+                        values = [round(base + 5 * ((h % 24) - 12) / 12, 1) for h in range(168)]
+                    elif field.startswith("precipitation"):
+                        values = [40 if 30 <= h % 48 <= 34 else 0 for h in range(168)]
+                    else:
+                        values = [50.0] * 168
+                    location["hourly"][field] = values
+            locations.append(location)
+        self.send_json(200, locations[0] if len(locations) == 1 else locations)
+
+
+def make_server(args):
+    server = ThreadingHTTPServer((args.host, args.port), MockHandler)
+    server.daemon_threads = True
+    server.state = MockState(args)
+    return server
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local que imita la API de OpenAI (y Open-Meteo)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="segundos antes de empezar a responder")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="velocidad de generación (0 = sin límite)")
+    parser.add_argument("--output-tokens", type=int, default=40, help="longitud de las respuestas de texto")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fracción de peticiones que fallan")
+    parser.add_argument("--error-status", type=int, default=500, choices=[429, 500, 502, 503])
+    parser.add_argument("--batch-delay", type=float, default=1.0, help="segundos hasta que un lote se completa")
+    parser.add_argument("--batch-max-requests", type=int, default=50000, help="peticiones máximas por lote")
+    parser.add_argument("--batch-max-bytes", type=int, default=200 * 1024 * 1024, help="tamaño máximo del archivo de un lote")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    server = make_server(args)
+    print(f"Servidor simulado en http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
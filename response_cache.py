@@ -0,0 +1,270 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Caché en disco de respuestas para peticiones deterministas.
+#
+# La clave es un hash SHA-256 de los parámetros de la petición serializados de
+# forma canónica (modelo, input/messages, instructions, tools, temperature...),
+# así que la misma petición siempre devuelve la misma respuesta guardada. Se
+# activa envolviendo el cliente con cached_client(); con la variable
+# OPENAI_RESPONSE_CACHE sin definir el cliente se devuelve tal cual.
+#
+#   OPENAI_RESPONSE_CACHE=1                   -> logs/response_cache.db
+#   OPENAI_RESPONSE_CACHE=/ruta/cache.db      -> archivo indicado
+#   OPENAI_RESPONSE_CACHE_TTL=86400           -> segundos de validez
+#   create(..., cache=False)                  -> saltarse la caché en una llamada
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _jsonable(value):
+    # Los items del SDK (p. ej. function_call) se serializan como en la petición
+    if hasattr(value, "model_dump"):
+        return value.model_dump(exclude_none=True)
+    return str(value)
+
+
+def request_key(kind, params):
+    """Hash canónico de una petición: el orden de las claves no influye"""
+    canonical = json.dumps({"kind": kind, "params": params}, sort_keys=True, ensure_ascii=False,
+                           separators=(",", ":"), default=_jsonable)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Almacén SQLite con TTL y expulsión LRU por tamaño, más una capa en memoria"""
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, memory_items=256):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, kind TEXT NOT NULL, body TEXT, events TEXT, "
+            "size INTEGER NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    def get(self, key):
+        """Devuelve el objeto ya reconstruido (o los datos en bruto) si está en caché"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > now:
+                self._memory.move_to_end(key)
+                return entry[1]
+            row = self._db.execute("SELECT body, events, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[2] + self.ttl <= now:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            return {"body": json.loads(row[0]) if row[0] else None,
+                    "events": json.loads(row[1]) if row[1] else None,
+                    "expires": row[2] + self.ttl}
+
+    def remember(self, key, value, expires):
+        """Guarda en memoria el objeto reconstruido para repeticiones en microsegundos"""
+        with self._lock:
+            self._memory[key] = (expires, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def put(self, key, kind, body=None, events=None):
+        body_json = json.dumps(body, ensure_ascii=False) if body is not None else None
+        events_json = json.dumps(events, ensure_ascii=False) if events is not None else None
+        size = len(body_json or "") + len(events_json or "")
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, kind, body, events, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, body_json, events_json, size, now, now),
+            )
+            self._evict()
+            self._db.commit()
+        return now + self.ttl
+
+    def _evict(self):
+        self._db.execute("DELETE FROM responses WHERE created <= ?", (time.time() - self.ttl,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Expulsar las entradas usadas hace más tiempo hasta volver al límite
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+
+class _ReplayStream:
+    """Stream reproducido desde la caché con la misma interfaz iterable"""
+
+    def __init__(self, events):
+        self._events = events
+
+    def __iter__(self):
+        return iter(self._events)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+
+class _RecordingStream:
+    """Envuelve un stream real, guarda sus eventos y los almacena al terminar"""
+
+    def __init__(self, stream, on_complete):
+        self._stream = stream
+        self._on_complete = on_complete
+
+    def __iter__(self):
+        events = []
+        for event in self._stream:
+            events.append(event)
+            yield event
+        self._on_complete(events)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        close = getattr(self._stream, "close", None)
+        if close is not None:
+            close()
+
+
+class _CachedCreate:
+    """Envuelve un recurso del SDK (responses o chat.completions) cacheando create()"""
+
+    def __init__(self, resource, kind, cache):
+        self._resource = resource
+        self._kind = kind
+        self._cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self._resource, name)
+
+    def _parse_body(self, body):
+        if self._kind == "responses":
+            from openai.types.responses import Response
+            return Response.model_validate(body)
+        from openai.types.chat import ChatCompletion
+        return ChatCompletion.model_validate(body)
+
+    def _parse_events(self, events):
+        from pydantic import TypeAdapter
+        if self._kind == "responses":
+            from openai.types.responses import ResponseStreamEvent
+            adapter = TypeAdapter(ResponseStreamEvent)
+            return [adapter.validate_python(event) for event in events]
+        from openai.types.chat import ChatCompletionChunk
+        return [ChatCompletionChunk.model_validate(event) for event in events]
+
+    def _completed(self, events):
+        if self._kind == "responses":
+            return any(event.type == "response.completed" for event in events)
+        return any(choice.finish_reason for event in events for choice in event.choices)
+
+    def create(self, cache=True, **params):
+        if not cache or os.getenv("OPENAI_RESPONSE_CACHE_BYPASS"):
+            return self._resource.create(**params)
+        key = request_key(self._kind, params)
+        stream = bool(params.get("stream"))
+        entry = self._cache.get(key)
+        if entry is not None:
+            if isinstance(entry, dict):
+                # Primera lectura desde disco: reconstruir y guardar en memoria.
+                # Si el SDK ya no acepta lo guardado, se trata como un fallo de caché.
+                value = None
+                try:
+                    if stream and entry["events"] is not None:
+                        value = self._parse_events(entry["events"])
+                    elif not stream and entry["body"] is not None:
+                        value = self._parse_body(entry["body"])
+                except ValueError:
+                    value = None
+                if value is not None:
+                    self._cache.remember(key, value, entry["expires"])
+                entry = value
+            if entry is not None:
+                return _ReplayStream(entry) if stream else entry
+
+        result = self._resource.create(**params)
+        if stream:
+            def store(events):
+                if self._completed(events):
+                    dumped = [event.model_dump(mode="json", exclude_unset=True) for event in events]
+                    expires = self._cache.put(key, self._kind, events=dumped)
+                    self._cache.remember(key, events, expires)
+            return _RecordingStream(result, store)
+        if getattr(result, "status", "completed") == "completed":
+            expires = self._cache.put(key, self._kind, body=result.model_dump(mode="json", exclude_unset=True))
+            self._cache.remember(key, result, expires)
+        return result
+
+
+class _CachedChat:
+    def __init__(self, chat, cache):
+        self._chat = chat
+        self.completions = _CachedCreate(chat.completions, "chat.completions", cache)
+
+    def __getattr__(self, name):
+        return getattr(self._chat, name)
+
+
+class CachedClient:
+    """Cliente OpenAI con caché en responses.create y chat.completions.create"""
+
+    def __init__(self, client, cache):
+        self._client = client
+        self.cache = cache
+        self.responses = _CachedCreate(client.responses, "responses", cache)
+        self.chat = _CachedChat(client.chat, cache)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def cached_client(client, path=None, ttl=None):
+    """Envuelve el cliente con la caché si OPENAI_RESPONSE_CACHE (o path) está definido"""
+    setting = path or os.getenv("OPENAI_RESPONSE_CACHE")
+    if not setting or setting == "0":
+        return client
+    if setting == "1":
+        setting = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "response_cache.db")
+    ttl = ttl or float(os.getenv("OPENAI_RESPONSE_CACHE_TTL", DEFAULT_TTL))
+    return CachedClient(client, ResponseCache(setting, ttl=ttl))
@@ -1,14 +1,20 @@
+import time
+_START = time.perf_counter()
 import os
-import dotenv
-import json
-import glob
-from openai import OpenAI
+import sys
+import threading
 from datetime import datetime
+from conversation_index import (ConversationCatalog, MATCH_END, MATCH_START, generate_conversation_title,
+                                split_conversation_filename)
+from conversation_store import ConversationStore, journal_path
+from log_writer import BufferedLogWriter, log_archives
+from chat_streaming import chat_completion_deltas, render_stream
+from context_budget import ContextBudget
+from telemetry import PromptCacheStats
 try:
     from rich.console import Console
     from rich.table import Table
     from rich.panel import Panel
-    from rich.theme import Theme
     from rich.rule import Rule
     RICH_AVAILABLE = True
     console = Console()
@@ -16,288 +22,328 @@ except Exception:
     RICH_AVAILABLE = False
     console = None
 
-dotenv.load_dotenv()
+# openai y dotenv no se importan al arrancar: el menú aparece sin esperar a
+# ellos y el cliente se crea la primera vez que hace falta (mientras tanto se
+# precarga en segundo plano). Ver --startup-profile.
+_client = None
+_client_lock = threading.Lock()
+_environment_loaded = False
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+PAGE_SIZE = 15
+_catalog = None
+# El índice de búsqueda se sincroniza con logs/ una vez por sesión; después lo
+# mantienen al día los guardados de este proceso
+_search_synced = False
+
+def load_environment():
+    """Carga las variables de .env una sola vez"""
+    global _environment_loaded
+    if not _environment_loaded:
+        import dotenv
+        dotenv.load_dotenv()
+        _environment_loaded = True
+
+def get_client():
+    """Devuelve el cliente de OpenAI, creándolo en el primer uso"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            load_environment()
+            from openai import OpenAI
+            from telemetry import instrument
+            _client = instrument(OpenAI(api_key=os.getenv("OPENAI_API_KEY")))
+        return _client
+
+def prefetch_client():
+    """Crea el cliente en un hilo de fondo mientras el usuario elige en el menú"""
+    if _client is None:
+        threading.Thread(target=get_client, daemon=True).start()
+
+def get_catalog():
+    """Devuelve el catálogo de conversaciones de la carpeta logs/"""
+    global _catalog
+    if _catalog is None:
+        _catalog = ConversationCatalog(os.path.join(os.path.dirname(__file__), "logs"))
+    return _catalog
+
+def print_conversation_page(files, page, title, border_style, show_count):
+    """Muestra una página de conversaciones leyendo solo el catálogo"""
+    total_pages = max(1, (len(files) + PAGE_SIZE - 1) // PAGE_SIZE)
+    first = page * PAGE_SIZE
+    entries = get_catalog().entries(files[first:first + PAGE_SIZE])
 
-def show_conversation_menu():
-    """Muestra el menú de conversaciones disponibles y permite seleccionar una"""
-    logs_dir = os.path.join(os.path.dirname(__file__), "logs")
-    if not os.path.exists(logs_dir):
-        return None
-    
-    # Buscar archivos JSON de conversaciones
-    json_files = glob.glob(os.path.join(logs_dir, "conversation_*.json"))
-    if not json_files:
-        return None
-    
-    # Ordenar por fecha de modificación (más recientes primero)
-    json_files.sort(key=os.path.getmtime, reverse=True)
-    
     if RICH_AVAILABLE:
-        console.print(Panel("Conversaciones disponibles:", title="Historial", border_style="yellow", title_align="left"))
-        table = Table(show_header=True, header_style="bold magenta")
+        console.print(Panel(title, title="Historial" if show_count else "Eliminar", border_style=border_style, title_align="left"))
+        table = Table(show_header=True, header_style="bold magenta", caption=f"Página {page + 1}/{total_pages} · {len(files)} conversaciones")
         table.add_column("#", style="bold", width=4)
         table.add_column("Título", style="yellow", width=40)
         table.add_column("Fecha", style="cyan", width=12)
         table.add_column("Hora", style="green", width=8)
-        table.add_column("Mensajes", style="white", width=8)
-        
-        for idx, file_path in enumerate(json_files, 1):
-            try:
-                filename = os.path.basename(file_path)
-                # Extraer fecha y hora del nombre del archivo
-                parts = filename.replace("conversation_", "").replace(".json", "").split("_")
-                if len(parts) >= 2:
-                    date_part = parts[0]
-                    time_part = parts[1]
-                    
-                    # Obtener título y contar mensajes
-                    title = get_conversation_title(file_path)
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        conversation = json.load(f)
-                        msg_count = len(conversation)
-                    
-                    table.add_row(str(idx), title, date_part, time_part, str(msg_count))
-            except Exception:
+        if show_count:
+            table.add_column("Mensajes", style="white", width=8)
+        for idx, entry in enumerate(entries, first + 1):
+            date_part, time_part = split_conversation_filename(entry["path"])
+            if date_part is None:
                 continue
-        
+            row = [str(idx), entry["title"], date_part, time_part]
+            if show_count:
+                row.append(str(entry["messages"]))
+            table.add_row(*row)
         console.print(table)
-        console.print("\n[bold]Opciones:[/]")
-        console.print("[green]• Número (1-{})[/] - Cargar conversación".format(len(json_files)))
-        console.print("[blue]• 'nuevo' o 'n'[/] - Iniciar nueva conversación")
-        console.print("[red]• 'borrar' o 'b'[/] - Eliminar conversación")
-        console.print("[red]• 'salir' o 's'[/] - Salir del programa")
-        
-        while True:
-            choice = console.input("\n[bold yellow]Selecciona una opción:[/] ").strip().lower()
-            
-            if choice in ['salir', 's']:
-                return "exit"
-            elif choice in ['nuevo', 'n']:
-                return None
-            elif choice in ['borrar', 'b']:
-                return "delete"
-            elif choice.isdigit():
-                idx = int(choice) - 1
-                if 0 <= idx < len(json_files):
-                    return json_files[idx]
-                else:
-                    console.print("[red]Número inválido. Intenta de nuevo.[/]")
-            else:
-                console.print("[red]Opción inválida. Intenta de nuevo.[/]")
     else:
-        print("\nConversaciones disponibles:")
-        for idx, file_path in enumerate(json_files, 1):
-            try:
-                filename = os.path.basename(file_path)
-                parts = filename.replace("conversation_", "").replace(".json", "").split("_")
-                if len(parts) >= 2:
-                    date_part = parts[0]
-                    time_part = parts[1]
-                    title = get_conversation_title(file_path)
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        conversation = json.load(f)
-                        msg_count = len(conversation)
-                    print(f"{idx}. [{title}] {date_part} {time_part} ({msg_count} mensajes)")
-            except Exception:
+        print(f"\n{title}")
+        for idx, entry in enumerate(entries, first + 1):
+            date_part, time_part = split_conversation_filename(entry["path"])
+            if date_part is None:
                 continue
-        
-        print("\nOpciones:")
-        print("• Número (1-{}) - Cargar conversación".format(len(json_files)))
-        print("• 'nuevo' o 'n' - Iniciar nueva conversación")
-        print("• 'borrar' o 'b' - Eliminar conversación")
-        print("• 'salir' o 's' - Salir del programa")
-        
+            if show_count:
+                print(f"{idx}. [{entry['title']}] {date_part} {time_part} ({entry['messages']} mensajes)")
+            else:
+                print(f"{idx}. [{entry['title']}] {date_part} {time_part}")
+        print(f"Página {page + 1}/{total_pages} · {len(files)} conversaciones")
+    return total_pages
+
+def show_conversation_menu():
+    """Muestra el menú de conversaciones disponibles y permite seleccionar una"""
+    # Solo se hace stat de los archivos; títulos y conteos salen del catálogo
+    files = get_catalog().list_files()
+    if not files:
+        return None
+
+    page = 0
+    while True:
+        total_pages = print_conversation_page(files, page, "Conversaciones disponibles:", "yellow", show_count=True)
+
+        if RICH_AVAILABLE:
+            console.print("\n[bold]Opciones:[/]")
+            console.print("[green]• Número (1-{})[/] - Cargar conversación".format(len(files)))
+            if total_pages > 1:
+                console.print("[cyan]• '>' o '<'[/] - Página siguiente / anterior")
+            console.print("[blue]• 'nuevo' o 'n'[/] - Iniciar nueva conversación")
+            console.print("[magenta]• 'buscar \\[texto]'[/] - Buscar en todas las conversaciones")
+            console.print("[red]• 'borrar' o 'b'[/] - Eliminar conversación")
+            console.print("[red]• 'salir' o 's'[/] - Salir del programa")
+        else:
+            print("\nOpciones:")
+            print("• Número (1-{}) - Cargar conversación".format(len(files)))
+            if total_pages > 1:
+                print("• '>' o '<' - Página siguiente / anterior")
+            print("• 'nuevo' o 'n' - Iniciar nueva conversación")
+            print("• 'buscar [texto]' - Buscar en todas las conversaciones")
+            print("• 'borrar' o 'b' - Eliminar conversación")
+            print("• 'salir' o 's' - Salir del programa")
+
+        prefetch_client()
         while True:
-            choice = input("\nSelecciona una opción: ").strip().lower()
-            
+            if RICH_AVAILABLE:
+                choice = console.input("\n[bold yellow]Selecciona una opción:[/] ").strip().lower()
+            else:
+                choice = input("\nSelecciona una opción: ").strip().lower()
+
             if choice in ['salir', 's']:
                 return "exit"
             elif choice in ['nuevo', 'n']:
                 return None
             elif choice in ['borrar', 'b']:
                 return "delete"
+            elif choice == 'buscar' or choice.startswith('buscar '):
+                return ("search", choice[len('buscar'):].strip())
+            elif choice in ['>', '<']:
+                page = min(page + 1, total_pages - 1) if choice == '>' else max(page - 1, 0)
+                break
             elif choice.isdigit():
                 idx = int(choice) - 1
-                if 0 <= idx < len(json_files):
-                    return json_files[idx]
+                if 0 <= idx < len(files):
+                    return files[idx][0]
                 else:
-                    print("Número inválido. Intenta de nuevo.")
+                    print_error("Número inválido. Intenta de nuevo.")
             else:
-                print("Opción inválida. Intenta de nuevo.")
+                print_error("Opción inválida. Intenta de nuevo.")
 
-def load_conversation(file_path):
-    """Carga una conversación desde un archivo JSON"""
+def print_error(message):
+    if RICH_AVAILABLE:
+        console.print(f"[red]{message}[/]")
+    else:
+        print(message)
+
+def load_conversation(store):
+    """Carga una conversación desde su archivo JSON y reaplica su journal"""
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return store.load()
     except Exception as e:
-        if RICH_AVAILABLE:
-            console.print(f"[red]Error al cargar conversación: {e}[/]")
-        else:
-            print(f"Error al cargar conversación: {e}")
+        print_error(f"Error al cargar conversación: {e}")
         return None
 
-def generate_conversation_title(conversation):
-    """Genera un título para la conversación basado en el primer mensaje del usuario"""
-    for msg in conversation:
-        if msg.get("role") == "user":
-            user_message = msg.get("content", "")
-            # Crear título truncando el primer mensaje (máximo 50 caracteres)
-            if len(user_message) > 50:
-                title = user_message[:47] + "..."
-            else:
-                title = user_message
-            return title
-    return "Conversación sin título"
-
 def get_conversation_title(file_path):
-    """Obtiene el título de una conversación desde el archivo JSON"""
+    """Obtiene el título de una conversación desde el catálogo"""
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            conversation = json.load(f)
-            # Buscar título guardado o generar uno
-            for msg in conversation:
-                if msg.get("role") == "system" and "title" in msg:
-                    return msg["title"]
-            return generate_conversation_title(conversation)
+        entries = get_catalog().entries([get_catalog().stat(file_path)])
+        return entries[0]["title"] if entries else "Error al cargar título"
     except Exception:
         return "Error al cargar título"
 
 def delete_conversation():
     """Permite al usuario seleccionar y eliminar una conversación"""
-    logs_dir = os.path.join(os.path.dirname(__file__), "logs")
-    if not os.path.exists(logs_dir):
-        if RICH_AVAILABLE:
-            console.print("[red]No hay conversaciones para eliminar.[/]")
-        else:
-            print("No hay conversaciones para eliminar.")
+    files = get_catalog().list_files()
+    if not files:
+        print_error("No hay conversaciones para eliminar.")
         return
-    
-    # Buscar archivos JSON de conversaciones
-    json_files = glob.glob(os.path.join(logs_dir, "conversation_*.json"))
-    if not json_files:
+
+    logs_dir = get_catalog().logs_dir
+    page = 0
+    while True:
+        total_pages = print_conversation_page(files, page, "Selecciona la conversación a eliminar:", "red", show_count=False)
+
         if RICH_AVAILABLE:
-            console.print("[red]No hay conversaciones para eliminar.[/]")
+            console.print("\n[bold red]Opciones:[/]")
+            console.print("[green]• Número (1-{})[/] - Eliminar conversación".format(len(files)))
+            if total_pages > 1:
+                console.print("[cyan]• '>' o '<'[/] - Página siguiente / anterior")
+            console.print("[blue]• 'cancelar' o 'c'[/] - Volver al menú principal")
         else:
-            print("No hay conversaciones para eliminar.")
-        return
-    
-    # Ordenar por fecha de modificación (más recientes primero)
-    json_files.sort(key=os.path.getmtime, reverse=True)
-    
-    if RICH_AVAILABLE:
-        console.print(Panel("Selecciona la conversación a eliminar:", title="Eliminar", border_style="red", title_align="left"))
-        table = Table(show_header=True, header_style="bold magenta")
-        table.add_column("#", style="bold", width=4)
-        table.add_column("Título", style="yellow", width=40)
-        table.add_column("Fecha", style="cyan", width=12)
-        table.add_column("Hora", style="green", width=8)
-        
-        for idx, file_path in enumerate(json_files, 1):
-            try:
-                filename = os.path.basename(file_path)
-                parts = filename.replace("conversation_", "").replace(".json", "").split("_")
-                if len(parts) >= 2:
-                    date_part = parts[0]
-                    time_part = parts[1]
-                    title = get_conversation_title(file_path)
-                    table.add_row(str(idx), title, date_part, time_part)
-            except Exception:
-                continue
-        
-        console.print(table)
-        console.print("\n[bold red]Opciones:[/]")
-        console.print("[green]• Número (1-{})[/] - Eliminar conversación".format(len(json_files)))
-        console.print("[blue]• 'cancelar' o 'c'[/] - Volver al menú principal")
-        
+            print("\nOpciones:")
+            print("• Número (1-{}) - Eliminar conversación".format(len(files)))
+            if total_pages > 1:
+                print("• '>' o '<' - Página siguiente / anterior")
+            print("• 'cancelar' o 'c' - Volver al menú principal")
+
         while True:
-            choice = console.input("\n[bold red]Selecciona conversación a eliminar:[/] ").strip().lower()
-            
-            if choice in ['cancelar', 'c']:
-                return
-            elif choice.isdigit():
-                idx = int(choice) - 1
-                if 0 <= idx < len(json_files):
-                    file_to_delete = json_files[idx]
-                    title = get_conversation_title(file_to_delete)
-                    
-                    # Confirmar eliminación
-                    confirm = console.input(f"[bold red]¿Eliminar '{title}'? (sí/no):[/] ").strip().lower()
-                    if confirm in ['sí', 'si', 's', 'yes', 'y']:
-                        try:
-                            # Eliminar archivos JSON y log asociados
-                            base_filename = os.path.basename(file_to_delete).replace("conversation_", "").replace(".json", "")
-                            log_file = os.path.join(logs_dir, f"log_{base_filename}.txt")
-                            
-                            os.remove(file_to_delete)
-                            if os.path.exists(log_file):
-                                os.remove(log_file)
-                            
-                            console.print(f"[green]Conversación '{title}' eliminada correctamente.[/]")
-                        except Exception as e:
-                            console.print(f"[red]Error al eliminar: {e}[/]")
-                    else:
-                        console.print("[yellow]Eliminación cancelada.[/]")
-                    return
-                else:
-                    console.print("[red]Número inválido. Intenta de nuevo.[/]")
+            if RICH_AVAILABLE:
+                choice = console.input("\n[bold red]Selecciona conversación a eliminar:[/] ").strip().lower()
             else:
-                console.print("[red]Opción inválida. Intenta de nuevo.[/]")
-    else:
-        print("\nSelecciona la conversación a eliminar:")
-        for idx, file_path in enumerate(json_files, 1):
-            try:
-                filename = os.path.basename(file_path)
-                parts = filename.replace("conversation_", "").replace(".json", "").split("_")
-                if len(parts) >= 2:
-                    date_part = parts[0]
-                    time_part = parts[1]
-                    title = get_conversation_title(file_path)
-                    print(f"{idx}. [{title}] {date_part} {time_part}")
-            except Exception:
-                continue
-        
-        print("\nOpciones:")
-        print("• Número (1-{}) - Eliminar conversación".format(len(json_files)))
-        print("• 'cancelar' o 'c' - Volver al menú principal")
-        
-        while True:
-            choice = input("\nSelecciona conversación a eliminar: ").strip().lower()
-            
+                choice = input("\nSelecciona conversación a eliminar: ").strip().lower()
+
             if choice in ['cancelar', 'c']:
                 return
+            elif choice in ['>', '<']:
+                page = min(page + 1, total_pages - 1) if choice == '>' else max(page - 1, 0)
+                break
             elif choice.isdigit():
                 idx = int(choice) - 1
-                if 0 <= idx < len(json_files):
-                    file_to_delete = json_files[idx]
+                if 0 <= idx < len(files):
+                    file_to_delete = files[idx][0]
                     title = get_conversation_title(file_to_delete)
-                    
+
                     # Confirmar eliminación
-                    confirm = input(f"¿Eliminar '{title}'? (sí/no): ").strip().lower()
+                    if RICH_AVAILABLE:
+                        confirm = console.input(f"[bold red]¿Eliminar '{title}'? (sí/no):[/] ").strip().lower()
+                    else:
+                        confirm = input(f"¿Eliminar '{title}'? (sí/no): ").strip().lower()
                     if confirm in ['sí', 'si', 's', 'yes', 'y']:
                         try:
                             # Eliminar archivos JSON y log asociados
                             base_filename = os.path.basename(file_to_delete).replace("conversation_", "").replace(".json", "")
                             log_file = os.path.join(logs_dir, f"log_{base_filename}.txt")
-                            
+
                             os.remove(file_to_delete)
+                            if os.path.exists(journal_path(file_to_delete)):
+                                os.remove(journal_path(file_to_delete))
                             if os.path.exists(log_file):
                                 os.remove(log_file)
-                            
-                            print(f"Conversación '{title}' eliminada correctamente.")
+                            for archive in log_archives(log_file):
+                                os.remove(archive)
+                            get_catalog().remove(file_to_delete)
+
+                            if RICH_AVAILABLE:
+                                console.print(f"[green]Conversación '{title}' eliminada correctamente.[/]")
+                            else:
+                                print(f"Conversación '{title}' eliminada correctamente.")
                         except Exception as e:
-                            print(f"Error al eliminar: {e}")
+                            print_error(f"Error al eliminar: {e}")
                     else:
-                        print("Eliminación cancelada.")
+                        if RICH_AVAILABLE:
+                            console.print("[yellow]Eliminación cancelada.[/]")
+                        else:
+                            print("Eliminación cancelada.")
                     return
                 else:
-                    print("Número inválido. Intenta de nuevo.")
+                    print_error("Número inválido. Intenta de nuevo.")
             else:
-                print("Opción inválida. Intenta de nuevo.")
+                print_error("Opción inválida. Intenta de nuevo.")
+
+def format_snippet(snippet):
+    """Resalta las coincidencias del fragmento devuelto por el índice"""
+    snippet = " ".join(snippet.split())
+    if RICH_AVAILABLE:
+        from rich.markup import escape
+        return escape(snippet).replace(MATCH_START, "[bold yellow]").replace(MATCH_END, "[/]")
+    return snippet.replace(MATCH_START, "«").replace(MATCH_END, "»")
+
+def search_conversations(query=""):
+    """Busca texto en todas las conversaciones y permite abrir un resultado"""
+    catalog = get_catalog()
+    if not query:
+        if RICH_AVAILABLE:
+            query = console.input("[bold magenta]Buscar:[/] ").strip()
+        else:
+            query = input("Buscar: ").strip()
+        if not query:
+            return None
+    global _search_synced
+    if not _search_synced:
+        # Solo se releen los archivos cambiados fuera del programa (la primera vez, todos)
+        if RICH_AVAILABLE:
+            with console.status("[bold magenta]Actualizando índice de búsqueda…[/]", spinner="dots"):
+                catalog.sync_search()
+        else:
+            catalog.sync_search()
+        _search_synced = True
+    start = time.perf_counter()
+    hits = catalog.search(query)
+    elapsed = (time.perf_counter() - start) * 1000
+    if not catalog.search_available:
+        print_error("La búsqueda necesita SQLite con FTS5.")
+        return None
+    if not hits:
+        print_error(f"Sin resultados para '{query}'.")
+        return None
+
+    caption = f"{len(hits)} conversaciones · {elapsed:.0f} ms"
+    if RICH_AVAILABLE:
+        from rich.markup import escape
+        table = Table(show_header=True, header_style="bold magenta", caption=caption, show_lines=True)
+        table.add_column("#", style="bold", width=4)
+        table.add_column("Título", style="yellow", width=30)
+        table.add_column("Fecha", style="cyan", width=12)
+        table.add_column("Fragmento", style="white")
+        for idx, hit in enumerate(hits, 1):
+            date_part, _ = split_conversation_filename(hit["path"])
+            matches = f" [grey50](+{hit['matches'] - 1})[/]" if hit["matches"] > 1 else ""
+            table.add_row(str(idx), escape(hit["title"]), date_part or "", format_snippet(hit["snippet"]) + matches)
+        console.print(Panel(f"Resultados para '{escape(query)}'", title="Buscar", border_style="magenta", title_align="left"))
+        console.print(table)
+        choice = console.input("\n[bold magenta]Número para abrir (Enter para volver):[/] ").strip()
+    else:
+        print(f"\nResultados para '{query}':")
+        for idx, hit in enumerate(hits, 1):
+            date_part, _ = split_conversation_filename(hit["path"])
+            print(f"{idx}. [{hit['title']}] {date_part or ''} - {format_snippet(hit['snippet'])}")
+        print(caption)
+        choice = input("\nNúmero para abrir (Enter para volver): ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(hits):
+        return hits[int(choice) - 1]["path"]
+    return None
+
+def startup_profile():
+    """Mide el arranque: imports del script y primera página del menú"""
+    imports_done = time.perf_counter()
+    files = get_catalog().list_files()
+    listed = time.perf_counter()
+    if files:
+        print_conversation_page(files, 0, "Conversaciones disponibles:", "yellow", show_count=True)
+    menu_done = time.perf_counter()
+    heavy = [name for name in ("openai", "dotenv", "tiktoken", "rich") if name in sys.modules]
+    print(f"\nImports del script:     {(imports_done - _START) * 1000:8.1f} ms", file=sys.stderr)
+    print(f"Listado de archivos:    {(listed - imports_done) * 1000:8.1f} ms ({len(files)} conversaciones)", file=sys.stderr)
+    print(f"Primera página:         {(menu_done - listed) * 1000:8.1f} ms", file=sys.stderr)
+    print(f"Total hasta el menú:    {(menu_done - _START) * 1000:8.1f} ms", file=sys.stderr)
+    print(f"Módulos pesados cargados: {', '.join(heavy) or 'ninguno'}", file=sys.stderr)
+    print("Detalle por módulo: python -X importtime statefulchat-old.py --startup-profile", file=sys.stderr)
 
 def main():
+    if "--startup-profile" in sys.argv[1:]:
+        startup_profile()
+        return
     while True:
         # Mostrar menú de conversaciones
         selected_conversation = show_conversation_menu()
@@ -311,10 +357,15 @@ def main():
         elif selected_conversation == "delete":
             delete_conversation()
             continue  # Volver al menú principal
+        elif isinstance(selected_conversation, tuple):
+            selected_conversation = search_conversations(selected_conversation[1])
+            if selected_conversation is None:
+                continue  # Volver al menú principal
         
         # Cargar conversación seleccionada o crear nueva
         if selected_conversation:
-            conversation = load_conversation(selected_conversation)
+            store = ConversationStore(selected_conversation)
+            conversation = load_conversation(store)
             if conversation is None:
                 continue  # Volver al menú si hay error
             if RICH_AVAILABLE:
@@ -343,6 +394,13 @@ def main():
             print("Comandos: 'Contexto' para ver historial, 'Salir' para finalizar")
         
         model = "gpt-4o-mini"
+        load_environment()
+        # Mostrar la respuesta token a token (CHAT_STREAM=0 para desactivarlo)
+        stream_replies = os.getenv("CHAT_STREAM", "1") != "0"
+        # Tokens de entrada servidos desde la caché de prompts del proveedor en esta sesión
+        cache_stats = PromptCacheStats()
+        # Recorta lo que se envía al modelo; conversation se guarda completa
+        context_budget = ContextBudget(model)
 
         # Configuración de logs: crear carpeta y archivo con nombre log_dia_hora.txt
         logs_dir = os.path.join(os.path.dirname(__file__), "logs")
@@ -361,21 +419,23 @@ def main():
             hora = now.strftime("%H-%M-%S")
             log_file_path = os.path.join(logs_dir, f"log_{dia}_{hora}.txt")
             json_file_path = os.path.join(logs_dir, f"conversation_{dia}_{hora}.json")
+            store = ConversationStore(json_file_path)
+
+        # El log se escribe desde un hilo de fondo; write_log solo encola la línea
+        log_writer = BufferedLogWriter(log_file_path)
 
         def write_log(line: str) -> None:
-            try:
-                with open(log_file_path, "a", encoding="utf-8") as f:
-                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    f.write(f"[{timestamp}] {line}\n")
-            except Exception:
-                # Evitar que errores de logging rompan la conversación
-                pass
+            log_writer.write(line)
 
-        def save_conversation_json() -> None:
-            """Guarda la variable conversation en un archivo JSON"""
+        def save_conversation_json(final: bool = False) -> None:
+            """Guarda en disco los mensajes nuevos de conversation (al final compacta el JSON)"""
             try:
-                with open(json_file_path, "w", encoding="utf-8") as f:
-                    json.dump(conversation, f, ensure_ascii=False, indent=2)
+                if final:
+                    store.close(conversation)
+                else:
+                    store.sync(conversation)
+                # Actualizar el catálogo con los datos ya en memoria
+                get_catalog().update(json_file_path, conversation)
             except Exception:
                 # Evitar que errores de JSON rompan la conversación
                 pass
@@ -398,8 +458,15 @@ def main():
                     console.print(Panel("¡Hasta pronto!", border_style="cyan", title="Salir", title_align="left"))
                 else:
                     print("¡Hasta pronto!")
+                if cache_stats.requests:
+                    if RICH_AVAILABLE:
+                        console.print(f"[grey50]{cache_stats.summary()}[/]")
+                    else:
+                        print(cache_stats.summary())
+                    write_log(f"[Caché] {cache_stats.summary()}")
                 write_log("=== Fin de conversación por comando 'Salir' ===")
-                save_conversation_json()  # Guardar conversación final en JSON
+                save_conversation_json(final=True)  # Guardar conversación final en JSON
+                log_writer.close()
                 break
             
             # Comando especial "Contexto": muestra todo el historial de la conversación
@@ -439,25 +506,48 @@ def main():
                 # Agregar título al mensaje del sistema
                 if conversation[0].get("role") == "system":
                     conversation[0]["title"] = title
+                    store.replace(0, conversation[0])
             
             try:
-                if RICH_AVAILABLE:
-                    with console.status("[bold green]El agente está pensando…[/]", spinner="dots"):
-                        response = client.chat.completions.create(
-                            model=model,
-                            messages=conversation
-                        )
-                else:
-                    print("El agente está pensando…")
-                    response = client.chat.completions.create(
+                messages, budget_report = context_budget.fit(conversation)
+                if budget_report["saved_tokens"]:
+                    note = (f"Contexto recortado: {budget_report['sent_tokens']} de {budget_report['total_tokens']} tokens "
+                            f"({budget_report['saved_tokens']} ahorrados, {budget_report['dropped_messages']} mensajes resumidos)")
+                    write_log(f"[Contexto] {note}")
+                    if RICH_AVAILABLE:
+                        console.print(f"[grey50]{note}[/]")
+                    else:
+                        print(note)
+                client = get_client()
+                if stream_replies:
+                    stream = client.chat.completions.create(
                         model=model,
-                        messages=conversation
+                        messages=messages,
+                        stream=True,
+                        stream_options={"include_usage": True}
                     )
-                text = response.choices[0].message.content.strip()
-                if RICH_AVAILABLE:
-                    console.print(Panel(text, title="Agente", title_align="left", border_style="green"))
+                    result = {}
+                    text = render_stream(chat_completion_deltas(stream, result), console=console).strip()
+                    cache_stats.add(result.get("usage"))
                 else:
-                    print(f"Bot: {text}")
+                    if RICH_AVAILABLE:
+                        with console.status("[bold green]El agente está pensando…[/]", spinner="dots"):
+                            response = client.chat.completions.create(
+                                model=model,
+                                messages=messages
+                            )
+                    else:
+                        print("El agente está pensando…")
+                        response = client.chat.completions.create(
+                            model=model,
+                            messages=messages
+                        )
+                    text = response.choices[0].message.content.strip()
+                    cache_stats.add(response.usage)
+                    if RICH_AVAILABLE:
+                        console.print(Panel(text, title="Agente", title_align="left", border_style="green"))
+                    else:
+                        print(f"Bot: {text}")
                 conversation.append({"role": "assistant", "content": text})
                 write_log(f"Agente: {text}")
                 save_conversation_json()  # Guardar conversación actualizada en JSON
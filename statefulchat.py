@@ -1,18 +1,34 @@
 import os
 from openai import OpenAI
 import dotenv
+from chat_streaming import render_stream, response_text_deltas
+from telemetry import PromptCacheStats, instrument
+try:
+    from rich.console import Console
+    RICH_AVAILABLE = True
+    console = Console()
+except Exception:
+    RICH_AVAILABLE = False
+    console = None
 
 dotenv.load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = instrument(OpenAI(api_key=os.getenv("OPENAI_API_KEY")))
+
+# Mostrar la respuesta token a token (CHAT_STREAM=0 para desactivarlo)
+STREAM = os.getenv("CHAT_STREAM", "1") != "0"
 
 def main():
     print("Stateful Chatbot - Responses API - (type 'exit' to quit)")
     previous_response_id = None
     model = "gpt-4o-mini"
+    # Con previous_response_id el contexto anterior es el prefijo que se cachea
+    cache_stats = PromptCacheStats()
     while True:
         user_input = input("You: ")
         if user_input.lower() in {"exit", "quit"}:
+            if cache_stats.requests:
+                print(cache_stats.summary())
             print("Goodbye!")
             break
         params = {
@@ -23,10 +39,18 @@ def main():
         if previous_response_id:
             params["previous_response_id"] = previous_response_id
         try:
-            response = client.responses.create(**params)
-            text = response.output[0].content[0].text
-            print(f"Bot: {text}")
-            previous_response_id = response.id
+            if STREAM:
+                result = {}
+                stream = client.responses.create(**params, stream=True)
+                render_stream(response_text_deltas(stream, result), console=console, title="Bot")
+                previous_response_id = result["response"].id
+                cache_stats.add(result["response"].usage)
+            else:
+                response = client.responses.create(**params)
+                text = response.output[0].content[0].text
+                print(f"Bot: {text}")
+                previous_response_id = response.id
+                cache_stats.add(response.usage)
         except Exception as e:
             print(f"Error: {e}")
 
@@ -0,0 +1,499 @@
+import os
+import sys
+import json
+import time
+import threading
+from collections import defaultdict
+from log_writer import BufferedLogWriter
+
+# Instrumentación de las llamadas al modelo y a las herramientas.
+#
+# instrument(client) envuelve responses.create y chat.completions.create
+# (cliente síncrono o asíncrono, con o sin streaming) y ToolRegistry.call
+# registra cada herramienta. Cada llamada produce un span con tiempo total,
+# TTFT, tokens (entrada, salida y en caché), reintentos, modelo o herramienta:
+#
+#   TELEMETRY_PATH=1                     -> logs/telemetry.jsonl
+#   TELEMETRY_PATH=/ruta/spans.jsonl     -> archivo indicado
+#   TELEMETRY_METRICS_PORT=9464          -> métricas Prometheus en /metrics
+#
+#   python telemetry.py report [--path logs/telemetry.jsonl]
+#
+# Sin ninguna de las dos variables la instrumentación no hace nada.
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "telemetry.jsonl")
+# Límites de los histogramas de Prometheus (segundos)
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Telemetry:
+    """Recibe spans, los escribe como JSONL y mantiene las métricas agregadas"""
+
+    def __init__(self, path=None, metrics_port=None, metrics_host="127.0.0.1"):
+        self.path = path
+        self.enabled = bool(path or metrics_port)
+        self._writer = BufferedLogWriter(path, timestamps=False) if path else None
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._local = threading.local()
+        self.server = None
+        if metrics_port:
+            self.serve_metrics(metrics_port, metrics_host)
+
+    # --- reintentos -----------------------------------------------------
+
+    def note_retry(self):
+        """Cuenta un reintento en el span de herramienta en curso en este hilo"""
+        self._local.retries = getattr(self._local, "retries", 0) + 1
+
+    def _take_retries(self):
+        retries = getattr(self._local, "retries", 0)
+        self._local.retries = 0
+        return retries
+
+    # --- spans ----------------------------------------------------------
+
+    def record(self, span):
+        """Registra un span ya completo (diccionario con "kind")"""
+        if not self.enabled:
+            return
+        span = dict(span, ts=round(time.time(), 3))
+        with self._lock:
+            if span["kind"] == "llm":
+                labels = (("api", span.get("api")), ("model", span.get("model")))
+                self._counters[("agent_llm_requests_total", labels + (("status", span["status"]),))] += 1
+                self._counters[("agent_llm_retries_total", labels)] += span.get("retries", 0)
+                for kind in ("input", "output", "cached"):
+                    if span.get(f"{kind}_tokens"):
+                        self._counters[("agent_llm_tokens_total", labels + (("type", kind),))] += span[f"{kind}_tokens"]
+                self._observe("agent_llm_request_seconds", labels, span["wall_ms"] / 1000)
+                if span.get("ttft_ms") is not None:
+                    self._observe("agent_llm_ttft_seconds", labels, span["ttft_ms"] / 1000)
+            else:
+                labels = (("tool", span.get("tool")),)
+                self._counters[("agent_tool_calls_total", labels + (("status", span["status"]),))] += 1
+                self._counters[("agent_tool_retries_total", labels)] += span.get("retries", 0)
+                self._observe("agent_tool_seconds", labels, span["wall_ms"] / 1000)
+        if self._writer is not None:
+            self._writer.write(json.dumps(span, ensure_ascii=False))
+
+    def record_tool(self, name, start, result=None, error=None):
+        """Span de una herramienta; los resultados "Error..." cuentan como fallo"""
+        span = {"kind": "tool", "tool": name, "wall_ms": round((time.perf_counter() - start) * 1000, 3),
+                "retries": self._take_retries()}
+        if error is None and isinstance(result, str) and result.startswith("Error"):
+            error = result
+        span["status"] = "error" if error else "ok"
+        if error:
+            span["error"] = str(error)[:300]
+        self.record(span)
+
+    def start_tool(self):
+        self._local.retries = 0
+        return time.perf_counter()
+
+    def _observe(self, name, labels, value):
+        histogram = self._histograms.get((name, labels))
+        if histogram is None:
+            histogram = self._histograms[(name, labels)] = [0] * len(BUCKETS) + [0.0, 0]
+        for index, bound in enumerate(BUCKETS):
+            if value <= bound:
+                histogram[index] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+    # --- Prometheus -----------------------------------------------------
+
+    def metrics_text(self):
+        """Métricas en el formato de texto de Prometheus"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items(), key=lambda item: repr(item[0]))
+            histograms = sorted(self._histograms.items(), key=lambda item: repr(item[0]))
+            seen = set()
+            for (name, labels), value in counters:
+                if name not in seen:
+                    lines.append(f"# TYPE {name} counter")
+                    seen.add(name)
+                lines.append(f"{name}{_labels(labels)} {value:g}")
+            for (name, labels), histogram in histograms:
+                if name not in seen:
+                    lines.append(f"# TYPE {name} histogram")
+                    seen.add(name)
+                for index, bound in enumerate(BUCKETS):
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {histogram[index]}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram[-1]}")
+                lines.append(f"{name}_sum{_labels(labels)} {histogram[-2]:.6f}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def serve_metrics(self, port, host="127.0.0.1"):
+        """Publica GET /metrics en un hilo de fondo"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                data = telemetry.metrics_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True).start()
+        return self.server
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _labels(labels):
+    parts = []
+    for key, value in labels:
+        if value is None:
+            continue
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+_telemetry = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry():
+    """Instancia compartida configurada con TELEMETRY_PATH y TELEMETRY_METRICS_PORT"""
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            path = os.getenv("TELEMETRY_PATH")
+            if path == "1":
+                path = DEFAULT_PATH
+            if path and path != "0":
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            else:
+                path = None
+            _telemetry = Telemetry(path, os.getenv("TELEMETRY_METRICS_PORT") or None)
+        return _telemetry
+
+
+# --- cliente instrumentado ---------------------------------------------------
+
+def _usage_fields(usage):
+    """Tokens de entrada, salida y en caché de un objeto usage de cualquiera de las dos APIs"""
+    if usage is None:
+        return {}
+    if hasattr(usage, "input_tokens"):
+        details = getattr(usage, "input_tokens_details", None)
+        return {"input_tokens": usage.input_tokens, "output_tokens": usage.output_tokens,
+                "cached_tokens": getattr(details, "cached_tokens", 0) or 0}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {"input_tokens": usage.prompt_tokens, "output_tokens": usage.completion_tokens,
+            "cached_tokens": getattr(details, "cached_tokens", 0) or 0}
+
+
+class PromptCacheStats:
+    """Tokens de entrada y tokens servidos desde la caché de prompts en una sesión"""
+
+    def __init__(self):
+        self.requests = 0
+        self.input_tokens = 0
+        self.cached_tokens = 0
+
+    def add(self, usage):
+        fields = _usage_fields(usage)
+        if not fields:
+            return
+        self.requests += 1
+        self.input_tokens += fields["input_tokens"] or 0
+        self.cached_tokens += fields["cached_tokens"] or 0
+
+    @property
+    def hit_rate(self):
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.0
+
+    def summary(self):
+        return (f"Caché de prompts: {self.cached_tokens} de {self.input_tokens} tokens de entrada "
+                f"({self.hit_rate:.0%}) en {self.requests} peticiones")
+
+
+class _StreamSpan:
+    """Acumula TTFT y usage a partir de los eventos de un stream"""
+
+    def __init__(self, telemetry, span, start):
+        self.telemetry = telemetry
+        self.span = span
+        self.start = start
+        self.done = False
+
+    def observe(self, event):
+        if self.span.get("ttft_ms") is None and _is_first_token(event):
+            self.span["ttft_ms"] = round((time.perf_counter() - self.start) * 1000, 3)
+        response = getattr(event, "response", None)
+        if response is not None and getattr(event, "type", "") == "response.completed":
+            self.span.update(_usage_fields(response.usage), response_id=response.id)
+        elif getattr(event, "usage", None) is not None:
+            self.span.update(_usage_fields(event.usage))
+
+    def finish(self, error=None):
+        if self.done:
+            return
+        self.done = True
+        self.span["wall_ms"] = round((time.perf_counter() - self.start) * 1000, 3)
+        self.span["status"] = "error" if error else "ok"
+        if error:
+            self.span["error"] = f"{type(error).__name__}: {error}"[:300]
+        self.telemetry.record(self.span)
+
+
+def _is_first_token(event):
+    if getattr(event, "type", None) in ("response.output_text.delta", "response.function_call_arguments.delta"):
+        return True
+    choices = getattr(event, "choices", None)
+    if choices:
+        delta = choices[0].delta
+        return bool(delta.content or delta.tool_calls)
+    return False
+
+
+class _MeasuredStream:
+    def __init__(self, stream, span):
+        self._stream = stream
+        self._span = span
+
+    def __iter__(self):
+        try:
+            for event in self._stream:
+                self._span.observe(event)
+                yield event
+        except Exception as e:
+            self._span.finish(e)
+            raise
+        self._span.finish()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._span.finish()
+        close = getattr(self._stream, "close", None)
+        if close is not None:
+            close()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class _AsyncMeasuredStream(_MeasuredStream):
+    async def __aiter__(self):
+        try:
+            async for event in self._stream:
+                self._span.observe(event)
+                yield event
+        except Exception as e:
+            self._span.finish(e)
+            raise
+        self._span.finish()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        self._span.finish()
+        close = getattr(self._stream, "close", None)
+        if close is not None:
+            await close()
+
+
+class _InstrumentedCreate:
+    """Envuelve create() de un recurso del SDK y registra un span por llamada"""
+
+    def __init__(self, resource, api, telemetry, is_async):
+        self._resource = resource
+        self._api = api
+        self._telemetry = telemetry
+        self._is_async = is_async
+
+    def __getattr__(self, name):
+        return getattr(self._resource, name)
+
+    def _begin(self, params):
+        span = {"kind": "llm", "api": self._api, "model": params.get("model"), "stream": bool(params.get("stream")),
+                "ttft_ms": None}
+        if span["stream"] and self._api == "chat.completions":
+            # Sin esto los streams de Chat Completions no informan de los tokens
+            params.setdefault("stream_options", {"include_usage": True})
+        return _StreamSpan(self._telemetry, span, time.perf_counter())
+
+    def _finish(self, measure, raw):
+        measure.span["retries"] = getattr(raw, "retries_taken", 0)
+        result = raw.parse() if hasattr(raw, "parse") else raw
+        if measure.span["stream"]:
+            stream_class = _AsyncMeasuredStream if self._is_async else _MeasuredStream
+            return stream_class(result, measure)
+        measure.span.update(_usage_fields(getattr(result, "usage", None)), response_id=getattr(result, "id", None))
+        measure.finish()
+        return result
+
+    def _raw_create(self):
+        # with_raw_response expone retries_taken; los envoltorios que no lo tienen se llaman tal cual
+        raw = getattr(self._resource, "with_raw_response", None)
+        return raw.create if raw is not None else self._resource.create
+
+    def create(self, **params):
+        if not self._telemetry.enabled:
+            return self._resource.create(**params)
+        if self._is_async:
+            return self._create_async(params)
+        measure = self._begin(params)
+        try:
+            raw = self._raw_create()(**params)
+        except Exception as e:
+            measure.finish(e)
+            raise
+        return self._finish(measure, raw)
+
+    async def _create_async(self, params):
+        measure = self._begin(params)
+        try:
+            raw = await self._raw_create()(**params)
+        except Exception as e:
+            measure.finish(e)
+            raise
+        return self._finish(measure, raw)
+
+
+class _InstrumentedChat:
+    def __init__(self, chat, telemetry, is_async):
+        self._chat = chat
+        self.completions = _InstrumentedCreate(chat.completions, "chat.completions", telemetry, is_async)
+
+    def __getattr__(self, name):
+        return getattr(self._chat, name)
+
+
+class InstrumentedClient:
+    """Cliente OpenAI (síncrono o asíncrono) con spans en cada create()"""
+
+    def __init__(self, client, telemetry):
+        import inspect
+        is_async = inspect.iscoroutinefunction(getattr(client, "close", None))
+        self._client = client
+        self.telemetry = telemetry
+        self.responses = _InstrumentedCreate(client.responses, "responses", telemetry, is_async)
+        self.chat = _InstrumentedChat(client.chat, telemetry, is_async)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def instrument(client, telemetry=None):
+    """Envuelve el cliente si la instrumentación está activada; si no, lo devuelve tal cual"""
+    telemetry = telemetry or get_telemetry()
+    if not telemetry.enabled:
+        return client
+    return InstrumentedClient(client, telemetry)
+
+
+# --- informe ----------------------------------------------------------------
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summarize(spans):
+    """Agrupa los spans por modelo o herramienta con conteos, percentiles y tokens"""
+    groups = defaultdict(list)
+    for span in spans:
+        if span.get("kind") == "llm":
+            groups[("llm", f"{span.get('api')} {span.get('model')}")].append(span)
+        else:
+            groups[("tool", span.get("tool"))].append(span)
+    rows = []
+    for (kind, name), items in sorted(groups.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+        input_tokens = sum(span.get("input_tokens") or 0 for span in items)
+        cached_tokens = sum(span.get("cached_tokens") or 0 for span in items)
+        rows.append({
+            "kind": kind, "name": name, "calls": len(items),
+            "errors": sum(1 for span in items if span.get("status") == "error"),
+            "retries": sum(span.get("retries") or 0 for span in items),
+            "p50_ms": _percentile([span["wall_ms"] for span in items], 50),
+            "p95_ms": _percentile([span["wall_ms"] for span in items], 95),
+            "ttft_p50_ms": _percentile([span["ttft_ms"] for span in items if span.get("ttft_ms") is not None], 50),
+            "input_tokens": input_tokens,
+            "output_tokens": sum(span.get("output_tokens") or 0 for span in items),
+            "cached_tokens": cached_tokens,
+            "cache_hit_rate": cached_tokens / input_tokens if input_tokens else None,
+        })
+    return rows
+
+
+def read_spans(path):
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                spans.append(json.loads(line))
+            except ValueError:
+                continue
+    return spans
+
+
+def print_report(rows):
+    def fmt(value, spec=".1f"):
+        return "-" if value is None else format(value, spec)
+
+    print(f"{'Tipo':<5} {'Nombre':<36} {'Llamadas':>8} {'Errores':>7} {'Reint.':>6} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'TTFT p50':>9} {'Entrada':>9} {'Salida':>9} {'Caché':>9} {'% caché':>7}")
+    for row in rows:
+        rate = None if row["cache_hit_rate"] is None else row["cache_hit_rate"] * 100
+        print(f"{row['kind']:<5} {str(row['name'])[:36]:<36} {row['calls']:>8} {row['errors']:>7} {row['retries']:>6} "
+              f"{fmt(row['p50_ms']):>9} {fmt(row['p95_ms']):>9} {fmt(row['ttft_p50_ms']):>9} "
+              f"{row['input_tokens']:>9} {row['output_tokens']:>9} {row['cached_tokens']:>9} {fmt(rate):>7}")
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Informe de la instrumentación de llamadas al modelo y herramientas")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report = subparsers.add_parser("report", help="resumen por modelo y por herramienta")
+    report.add_argument("--path", default=DEFAULT_PATH, help="archivo JSONL de spans")
+    report.add_argument("--json", action="store_true", help="salida en JSON")
+    args = parser.parse_args()
+    if not os.path.exists(args.path):
+        print(f"No existe {args.path}; activa TELEMETRY_PATH para registrar spans.", file=sys.stderr)
+        return 1
+    rows = summarize(read_spans(args.path))
+    if args.json:
+        print(json.dumps(rows, indent=2, ensure_ascii=False))
+    else:
+        print_report(rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
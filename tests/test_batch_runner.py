@@ -0,0 +1,60 @@
+import json
+import threading
+import pytest
+import mock_openai_server
+from batch_runner import BatchRunner
+
+# El modo lote contra la Batch API simulada de mock_openai_server.py: subida
+# del archivo, creación del lote, consulta hasta que termina y resultados
+# asignados a cada prompt por custom_id.
+
+openai = pytest.importorskip("openai")
+
+
+@pytest.fixture
+def client():
+    server = mock_openai_server.make_server(mock_openai_server.parse_args(["--port", "0", "--batch-delay", "0.2"]))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield openai.OpenAI(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key="test")
+    server.shutdown()
+    server.server_close()
+
+
+def prompts(count):
+    return [(index, f"p{index}", {"model": "gpt-4o-mini", "input": f"Pregunta número {index}"})
+            for index in range(count)]
+
+
+def read_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return {record["id"]: record for record in map(json.loads, f)}
+
+
+def test_results_are_mapped_by_custom_id(client, tmp_path):
+    output = str(tmp_path / "out.jsonl")
+    runner = BatchRunner(client, output + ".batches.json", poll_interval=0.05, max_requests=2)
+    stats = runner.run(prompts(5), output)
+    assert stats["batches"] == 3
+    assert (stats["ok"], stats["failed"]) == (5, 0)
+    records = read_records(output)
+    assert sorted(records) == [f"p{index}" for index in range(5)]
+    for index in range(5):
+        record = records[f"p{index}"]
+        assert record["index"] == index
+        assert f"Pregunta número {index}" in record["output"]
+        assert record["response_id"] and record["batch_id"]
+    assert not (tmp_path / "out.jsonl.batches.json").exists()
+
+
+def test_submitted_batches_are_collected_on_resume(client, tmp_path):
+    output = str(tmp_path / "out.jsonl")
+    state = output + ".batches.json"
+    first = BatchRunner(client, state, poll_interval=0.05)
+    first.run(prompts(3), output, wait=False)
+    assert len(first.pending) == 1
+    # Relanzar el mismo comando no reenvía los prompts: espera el lote ya creado
+    second = BatchRunner(client, state, poll_interval=0.05)
+    stats = second.run(prompts(3), output)
+    assert (stats["batches"], stats["skipped"], stats["ok"]) == (0, 3, 3)
+    assert sorted(read_records(output)) == ["p0", "p1", "p2"]
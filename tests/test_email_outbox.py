@@ -0,0 +1,215 @@
+import time
+import socket
+import sqlite3
+import pytest
+from email_outbox import DEAD, QUEUED, SENDING, SENT, Outbox, SmtpSettings
+
+# La bandeja de salida contra un servidor SMTP local (aiosmtpd) que rechaza
+# con 550 las direcciones rejected@, responde 451 a las de tempfail[] y
+# exige (si se pide) una autenticación que nunca acepta.
+
+aiosmtpd = pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller  # noqa: E402
+from aiosmtpd.smtp import AuthResult  # noqa: E402
+
+
+class Handler:
+    def __init__(self):
+        self.delivered = []
+        self.sessions = set()
+        self.tempfail = {}
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("rejected@"):
+            return "550 5.1.1 No such user"
+        if self.tempfail.get(address, 0) > 0:
+            self.tempfail[address] -= 1
+            return "451 4.3.0 Try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        self.delivered.extend(envelope.rcpt_tos)
+        return "250 Message accepted"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    def start(**kwargs):
+        controller = Controller(Handler(), hostname="127.0.0.1", port=free_port(), **kwargs)
+        controller.start()
+        controllers.append(controller)
+        return controller
+
+    controllers = []
+    yield start
+    for controller in controllers:
+        controller.stop()
+
+
+@pytest.fixture
+def make_outbox(tmp_path):
+    outboxes = []
+
+    def make(port, **kwargs):
+        settings = SmtpSettings("127.0.0.1", port, user=kwargs.pop("user", None),
+                                password=kwargs.pop("password", None), timeout=5)
+        options = dict(workers=1, batch_size=20, max_attempts=3, retry_delay=0.05, max_retry_delay=0.2)
+        options.update(kwargs)
+        outbox = Outbox(str(tmp_path / "outbox.db"), settings, **options)
+        outboxes.append(outbox)
+        return outbox
+
+    yield make
+    for outbox in outboxes:
+        outbox.close()
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def settled(outbox):
+    counts = outbox.counts()
+    return not counts.get(QUEUED) and not counts.get(SENDING)
+
+
+def test_batch_is_delivered_over_one_session(smtp_server, make_outbox):
+    controller = smtp_server()
+    outbox = make_outbox(controller.port)
+    ids = [outbox.enqueue(f"user{i}@example.com", f"Asunto {i}", "Cuerpo") for i in range(25)]
+    assert wait_for(lambda: settled(outbox))
+    assert {outbox.status(message_id)[0] for message_id in ids} == {SENT}
+    assert sorted(controller.handler.delivered) == sorted(f"user{i}@example.com" for i in range(25))
+    assert len(controller.handler.sessions) == 1
+
+
+def test_temporary_failure_is_retried(smtp_server, make_outbox):
+    controller = smtp_server()
+    controller.handler.tempfail["later@example.com"] = 1
+    outbox = make_outbox(controller.port)
+    message_id = outbox.enqueue("later@example.com", "Asunto", "Cuerpo")
+    assert wait_for(lambda: outbox.status(message_id)[0] == SENT)
+    assert outbox.status(message_id)[1] == 2
+    assert controller.handler.delivered == ["later@example.com"]
+
+
+def test_permanent_rejection_is_dead_lettered(smtp_server, make_outbox):
+    controller = smtp_server()
+    outbox = make_outbox(controller.port)
+    rejected = outbox.enqueue("rejected@example.com", "Asunto", "Cuerpo")
+    accepted = outbox.enqueue("ok@example.com", "Asunto", "Cuerpo")
+    assert wait_for(lambda: settled(outbox))
+    status, attempts, error = outbox.status(rejected)
+    assert (status, attempts) == (DEAD, 1)
+    assert "550" in error
+    assert outbox.status(accepted)[0] == SENT
+
+
+@pytest.mark.filterwarnings("ignore:Requiring AUTH while not requiring TLS")
+def test_authentication_failure_keeps_messages_queued(smtp_server, make_outbox):
+    controller = smtp_server(authenticator=lambda *args: AuthResult(success=False, handled=False),
+                             auth_required=True, auth_require_tls=False)
+    outbox = make_outbox(controller.port, user="agent", password="wrong", retry_delay=0.5)
+    ids = [outbox.enqueue(f"user{i}@example.com", "Asunto", "Cuerpo") for i in range(3)]
+    assert wait_for(lambda: all(outbox.status(message_id)[2] for message_id in ids))
+    # El 535 del login no cuenta como rechazo de cada mensaje ni gasta intentos
+    for message_id in ids:
+        status, attempts, error = outbox.status(message_id)
+        assert (status, attempts) == (QUEUED, 0)
+        assert "SMTPAuthenticationError" in error
+    assert not controller.handler.delivered
+
+
+def test_messages_in_flight_are_not_reset_by_another_process(make_outbox):
+    first = make_outbox(1, workers=0)
+    message_id = first.enqueue("user@example.com", "Asunto", "Cuerpo")
+    with first._lock:
+        assert [row[0] for row in first._claim()] == [message_id]
+    # Otra instancia sobre el mismo archivo (p. ej. `python email_outbox.py drain`)
+    second = make_outbox(1, workers=0)
+    assert second.counts() == {SENDING: 1}
+    with second._lock:
+        assert second._claim() == []
+    # Cuando el lease caduca, el mensaje se puede recuperar
+    second._db.execute("UPDATE outbox SET lease_until = ?", (time.time() - 1,))
+    second._db.commit()
+    with second._lock:
+        assert [row[0] for row in second._claim()] == [message_id]
+    # El primer dueño ya no puede escribir su resultado
+    first._finish([((message_id, 0), None)])
+    assert second.status(message_id)[0] == SENDING
+
+
+def test_line_breaks_in_headers_are_rejected(make_outbox):
+    outbox = make_outbox(1, workers=0)
+    with pytest.raises(ValueError):
+        outbox.enqueue("user@example.com\r\nBcc: other@example.com", "Asunto", "Cuerpo")
+    with pytest.raises(ValueError):
+        outbox.enqueue("user@example.com", "Asunto\nX-Injected: 1", "Cuerpo")
+    assert outbox.counts() == {}
+
+
+def test_malformed_message_is_dead_lettered(smtp_server, make_outbox):
+    controller = smtp_server()
+    outbox = make_outbox(controller.port, workers=0)
+    # Fila escrita antes de que enqueue() validara las cabeceras
+    broken = outbox.enqueue("broken@example.com", "Asunto", "Cuerpo")
+    outbox._db.execute("UPDATE outbox SET subject = ? WHERE id = ?", ("Asunto\nX-Injected: 1", broken))
+    outbox._db.commit()
+    accepted = outbox.enqueue("ok@example.com", "Asunto", "Cuerpo")
+    outbox.workers = 1
+    outbox.start()
+    assert wait_for(lambda: settled(outbox))
+    assert outbox.status(broken)[:2] == (DEAD, 1)
+    assert outbox.status(accepted)[0] == SENT
+    # El hilo sigue vivo y entrega lo que llega después
+    later = outbox.enqueue("later@example.com", "Asunto", "Cuerpo")
+    assert wait_for(lambda: outbox.status(later)[0] == SENT)
+    assert controller.handler.delivered == ["ok@example.com", "later@example.com"]
+
+
+def test_unsupported_recipient_is_dead_lettered(smtp_server, make_outbox):
+    # Sin SMTPUTF8 el servidor no admite direcciones no ASCII: no es un fallo de conexión
+    controller = smtp_server(enable_SMTPUTF8=False)
+    outbox = make_outbox(controller.port)
+    unsupported = outbox.enqueue("peña@example.com", "Asunto", "Cuerpo")
+    accepted = outbox.enqueue("ok@example.com", "Asunto", "Cuerpo")
+    assert wait_for(lambda: settled(outbox))
+    status, attempts, error = outbox.status(unsupported)
+    assert (status, attempts) == (DEAD, 1)
+    assert "SMTPNotSupportedError" in error
+    assert outbox.status(accepted)[0] == SENT
+    assert len(controller.handler.sessions) == 1
+
+
+def test_worker_survives_database_errors(smtp_server, make_outbox, monkeypatch, capsys):
+    controller = smtp_server()
+    outbox = make_outbox(controller.port, workers=0)
+    claim = outbox._claim
+    calls = []
+
+    def flaky_claim():
+        calls.append(None)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return claim()
+
+    monkeypatch.setattr(outbox, "_claim", flaky_claim)
+    message_id = outbox.enqueue("user@example.com", "Asunto", "Cuerpo")
+    outbox.workers = 1
+    outbox.start()
+    assert wait_for(lambda: outbox.status(message_id)[0] == SENT)
+    assert "database is locked" in capsys.readouterr().err
@@ -0,0 +1,18 @@
+import time
+import threading
+from tool_executor import ToolExecutor
+
+
+def test_queued_calls_get_their_full_timeout():
+    executor = ToolExecutor(lambda name, args: time.sleep(0.2) or name, timeouts={"slow": 0.3}, limits={"slow": 1})
+    assert executor.run([("slow", "{}")] * 3) == ["slow"] * 3
+
+
+def test_wait_behind_a_stuck_tool_is_bounded():
+    release = threading.Event()
+    executor = ToolExecutor(lambda name, args: release.wait(), timeouts={"stuck": 0.2}, limits={"stuck": 1})
+    start = time.monotonic()
+    results = executor.run([("stuck", "{}")] * 2)
+    release.set()
+    assert results == ["Error: Function stuck timed out after 0.2s"] * 2
+    assert time.monotonic() - start < 1.0
@@ -0,0 +1,44 @@
+from typing import Annotated, List, Literal, Optional
+from tool_registry import ToolRegistry
+
+registry = ToolRegistry()
+
+
+@registry.tool(description="Herramienta de prueba")
+def locate(latitude: float, longitude: float, label: Annotated[Optional[str], "Etiqueta"] = None, zoom: int = 3):
+    return f"{latitude},{longitude},{label},{zoom}"
+
+
+@registry.tool(description="Otra herramienta de prueba")
+def plan(cities: List[str], mode: Literal["fast", "slow"] = "fast", hours: int = 24):
+    return f"{','.join(cities)}:{mode}:{hours!r}"
+
+
+def test_null_rejected_for_required_params():
+    assert registry.call("locate", {"latitude": None, "longitude": None}).startswith("Error: invalid arguments")
+
+
+def test_null_rejected_for_non_optional_defaults():
+    assert "must not be null" in registry.call("locate", {"latitude": 1, "longitude": 2, "zoom": None})
+
+
+def test_null_allowed_for_optional_params():
+    assert registry.call("locate", '{"latitude": 1.5, "longitude": 2, "label": null}') == "1.5,2,None,3"
+
+
+def test_wrong_type_rejected():
+    assert "must be of type number" in registry.call("locate", {"latitude": "1", "longitude": 2})
+
+
+def test_array_items_are_checked():
+    assert "item 1 must be of type string" in registry.call("plan", {"cities": ["Paris", 2]})
+
+
+def test_enum_is_checked():
+    assert "must be one of: fast, slow" in registry.call("plan", {"cities": [], "mode": "medium"})
+    assert registry.schemas(["plan"])[0]["parameters"]["properties"]["mode"] == {"enum": ["fast", "slow"], "type": "string"}
+
+
+def test_integral_floats_are_accepted_as_integers():
+    assert registry.call("plan", {"cities": ["Paris"], "hours": 24.0}) == "Paris:fast:24"
+    assert "must be of type integer" in registry.call("plan", {"cities": ["Paris"], "hours": 24.5})
@@ -0,0 +1,64 @@
+import threading
+import pytest
+import mock_openai_server
+import weather
+
+# Las herramientas del clima contra el Open-Meteo simulado de mock_openai_server.py.
+# OPEN_METEO_URL se fija después de importar weather: la URL se lee en cada petición.
+
+
+@pytest.fixture
+def open_meteo(monkeypatch):
+    server = mock_openai_server.make_server(mock_openai_server.parse_args(["--port", "0"]))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("OPEN_METEO_URL", f"http://127.0.0.1:{server.server_address[1]}/v1/forecast")
+    weather.fetch_forecast.cache.clear()
+    weather._current_cache.clear()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_forecast_uses_configured_url(open_meteo):
+    data = weather.fetch_forecast(40.4168, -3.7038)
+    assert data["latitude"] == 40.4 and data["longitude"] == -3.7
+    assert set(data["hourly"]) >= {"time", "temperature_2m", "precipitation_probability"}
+    assert "temperature_2m" in data["current"]
+
+
+def test_fetch_forecast_is_cached_per_grid_cell(open_meteo):
+    cache = weather.fetch_forecast.cache
+    hits = cache.hits
+    first = weather.fetch_forecast(40.4168, -3.7038)
+    assert weather.fetch_forecast(40.42, -3.71) == first
+    assert cache.hits == hits + 1
+
+
+def test_fetch_current_batches_and_keeps_order(open_meteo):
+    coordinates = [(48.8566, 2.3522), (4.711, -74.0721), (48.86, 2.35)]
+    results = weather.fetch_current(coordinates)
+    assert len(results) == 3
+    assert results[0] == results[2]
+    assert all("temperature_2m" in current for current in results)
+    # La segunda vez sale entero de la caché
+    open_meteo.shutdown()
+    assert weather.fetch_current(coordinates) == results
+
+
+def test_disk_caches_do_not_overlap(open_meteo, tmp_path, monkeypatch):
+    # Las dos cachés de weather escriben en el mismo archivo SQLite
+    path = str(tmp_path / "weather.db")
+    monkeypatch.setattr(weather.fetch_forecast.cache, "disk_path", path)
+    monkeypatch.setattr(weather._current_cache, "disk_path", path)
+    monkeypatch.setattr(weather.fetch_forecast.cache, "_db", None)
+    monkeypatch.setattr(weather._current_cache, "_db", None)
+    (current,) = weather.fetch_current([(40.4168, -3.7038)])
+    forecast = weather.fetch_forecast(40.4168, -3.7038)
+    # Solo en memoria no se vería el problema: se relee desde disco
+    weather.fetch_forecast.cache._entries.clear()
+    weather._current_cache._entries.clear()
+    assert weather.fetch_forecast(40.4168, -3.7038) == forecast
+    assert "hourly" in forecast
+    assert weather.fetch_current([(40.4, -3.7)]) == [current]
+    assert "hourly" not in current
@@ -0,0 +1,190 @@
+import json
+import time
+import sqlite3
+import threading
+from functools import wraps
+from collections import OrderedDict
+
+# Memoización para funciones de herramientas.
+#
+# ToolCache guarda resultados con TTL y expulsión LRU, opcionalmente
+# respaldados en SQLite para sobrevivir entre ejecuciones. Las llamadas
+# concurrentes con la misma clave se agrupan (single-flight): solo una llega
+# a ejecutar la función y el resto espera su resultado.
+
+# Resolución de la rejilla de los modelos globales de Open-Meteo (~11 km)
+GRID_RESOLUTION = 0.1
+
+
+def quantize(value, resolution=GRID_RESOLUTION):
+    """Redondea un valor al punto de rejilla más cercano"""
+    return round(round(float(value) / resolution) * resolution, 6)
+
+
+def coordinate_key(latitude, longitude, resolution=GRID_RESOLUTION):
+    """Clave de caché para coordenadas: 48.8566 y 48.86 caen en la misma celda"""
+    return f"{quantize(latitude, resolution)},{quantize(longitude, resolution)}"
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ToolCache:
+    """Caché TTL/LRU en memoria con respaldo opcional en disco y single-flight.
+
+    ttl y disk_path pueden ser funciones sin argumentos: se evalúan en el
+    primer uso, para leer la configuración cuando ya se ha cargado el .env.
+    Varias cachés pueden compartir archivo: namespace prefija sus claves en
+    disco para que no se pisen.
+    """
+
+    def __init__(self, ttl=600.0, maxsize=256, disk_path=None, namespace=None):
+        self._ttl = ttl
+        self.maxsize = maxsize
+        self._disk_path = disk_path
+        self._prefix = f"{namespace}:" if namespace else ""
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def ttl(self):
+        if callable(self._ttl):
+            self._ttl = float(self._ttl())
+        return self._ttl
+
+    @ttl.setter
+    def ttl(self, value):
+        self._ttl = value
+
+    @property
+    def disk_path(self):
+        if callable(self._disk_path):
+            self._disk_path = self._disk_path()
+        return self._disk_path
+
+    @disk_path.setter
+    def disk_path(self, value):
+        self._disk_path = value
+
+    def _disk(self):
+        if self._db is None and self.disk_path:
+            self._db = sqlite3.connect(self.disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+        return self._db
+
+    def get(self, key):
+        """Devuelve (True, valor) si la clave está en caché y no ha caducado"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    return True, entry[0]
+                del self._entries[key]
+            db = self._disk()
+            if db is not None:
+                row = db.execute("SELECT value, expires FROM cache WHERE key = ?", (self._prefix + key,)).fetchone()
+                if row is not None and row[1] > now:
+                    value = json.loads(row[0])
+                    self._store(key, value, row[1])
+                    return True, value
+        return False, None
+
+    def expires(self, key):
+        """Momento (time.time()) en que caduca la entrada en memoria de una clave, o None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry is not None else None
+
+    def set(self, key, value):
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._store(key, value, expires)
+            db = self._disk()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                    (self._prefix + key, json.dumps(value, ensure_ascii=False), expires),
+                )
+                db.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+                db.commit()
+
+    def _store(self, key, value, expires):
+        self._entries[key] = (value, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get_or_call(self, key, func):
+        """Devuelve el valor en caché o ejecuta func una sola vez por clave"""
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            return value
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            # Otra llamada ya está consultando esta clave: esperar su resultado
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            self.hits += 1
+            return flight.value
+        self.misses += 1
+        try:
+            flight.value = func()
+            self.set(key, flight.value)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            db = self._disk()
+            if db is not None:
+                db.execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(self._prefix), self._prefix))
+                db.commit()
+
+
+def cached_tool(ttl=600.0, maxsize=256, key=None, disk_path=None):
+    """Decorador que memoiza una función de herramienta.
+
+    key recibe los mismos argumentos que la función y devuelve la clave de
+    caché; por defecto se usa la representación de los argumentos. En disco
+    las claves llevan el nombre de la función como namespace.
+    """
+    def decorator(func):
+        cache = ToolCache(ttl=ttl, maxsize=maxsize, disk_path=disk_path,
+                          namespace=f"{func.__module__}.{func.__qualname__}")
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if key is not None:
+                cache_key = key(*args, **kwargs)
+            else:
+                cache_key = repr((args, sorted(kwargs.items())))
+            return cache.get_or_call(cache_key, lambda: func(*args, **kwargs))
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
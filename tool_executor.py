@@ -0,0 +1,86 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# Ejecución concurrente de las llamadas a funciones de un mismo turno.
+#
+# Cada llamada se lanza en un pool de hilos; los resultados se devuelven en el
+# mismo orden que las llamadas para que los function_call_output se añadan en
+# el orden original. Cada herramienta puede tener su propio timeout y un
+# límite de ejecuciones simultáneas; el timeout empieza a contar cuando la
+# llamada obtiene su turno, no mientras espera detrás del límite.
+
+
+class _Slot:
+    """Momento en que una llamada empezó a ejecutarse, o si se abandonó antes"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.started_at = None
+        self.abandoned = False
+
+
+class ToolExecutor:
+    """Ejecuta varias llamadas a herramientas en paralelo"""
+
+    def __init__(self, call_function, max_workers=8, default_timeout=30.0, timeouts=None, limits=None):
+        self.call_function = call_function
+        self.default_timeout = default_timeout
+        self.timeouts = dict(timeouts or {})
+        self._limits = {name: threading.BoundedSemaphore(limit) for name, limit in (limits or {}).items()}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+
+    def _call(self, name, args, slot):
+        limit = self._limits.get(name)
+        if limit is None:
+            return self._start(name, args, slot)
+        with limit:
+            return self._start(name, args, slot)
+
+    def _start(self, name, args, slot):
+        if slot.abandoned:
+            # Se agotó el plazo mientras esperaba turno: no se ejecuta
+            return None
+        slot.started_at = time.monotonic()
+        slot.started.set()
+        return self.call_function(name, args)
+
+    def submit(self, name, args):
+        """Lanza una llamada y devuelve su Future"""
+        slot = _Slot()
+        future = self._pool.submit(self._call, name, args, slot)
+        future.slot = slot
+        return future
+
+    def result(self, name, future, deadline=None):
+        """Espera el resultado de una llamada; los errores se devuelven como texto.
+
+        El timeout de la herramienta cuenta desde que la llamada empieza a
+        ejecutarse; deadline (time.monotonic()) acota además la espera total.
+        Sin deadline, la espera por un turno tampoco pasa del timeout (una
+        herramienta atascada no deja esperando para siempre a las de detrás).
+        """
+        timeout = self.timeouts.get(name, self.default_timeout)
+        slot = future.slot
+        start_by = deadline if deadline is not None else time.monotonic() + timeout
+        try:
+            if not slot.started.wait(max(0.0, start_by - time.monotonic())):
+                raise FutureTimeoutError()
+            until = slot.started_at + timeout
+            if deadline is not None:
+                until = min(until, deadline)
+            return future.result(timeout=max(0.0, until - time.monotonic()))
+        except FutureTimeoutError:
+            slot.abandoned = True
+            future.cancel()
+            return f"Error: Function {name} timed out after {timeout}s"
+        except Exception as e:
+            return f"Error: Function {name} failed: {e}"
+
+    def run(self, calls, deadline=None):
+        """Ejecuta [(nombre, argumentos), ...] a la vez y devuelve los resultados en orden"""
+        futures = [(name, self.submit(name, args)) for name, args in calls]
+        return [self.result(name, future, deadline) for name, future in futures]
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
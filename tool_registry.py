@@ -0,0 +1,254 @@
+import json
+import inspect
+from typing import Annotated, Any, Dict, List, Literal, Union, get_args, get_origin, get_type_hints
+from telemetry import get_telemetry
+
+# Registro declarativo de herramientas para function calling.
+#
+# Las funciones se registran una vez con @registry.tool(...); el esquema JSON
+# se genera a partir de la firma (tipos y descripciones con Annotated) y se
+# guarda en caché. La llamada es una búsqueda en un diccionario y los
+# argumentos se validan con un validador precompilado antes de ejecutar nada.
+
+_JSON_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    dict: "object",
+}
+
+
+def _check_type(json_type):
+    """Devuelve una función que comprueba un valor contra un tipo JSON"""
+    if json_type == "number":
+        return lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)
+    if json_type == "integer":
+        # 24.0 también es un entero válido en JSON
+        return lambda v: (isinstance(v, int) and not isinstance(v, bool)) or (isinstance(v, float) and v.is_integer())
+    if json_type == "string":
+        return lambda v: isinstance(v, str)
+    if json_type == "boolean":
+        return lambda v: isinstance(v, bool)
+    if json_type == "array":
+        return lambda v: isinstance(v, list)
+    if json_type == "object":
+        return lambda v: isinstance(v, dict)
+    return lambda v: True
+
+
+def _validator(schema):
+    """Devuelve una función que comprueba un valor contra un fragmento de JSON Schema.
+
+    Comprueba el tipo, los valores de enum y, en los arrays, cada elemento
+    contra items; devuelve el motivo del error o None.
+    """
+    json_type = schema.get("type")
+    check = _check_type(json_type)
+    enum = schema.get("enum")
+    items = _validator(schema["items"]) if json_type == "array" and "items" in schema else None
+
+    def validate(value):
+        if not check(value):
+            return f"must be of type {json_type}"
+        if enum is not None and value not in enum:
+            return f"must be one of: {', '.join(map(str, enum))}"
+        if items is not None:
+            for index, item in enumerate(value):
+                error = items(item)
+                if error is not None:
+                    return f"item {index} {error}"
+        return None
+    return validate
+
+
+def _type_schema(annotation):
+    """Convierte una anotación de tipo en un fragmento de JSON Schema"""
+    description = None
+    if get_origin(annotation) is Annotated:
+        annotation, *extras = get_args(annotation)
+        for extra in extras:
+            if isinstance(extra, str):
+                description = extra
+            elif isinstance(extra, dict):
+                # Esquema explícito para tipos que no se pueden inferir
+                schema = dict(extra)
+                if description:
+                    schema.setdefault("description", description)
+                return schema
+
+    origin = get_origin(annotation)
+    if origin is Literal:
+        values = list(get_args(annotation))
+        schema = {"enum": values}
+        if type(values[0]) in _JSON_TYPES:
+            schema["type"] = _JSON_TYPES[type(values[0])]
+    elif origin is Union:
+        options = [arg for arg in get_args(annotation) if arg is not type(None)]
+        schema = _type_schema(options[0]) if len(options) == 1 else {}
+    elif origin in (list, List):
+        (item,) = get_args(annotation) or (Any,)
+        schema = {"type": "array"}
+        if item is not Any:
+            schema["items"] = _type_schema(item)
+    elif origin in (dict, Dict):
+        schema = {"type": "object"}
+    elif annotation in _JSON_TYPES:
+        schema = {"type": _JSON_TYPES[annotation]}
+    else:
+        schema = {}
+    if description:
+        schema["description"] = description
+    return schema
+
+
+def _is_optional(annotation):
+    """True si la anotación (con o sin Annotated) admite None"""
+    if get_origin(annotation) is Annotated:
+        annotation = get_args(annotation)[0]
+    return get_origin(annotation) is Union and type(None) in get_args(annotation)
+
+
+class Tool:
+    """Función registrada con su esquema y su validador"""
+
+    def __init__(self, func, name, description):
+        self.func = func
+        self.name = name
+        self.description = description
+        hints = get_type_hints(func, include_extras=True)
+        properties = {}
+        required = []
+        nullable = set()
+        for param in inspect.signature(func).parameters.values():
+            annotation = hints.get(param.name, Any)
+            properties[param.name] = _type_schema(annotation)
+            if param.default is inspect.Parameter.empty:
+                required.append(param.name)
+            if param.default is None or _is_optional(annotation):
+                nullable.add(param.name)
+        self.schema = {
+            "type": "function",
+            "name": name,
+            "description": description,
+            "parameters": {
+                "type": "object",
+                "properties": properties,
+                "required": required,
+                "additionalProperties": False,
+            },
+        }
+        # Validador precompilado: (nombre, comprobación, admite null) por parámetro
+        self._checks = [(param, _validator(schema), param in nullable) for param, schema in properties.items()]
+        self._integers = [param for param, schema in properties.items() if schema.get("type") == "integer"]
+        self._required = required
+        self._allowed = frozenset(properties)
+
+    def validate(self, args):
+        """Devuelve None si los argumentos son válidos o un mensaje de error"""
+        if not isinstance(args, dict):
+            return "arguments must be a JSON object"
+        missing = [param for param in self._required if param not in args]
+        if missing:
+            return f"missing required arguments: {', '.join(missing)}"
+        unexpected = [param for param in args if param not in self._allowed]
+        if unexpected:
+            return f"unexpected arguments: {', '.join(unexpected)}"
+        for param, check, nullable in self._checks:
+            if param not in args:
+                continue
+            if args[param] is None:
+                if not nullable:
+                    return f"argument '{param}' must not be null"
+                continue
+            error = check(args[param])
+            if error is not None:
+                return f"argument '{param}' {error}"
+        return None
+
+    def normalize(self, args):
+        """Argumentos ya validados con los enteros escritos como 24.0 convertidos a int"""
+        floats = [param for param in self._integers if isinstance(args.get(param), float)]
+        if not floats:
+            return args
+        args = dict(args)
+        for param in floats:
+            args[param] = int(args[param])
+        return args
+
+
+def output_item(tool_call, result):
+    """Resultado de una llamada; es lo único que se envía al encadenar con previous_response_id"""
+    return {"type": "function_call_output", "call_id": tool_call.call_id, "output": str(result)}
+
+
+def call_items(tool_call, result):
+    """Items (llamada y resultado) para reenviar al modelo con claves fijas.
+
+    Se construyen siempre igual para que el historial se serialice byte a byte
+    idéntico en cada petición y el prefijo aproveche la caché de prompts.
+    """
+    return [
+        {"type": "function_call", "id": tool_call.id, "call_id": tool_call.call_id,
+         "name": tool_call.name, "arguments": tool_call.arguments},
+        output_item(tool_call, result),
+    ]
+
+
+class ToolRegistry:
+    """Registro de herramientas con tabla de despacho y esquemas en caché"""
+
+    def __init__(self):
+        self._tools = {}
+        self._schemas = {}
+
+    def tool(self, description=None, name=None):
+        """Decorador que registra una función como herramienta"""
+        def decorator(func):
+            tool_name = name or func.__name__
+            tool_description = description or inspect.getdoc(func) or ""
+            self._tools[tool_name] = Tool(func, tool_name, tool_description)
+            self._schemas.clear()
+            return func
+        return decorator
+
+    def __contains__(self, name):
+        return name in self._tools
+
+    def schemas(self, names=None):
+        """Devuelve la lista `tools` para la API (todas o solo las indicadas)"""
+        key = tuple(names) if names is not None else None
+        schemas = self._schemas.get(key)
+        if schemas is None:
+            selected = names if names is not None else list(self._tools)
+            schemas = self._schemas[key] = [self._tools[tool_name].schema for tool_name in selected]
+        return schemas
+
+    def call(self, name, arguments):
+        """Valida los argumentos (dict o JSON) y ejecuta la herramienta"""
+        telemetry = get_telemetry()
+        if not telemetry.enabled:
+            return self._call(name, arguments)
+        start = telemetry.start_tool()
+        try:
+            result = self._call(name, arguments)
+        except Exception as e:
+            telemetry.record_tool(name, start, error=f"{type(e).__name__}: {e}")
+            raise
+        telemetry.record_tool(name, start, result)
+        return result
+
+    def _call(self, name, arguments):
+        tool = self._tools.get(name)
+        if tool is None:
+            return f"Error: Function {name} not implemented"
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments) if arguments else {}
+            except ValueError as e:
+                return f"Error: invalid JSON arguments for {name}: {e}"
+        error = tool.validate(arguments)
+        if error is not None:
+            return f"Error: invalid arguments for {name}: {error}"
+        return tool.func(**tool.normalize(arguments))
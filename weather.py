@@ -0,0 +1,92 @@
+import os
+from http_client import HttpError, get_http_client
+from tool_cache import ToolCache, cached_tool, coordinate_key, quantize
+
+# Acceso a la API de Open-Meteo para las herramientas del clima.
+# OPEN_METEO_URL permite apuntar a un servidor local durante las pruebas.
+#
+# La configuración se lee del entorno en el primer uso y no al importar, para
+# que los scripts puedan llamar a load_dotenv() después de los imports.
+
+DEFAULT_OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+
+
+def open_meteo_url():
+    return os.getenv("OPEN_METEO_URL") or DEFAULT_OPEN_METEO_URL
+
+
+def weather_cache_ttl():
+    """Duración de los resultados en caché (WEATHER_CACHE_TTL, 600 s por defecto)"""
+    return float(os.getenv("WEATHER_CACHE_TTL") or "600")
+
+
+def weather_cache_path():
+    """Archivo SQLite opcional para conservar la caché entre ejecuciones (WEATHER_CACHE_PATH)"""
+    return os.getenv("WEATHER_CACHE_PATH") or None
+
+
+# Campos de la temperatura actual: es lo único que piden las herramientas sin pronóstico
+CURRENT_FIELDS = "temperature_2m"
+
+# Coordenadas por petición en las consultas por lotes (Open-Meteo acepta listas separadas por comas)
+MAX_BATCH_LOCATIONS = 100
+
+# Comparte archivo con la caché de fetch_forecast, pero con su propio namespace
+_current_cache = ToolCache(ttl=weather_cache_ttl, maxsize=2048, disk_path=weather_cache_path,
+                           namespace="weather.current")
+
+
+@cached_tool(ttl=weather_cache_ttl, maxsize=512, key=coordinate_key, disk_path=weather_cache_path)
+def fetch_forecast(latitude, longitude):
+    """Descarga el tiempo actual y el pronóstico horario de unas coordenadas.
+
+    Las coordenadas se ajustan a la rejilla del modelo, así que llamadas con
+    distinta precisión para el mismo lugar comparten resultado en caché. Las
+    horas vienen en la zona horaria local del lugar (forecast_store.py).
+    """
+    return get_http_client().get_json(open_meteo_url(), params={
+        "latitude": quantize(latitude),
+        "longitude": quantize(longitude),
+        "current": "temperature_2m,wind_speed_10m",
+        "hourly": "temperature_2m,relative_humidity_2m,wind_speed_10m,precipitation_probability,precipitation",
+        "timezone": "auto",
+    })
+
+
+def fetch_current(coordinates):
+    """Tiempo actual de varias coordenadas [(latitud, longitud)] en una sola petición.
+
+    Devuelve el bloque `current` de cada coordenada en el mismo orden. Solo se
+    descargan las que no están en caché (ni en la del pronóstico completo), y
+    las repetidas o que caen en la misma celda de la rejilla se piden una vez.
+    """
+    keys = [coordinate_key(latitude, longitude) for latitude, longitude in coordinates]
+    results = {}
+    missing = {}
+    for key, (latitude, longitude) in zip(keys, coordinates):
+        if key in results or key in missing:
+            continue
+        found, value = _current_cache.get(key)
+        if not found:
+            found, value = fetch_forecast.cache.get(key)
+            value = value["current"] if found else None
+        if found:
+            results[key] = value
+        else:
+            missing[key] = (quantize(latitude), quantize(longitude))
+    pending = list(missing.items())
+    for start in range(0, len(pending), MAX_BATCH_LOCATIONS):
+        chunk = pending[start:start + MAX_BATCH_LOCATIONS]
+        data = get_http_client().get_json(open_meteo_url(), params={
+            "latitude": ",".join(str(latitude) for _, (latitude, _) in chunk),
+            "longitude": ",".join(str(longitude) for _, (_, longitude) in chunk),
+            "current": CURRENT_FIELDS,
+        })
+        # Con una sola coordenada la API devuelve un objeto en lugar de una lista
+        locations = data if isinstance(data, list) else [data]
+        if len(locations) != len(chunk) or not all("current" in location for location in locations):
+            raise HttpError(f"Open-Meteo returned {len(locations)} locations for {len(chunk)} coordinates")
+        for (key, _), location in zip(chunk, locations):
+            results[key] = location["current"]
+            _current_cache.set(key, location["current"])
+    return [results[key] for key in keys]